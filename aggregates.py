@@ -0,0 +1,510 @@
+"""
+Agregados mensais dos lançamentos de receitas/despesas.
+
+O `MonthlyIndex` guarda, para cada (ano, mês), as posições das linhas do
+dataframe e a soma de Valor. Com ele o dashboard monta a lista de anos,
+as métricas do mês e o recorte do mês sem varrer o histórico inteiro, e
+novos lançamentos/edições atualizam só o mês afetado.
+
+O `MonthlySummary` mantém materializado o resumo por mês usado pelo
+`/api/summary` (totais, saldo acumulado e média móvel de 3 meses); um
+lançamento novo ou editado corrige só o mês dele e o sufixo do acumulado.
+
+O `CategoryAnalytics` monta o pivot mês × categoria (com médias móveis de
+3/6/12 meses e variação mês a mês) com um único bincount sobre os códigos
+da coluna categórica Categoria.
+
+O saldo acumulado é calculado de forma vetorizada (sinal via `np.where`
+sobre os códigos da coluna categórica Tipo, uma ordenação e um cumsum).
+"""
+
+import numpy as np
+import pandas as pd
+
+COLUNAS_LANCAMENTO = ["Data", "Categoria", "Descrição", "Valor"]
+TIPO_LANCAMENTO = pd.CategoricalDtype(["Receita", "Despesa"])
+
+
+def _month_key(data) -> int:
+    """Chave inteira AAAAMM de uma data (ou -1 se a data for inválida)."""
+    data = pd.to_datetime(data, errors="coerce")
+    if pd.isna(data):
+        return -1
+    return data.year * 100 + data.month
+
+
+def _to_float(valor) -> float:
+    valor = pd.to_numeric(valor, errors="coerce")
+    return 0.0 if pd.isna(valor) else float(valor)
+
+
+class MonthlyIndex:
+    """Posições e soma de Valor por mês de um frame tipado de receitas/despesas."""
+
+    def __init__(self):
+        self._rows = {}  # AAAAMM -> lista de posições no frame
+        self._soma = {}  # AAAAMM -> soma de Valor
+        self._n_rows = 0
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "MonthlyIndex":
+        """Constrói o índice com uma passada vetorizada sobre o frame tipado."""
+        index = cls()
+        if df is None or df.empty:
+            return index
+
+        datas = df["Data"]
+        keys = (datas.dt.year * 100 + datas.dt.month).fillna(-1).to_numpy(dtype="int64")
+        valores = df["Valor"].fillna(0.0).to_numpy(dtype="float64")
+
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+        uniq, starts = np.unique(sorted_keys, return_index=True)
+        stops = np.append(starts[1:], len(sorted_keys))
+        somas = np.add.reduceat(valores[order], starts) if len(starts) else []
+
+        for key, start, stop, soma in zip(uniq, starts, stops, somas):
+            if key < 0:
+                continue
+            index._rows[int(key)] = order[start:stop].tolist()
+            index._soma[int(key)] = float(soma)
+
+        index._n_rows = len(df)
+        return index
+
+    def __len__(self):
+        return self._n_rows
+
+    # ------------------------------
+    # Atualizações incrementais
+    # ------------------------------
+
+    def add(self, data, valor):
+        """Registra uma nova linha no final do frame."""
+        key = _month_key(data)
+        if key >= 0:
+            self._rows.setdefault(key, []).append(self._n_rows)
+            self._soma[key] = self._soma.get(key, 0.0) + _to_float(valor)
+        self._n_rows += 1
+
+    def update(self, pos: int, old_data, old_valor, new_data, new_valor):
+        """Move/ajusta a linha `pos` quando Data ou Valor são editados."""
+        old_key = _month_key(old_data)
+        new_key = _month_key(new_data)
+
+        if old_key >= 0:
+            self._soma[old_key] = self._soma.get(old_key, 0.0) - _to_float(old_valor)
+            if old_key != new_key:
+                rows = self._rows.get(old_key, [])
+                if pos in rows:
+                    rows.remove(pos)
+                if not rows:
+                    self._rows.pop(old_key, None)
+                    self._soma.pop(old_key, None)
+
+        if new_key >= 0:
+            if old_key != new_key:
+                self._rows.setdefault(new_key, []).append(pos)
+            self._soma[new_key] = self._soma.get(new_key, 0.0) + _to_float(new_valor)
+
+    # ------------------------------
+    # Consultas
+    # ------------------------------
+
+    def anos(self) -> list:
+        return sorted({key // 100 for key in self._rows})
+
+    def total(self, ano: int, mes: int) -> float:
+        return self._soma.get(ano * 100 + mes, 0.0)
+
+    def positions(self, ano: int, mes: int) -> list:
+        return self._rows.get(ano * 100 + mes, [])
+
+    def slice(self, df: pd.DataFrame, ano: int, mes: int) -> pd.DataFrame:
+        """Linhas do mês (custo proporcional às linhas daquele mês)."""
+        return df.iloc[sorted(self.positions(ano, mes))]
+
+
+# ==============================
+# SALDO ACUMULADO
+# ==============================
+
+def combine_entries(df_r: pd.DataFrame, df_d: pd.DataFrame) -> pd.DataFrame:
+    """
+    Receitas e despesas (frames tipados) numa tabela só, com a coluna Tipo
+    categórica, ordenada por Data (ordenação estável).
+    """
+    partes = [
+        df[COLUNAS_LANCAMENTO]
+        for df in (df_r, df_d)
+        if df is not None and not df.empty
+    ]
+    if not partes:
+        df = pd.DataFrame(columns=COLUNAS_LANCAMENTO)
+        df["Tipo"] = pd.Categorical([], dtype=TIPO_LANCAMENTO)
+        return df
+
+    n_r = 0 if df_r is None else len(df_r)
+    n_d = 0 if df_d is None else len(df_d)
+    df = pd.concat(partes, ignore_index=True)
+    df["Tipo"] = pd.Categorical.from_codes(
+        np.repeat(np.array([0, 1], dtype="int8"), [n_r, n_d]), dtype=TIPO_LANCAMENTO
+    )
+    return df.sort_values("Data", kind="stable", ignore_index=True)
+
+
+def running_balance(df: pd.DataFrame) -> pd.Series:
+    """
+    Saldo acumulado lançamento a lançamento (receita soma, despesa subtrai),
+    indexado pela Data. `df` deve vir de `combine_entries` (já ordenado).
+    """
+    valor = df["Valor"].to_numpy(dtype="float64", na_value=0.0)
+    sinal = np.where(df["Tipo"].cat.codes.to_numpy() == 0, 1.0, -1.0)
+    return pd.Series(
+        np.cumsum(valor * sinal),
+        index=pd.DatetimeIndex(df["Data"], name="Data"),
+        name="Saldo_acumulado",
+    )
+
+
+def history_balance(df_r: pd.DataFrame, df_d: pd.DataFrame) -> pd.Series:
+    """
+    Saldo acumulado de todo o histórico direto dos arrays de Data/Valor,
+    sem montar a tabela combinada (evita copiar as colunas de texto).
+    """
+    datas, valores = [], []
+    for df, sinal in ((df_r, 1.0), (df_d, -1.0)):
+        if df is None or df.empty:
+            continue
+        datas.append(df["Data"].to_numpy(dtype="datetime64[ns]"))
+        valores.append(df["Valor"].to_numpy(dtype="float64", na_value=0.0) * sinal)
+
+    if not datas:
+        return pd.Series(
+            dtype="float64", index=pd.DatetimeIndex([], name="Data"), name="Saldo_acumulado"
+        )
+
+    datas = np.concatenate(datas)
+    valores = np.concatenate(valores)
+    order = np.argsort(datas, kind="stable")
+    return pd.Series(
+        np.cumsum(valores[order]),
+        index=pd.DatetimeIndex(datas[order], name="Data"),
+        name="Saldo_acumulado",
+    )
+
+
+# ==============================
+# RESUMO MENSAL (API)
+# ==============================
+
+COLUNAS_RESUMO = [
+    "year_month",
+    "income",
+    "expense",
+    "total",
+    "cumulative_balance",
+    "moving_avg_3m",
+]
+
+# Janela da média móvel do saldo do mês (em meses presentes no resumo,
+# como o main.js fazia com `totals.slice(-3)`).
+JANELA_MEDIA = 3
+
+
+def _monthly_totals(df: pd.DataFrame):
+    """(soma de Valor, nº de linhas) por chave AAAAMM; datas inválidas ficam de fora."""
+    if df is None or df.empty:
+        vazio = pd.Series(dtype="float64")
+        return vazio, vazio.astype("int64")
+    datas = df["Data"]
+    keys = datas.dt.year * 100 + datas.dt.month
+    validas = keys.notna()
+    grupos = df["Valor"].fillna(0.0)[validas].groupby(keys[validas].astype("int64"))
+    return grupos.sum(), grupos.size()
+
+
+class MonthlySummary:
+    """
+    Resumo mensal materializado (receitas, despesas, saldo do mês, saldo
+    acumulado e média móvel de 3 meses), em arrays ordenados por mês.
+
+    Um lançamento novo ou editado mexe só no mês afetado: o saldo acumulado
+    é corrigido do mês em diante (sufixo) e a média móvel só nas janelas
+    que contêm aquele mês. Meses sem nenhum lançamento saem do resumo.
+    """
+
+    def __init__(self):
+        self.keys = np.empty(0, dtype="int64")  # AAAAMM, ordenado
+        self.income = np.empty(0, dtype="float64")
+        self.expense = np.empty(0, dtype="float64")
+        self.counts = np.empty((0, 2), dtype="int64")  # linhas de receita/despesa
+        self.cumulative = np.empty(0, dtype="float64")
+        self.moving_avg = np.empty(0, dtype="float64")
+
+    @classmethod
+    def from_frames(cls, df_r: pd.DataFrame, df_d: pd.DataFrame) -> "MonthlySummary":
+        """Constrói tudo de uma vez (vetorizado) a partir dos frames tipados."""
+        soma_r, n_r = _monthly_totals(df_r)
+        soma_d, n_d = _monthly_totals(df_d)
+        resumo = pd.DataFrame(
+            {"income": soma_r, "expense": soma_d, "n_r": n_r, "n_d": n_d}
+        ).fillna(0).sort_index()
+
+        summary = cls()
+        # Cópias graváveis (com Copy-on-Write o to_numpy devolve só leitura).
+        summary.keys = resumo.index.to_numpy(dtype="int64", copy=True)
+        summary.income = resumo["income"].to_numpy(dtype="float64", copy=True)
+        summary.expense = resumo["expense"].to_numpy(dtype="float64", copy=True)
+        summary.counts = resumo[["n_r", "n_d"]].to_numpy(dtype="int64", copy=True)
+        summary.cumulative = np.cumsum(summary.income - summary.expense)
+        summary.moving_avg = np.empty(len(summary.keys), dtype="float64")
+        summary._refresh_moving_avg(0, len(summary.keys))
+        return summary
+
+    def __len__(self):
+        return len(self.keys)
+
+    # ------------------------------
+    # Atualizações incrementais
+    # ------------------------------
+
+    def add(self, kind: str, data, valor):
+        """Registra um lançamento novo (kind: "receitas" ou "despesas")."""
+        self._apply(kind, _month_key(data), _to_float(valor), +1)
+
+    def remove(self, kind: str, data, valor):
+        """Retira um lançamento excluído."""
+        self._apply(kind, _month_key(data), -_to_float(valor), -1)
+
+    def update(self, kind: str, old_data, old_valor, new_data, new_valor):
+        """Lançamento editado: sai do mês antigo e entra no novo."""
+        self.remove(kind, old_data, old_valor)
+        self.add(kind, new_data, new_valor)
+
+    def _apply(self, kind: str, key: int, delta: float, n: int):
+        if key < 0:
+            return
+        lado = 0 if kind == "receitas" else 1
+        pos = int(np.searchsorted(self.keys, key))
+
+        if pos == len(self.keys) or self.keys[pos] != key:
+            if n < 0:
+                return
+            self._insert_month(pos, key)
+
+        if lado == 0:
+            self.income[pos] += delta
+        else:
+            self.expense[pos] += delta
+        self.counts[pos, lado] += n
+
+        # O saldo acumulado anda antes de o mês (se ficou vazio) sair: o
+        # `_drop_month` só tira do sufixo o que sobrou no próprio mês.
+        sinal = 1.0 if lado == 0 else -1.0
+        self.cumulative[pos:] += sinal * delta
+
+        if self.counts[pos].sum() <= 0:
+            self._drop_month(pos)
+            return
+
+        self._refresh_moving_avg(pos, pos + JANELA_MEDIA)
+
+    def _insert_month(self, pos: int, key: int):
+        anterior = self.cumulative[pos - 1] if pos > 0 else 0.0
+        self.keys = np.insert(self.keys, pos, key)
+        self.income = np.insert(self.income, pos, 0.0)
+        self.expense = np.insert(self.expense, pos, 0.0)
+        self.counts = np.insert(self.counts, pos, 0, axis=0)
+        self.cumulative = np.insert(self.cumulative, pos, anterior)
+        self.moving_avg = np.insert(self.moving_avg, pos, 0.0)
+
+    def _drop_month(self, pos: int):
+        # O que sobrou no mês (resíduo de ponto flutuante) sai do sufixo.
+        resto = self.income[pos] - self.expense[pos]
+        self.cumulative[pos + 1:] -= resto
+        for nome in ("keys", "income", "expense", "cumulative", "moving_avg"):
+            setattr(self, nome, np.delete(getattr(self, nome), pos))
+        self.counts = np.delete(self.counts, pos, axis=0)
+        self._refresh_moving_avg(pos, pos + JANELA_MEDIA - 1)
+
+    def _refresh_moving_avg(self, start: int, stop: int):
+        """Recalcula a média móvel só nas posições [start, stop)."""
+        stop = min(stop, len(self.keys))
+        if start >= stop:
+            return
+        total = self.income - self.expense
+        inicio = max(0, start - JANELA_MEDIA + 1)
+        acumulado = np.concatenate(([0.0], np.cumsum(total[inicio:stop])))
+        for i in range(start, stop):
+            a = max(0, i - JANELA_MEDIA + 1)
+            self.moving_avg[i] = (acumulado[i + 1 - inicio] - acumulado[a - inicio]) / (i + 1 - a)
+
+    # ------------------------------
+    # Consultas
+    # ------------------------------
+
+    def rows(self) -> list:
+        """Linhas no formato de `/api/summary` (ver COLUNAS_RESUMO)."""
+        total = self.income - self.expense
+        return [
+            {
+                "year_month": f"{k // 100:04d}-{k % 100:02d}",
+                "income": i,
+                "expense": e,
+                "total": t,
+                "cumulative_balance": c,
+                "moving_avg_3m": m,
+            }
+            for k, i, e, t, c, m in zip(
+                self.keys.tolist(),
+                self.income.tolist(),
+                self.expense.tolist(),
+                total.tolist(),
+                self.cumulative.tolist(),
+                self.moving_avg.tolist(),
+            )
+        ]
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(self.rows(), columns=COLUNAS_RESUMO)
+
+
+def monthly_summary(df_r: pd.DataFrame, df_d: pd.DataFrame) -> pd.DataFrame:
+    """
+    Receitas, despesas, saldo do mês, saldo acumulado e média móvel por mês
+    (frames tipados), no formato que o `static/main.js` espera em
+    `/api/summary`.
+    """
+    return MonthlySummary.from_frames(df_r, df_d).to_frame()
+
+
+# ==============================
+# ANÁLISE POR CATEGORIA
+# ==============================
+
+JANELAS_CATEGORIA = (3, 6, 12)
+SEM_CATEGORIA = "(sem categoria)"
+
+
+class CategoryAnalytics:
+    """
+    Pivot mês × categoria de um frame tipado de receitas/despesas, com
+    médias móveis e variação mês a mês.
+
+    Os meses formam um calendário contínuo do primeiro ao último lançamento
+    (mês sem lançamento na categoria vale 0). Tudo sai de um único
+    `np.bincount` sobre (mês, código da categoria) e de somas acumuladas
+    ao longo do eixo dos meses, sem laço por mês.
+    """
+
+    def __init__(self, meses: list, categorias: list, valores: np.ndarray):
+        self.meses = meses  # "AAAA-MM", em ordem
+        self.categorias = categorias
+        self.valores = valores  # float64 (meses × categorias)
+        self._acumulado = np.vstack(
+            [np.zeros((1, len(categorias))), np.cumsum(valores, axis=0)]
+        )
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "CategoryAnalytics":
+        if df is None or df.empty:
+            return cls([], [], np.zeros((0, 0)))
+
+        datas = df["Data"]
+        validas = datas.notna().to_numpy()
+        if not validas.any():
+            return cls([], [], np.zeros((0, 0)))
+
+        anos = datas.dt.year.to_numpy()[validas].astype("int64")
+        meses = datas.dt.month.to_numpy()[validas].astype("int64")
+        absoluto = anos * 12 + meses - 1
+        inicio = absoluto.min()
+        n_meses = int(absoluto.max() - inicio + 1)
+
+        categoria = df["Categoria"]
+        if not isinstance(categoria.dtype, pd.CategoricalDtype):
+            categoria = categoria.astype("category")
+        nomes = [str(c) for c in categoria.cat.categories]
+        codes = categoria.cat.codes.to_numpy()[validas].astype("int64")
+        codes[codes < 0] = len(nomes)  # sem categoria vira uma coluna a mais
+        n_cats = len(nomes) + 1
+
+        flat = (absoluto - inicio) * n_cats + codes
+        valores = df["Valor"].to_numpy(dtype="float64", na_value=0.0)[validas]
+        somas = np.bincount(flat, weights=valores, minlength=n_meses * n_cats)
+        contagem = np.bincount(codes, minlength=n_cats)
+
+        # Só categorias com algum lançamento (as categorias do dtype podem
+        # sobrar de linhas já apagadas).
+        usadas = np.flatnonzero(contagem)
+        rotulos = nomes + [SEM_CATEGORIA]
+        numeros = np.arange(inicio, inicio + n_meses)
+        return cls(
+            [f"{m // 12:04d}-{m % 12 + 1:02d}" for m in numeros.tolist()],
+            [rotulos[i] for i in usadas.tolist()],
+            somas.reshape(n_meses, n_cats)[:, usadas],
+        )
+
+    def __len__(self):
+        return len(self.meses)
+
+    def _frame(self, valores: np.ndarray) -> pd.DataFrame:
+        return pd.DataFrame(
+            valores,
+            index=pd.Index(self.meses, name="Mês"),
+            columns=pd.Index(self.categorias, name="Categoria"),
+        )
+
+    def pivot(self) -> pd.DataFrame:
+        """Soma de Valor por mês (linhas) e categoria (colunas)."""
+        return self._frame(self.valores)
+
+    def _rolling(self, janela: int) -> np.ndarray:
+        n = len(self.meses)
+        fim = np.arange(1, n + 1)
+        ini = np.maximum(fim - janela, 0)
+        soma = self._acumulado[fim] - self._acumulado[ini]
+        return soma / (fim - ini)[:, None]
+
+    def rolling_mean(self, janela: int) -> pd.DataFrame:
+        """Média dos últimos `janela` meses (menos no começo do histórico)."""
+        return self._frame(self._rolling(janela))
+
+    def _delta(self):
+        anterior = np.vstack([np.full((1, len(self.categorias)), np.nan), self.valores[:-1]])
+        delta = self.valores - anterior
+        with np.errstate(divide="ignore", invalid="ignore"):
+            pct = np.where(anterior != 0, delta / np.abs(anterior) * 100.0, np.nan)
+        return delta, pct
+
+    def month_delta(self) -> pd.DataFrame:
+        """Variação em R$ contra o mês anterior (NaN no primeiro mês)."""
+        return self._frame(self._delta()[0])
+
+    def month_delta_pct(self) -> pd.DataFrame:
+        """Variação % contra o mês anterior (NaN se o anterior foi 0)."""
+        return self._frame(self._delta()[1])
+
+    def month_table(self, ano: int, mes: int, janelas=JANELAS_CATEGORIA) -> pd.DataFrame:
+        """
+        Uma linha por categoria no mês pedido: valor, médias móveis e
+        variação contra o mês anterior. Vazio se o mês está fora do histórico.
+        """
+        rotulo = f"{ano:04d}-{mes:02d}"
+        colunas = (
+            ["Categoria", "Valor"]
+            + [f"Média {j}m" for j in janelas]
+            + ["Δ mês anterior", "Δ %"]
+        )
+        if rotulo not in self.meses:
+            return pd.DataFrame(columns=colunas)
+
+        i = self.meses.index(rotulo)
+        delta, pct = self._delta()
+        tabela = pd.DataFrame({"Categoria": self.categorias, "Valor": self.valores[i]})
+        for janela in janelas:
+            tabela[f"Média {janela}m"] = self._rolling(janela)[i]
+        tabela["Δ mês anterior"] = delta[i]
+        tabela["Δ %"] = pct[i]
+        return tabela.sort_values("Valor", ascending=False, ignore_index=True)[colunas]
@@ -1,334 +1,461 @@
 import os
-import json
 import random
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 from datetime import datetime
-import urllib.request
-import urllib.error
-import urllib.parse
 
 import pandas as pd
 import streamlit as st
 
+from storage import (
+    KINDS,
+    append_user_record,
+    append_user_records,
+    append_user_changes,
+)
+from quotes import (
+    CRYPTO_TICKERS,
+    ACAO_TICKERS,
+    FII_TICKERS,
+    prefetch_asset_price_brl,
+    wait_asset_price_brl,
+    asset_price_stale,
+)
+from frames import (
+    typed_frame,
+    cached_typed_frame,
+    append_frames,
+    set_cell,
+    frame_records,
+    editor_view,
+)
+from aggregates import (
+    MonthlyIndex,
+    CategoryAnalytics,
+    JANELAS_CATEGORIA,
+    combine_entries,
+    running_balance,
+    history_balance,
+)
+from portfolio import PositionBook, QTD_EPS, revalue_positions, portfolio_value_history
+from importer import import_statement
+from charts import RESOLUCOES, RESOLUCAO_PADRAO, chart_series
+from paging import TableIndex, PAGE_SIZES, PAGE_SIZE, page_count, page_slice
+from user_cache import user_frame_cache
+from mailer import send_email_code
+import instrumentation
+from instrumentation import timed
+
 # ==============================
 # CONFIGURAÇÕES GERAIS
 # ==============================
 
 st.set_page_config(page_title="Dashboard Financeiro", layout="wide")
 
-DATA_FILE = "user_data.json"
-
-# Listas de ativos conhecidos (pode ir ampliando depois)
-CRYPTO_TICKERS = {
-    "BTC": "BTC-USD",
-    "ETH": "ETH-USD",
-    "SOL": "SOL-USD",
-    "XRP": "XRP-USD",
-    "ADA": "ADA-USD",
-}
-
-ACAO_TICKERS = {
-    "PETR4": "PETR4.SA",
-    "VALE3": "VALE3.SA",
-    "ITUB4": "ITUB4.SA",
-    "B3SA3": "B3SA3.SA",
-    "WEGE3": "WEGE3.SA",
+# Tempo máximo (s) que o envio do formulário de patrimônio espera por uma
+# cotação que ainda está sendo buscada em segundo plano.
+QUOTE_SUBMIT_WAIT = 2.0
+
+# E-mails (separados por vírgula) que veem o painel "Desempenho" na barra
+# lateral. As métricas só são coletadas com FINANCE_METRICS=1 ou depois de
+# ligadas no painel.
+ADMIN_EMAILS = {
+    e.strip().lower()
+    for e in os.environ.get("FINANCE_ADMIN_EMAILS", "").split(",")
+    if e.strip()
 }
 
-FII_TICKERS = {
-    "MXRF11": "MXRF11.SA",
-    "HGLG11": "HGLG11.SA",
-    "KNRI11": "KNRI11.SA",
-    "XPML11": "XPML11.SA",
-    "BCFF11": "BCFF11.SA",
-}
+# Endpoint /metrics (Prometheus) do processo, se FINANCE_METRICS_PORT estiver
+# definido; sobe uma vez só, mesmo com os reruns do script.
+instrumentation.start_metrics_server()
 
 
 # ==============================
 # FUNÇÕES DE PERSISTÊNCIA
 # ==============================
 
-def load_all_data():
-    """Carrega o JSON completo com os dados de todos os usuários."""
-    if os.path.exists(DATA_FILE):
-        with open(DATA_FILE, "r", encoding="utf-8") as f:
-            try:
-                return json.load(f)
-            except json.JSONDecodeError:
-                return {}
-    return {}
+def init_empty_user_frames():
+    """Cria dataframes vazios padrão para receitas, despesas e patrimônio."""
+    for kind in ("receitas", "despesas", "patrimonio"):
+        if f"df_{kind}" not in st.session_state:
+            st.session_state[f"df_{kind}"] = typed_frame(kind, None)
 
 
-def save_all_data(data: dict):
-    """Salva o dicionário completo de usuários no JSON."""
-    with open(DATA_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+def set_user_frame(kind: str, df: pd.DataFrame):
+    """
+    Troca o dataframe da sessão e incrementa sua versão (invalida as
+    versões tipadas memorizadas para o dashboard). O frame é guardado já no
+    esquema compacto de `frames.LEDGER_SCHEMA`.
+    """
+    st.session_state[f"df_{kind}"] = typed_frame(kind, df)
+    st.session_state[f"df_{kind}_versao"] = st.session_state.get(f"df_{kind}_versao", 0) + 1
 
 
-def init_empty_user_frames():
-    """Cria dataframes vazios padrão para receitas, despesas e patrimônio."""
-    if "df_receitas" not in st.session_state:
-        st.session_state["df_receitas"] = pd.DataFrame(
-            columns=["Data", "Categoria", "Descrição", "Valor"]
-        )
+def user_typed_frame(kind: str) -> pd.DataFrame:
+    """Versão tipada (datas/valores convertidos) do dataframe da sessão, memorizada."""
+    return cached_typed_frame(
+        st.session_state,
+        kind,
+        st.session_state.get(f"df_{kind}"),
+        st.session_state.get(f"df_{kind}_versao", 0),
+    )
 
-    if "df_despesas" not in st.session_state:
-        st.session_state["df_despesas"] = pd.DataFrame(
-            columns=["Data", "Categoria", "Descrição", "Valor"]
-        )
 
-    if "df_patrimonio" not in st.session_state:
-        st.session_state["df_patrimonio"] = pd.DataFrame(
-            columns=[
-                "Data",
-                "Tipo",
-                "Ativo",
-                "Quantidade",
-                "Preço_R$",
-                "Valor_Total_R$",
-            ]
+def user_monthly_index(kind: str) -> MonthlyIndex:
+    """
+    Índice mensal (posições + somas por mês) de receitas/despesas da sessão.
+    Reconstruído só quando não pôde ser atualizado incrementalmente.
+    """
+    versao = st.session_state.get(f"df_{kind}_versao", 0)
+    hit = st.session_state.get(f"_indice_mensal_{kind}")
+    if hit is not None and hit[0] == versao:
+        return hit[1]
+
+    index = MonthlyIndex.from_frame(user_typed_frame(kind))
+    st.session_state[f"_indice_mensal_{kind}"] = (versao, index)
+    return index
+
+
+def _current_monthly_index(kind: str):
+    """Índice mensal em dia com a versão atual do frame, ou None."""
+    hit = st.session_state.get(f"_indice_mensal_{kind}")
+    if hit is not None and hit[0] == st.session_state.get(f"df_{kind}_versao", 0):
+        return hit[1]
+    return None
+
+
+def _keep_monthly_index(kind: str, index):
+    """Marca o índice (já atualizado) como válido para a nova versão do frame."""
+    if index is not None:
+        st.session_state[f"_indice_mensal_{kind}"] = (
+            st.session_state.get(f"df_{kind}_versao", 0),
+            index,
         )
 
 
-def normalize_df_receitas_despesas(df: pd.DataFrame) -> pd.DataFrame:
-    """Garante colunas padrão para receitas/despesas, especialmente 'Valor'."""
-    if df is None or df.empty:
-        return pd.DataFrame(columns=["Data", "Categoria", "Descrição", "Valor"])
+def user_position_book() -> PositionBook:
+    """
+    Posições/lotes FIFO do patrimônio da sessão. Reconstruído só quando não
+    pôde ser atualizado incrementalmente.
+    """
+    versao = st.session_state.get("df_patrimonio_versao", 0)
+    hit = st.session_state.get("_posicoes")
+    if hit is not None and hit[0] == versao:
+        return hit[1]
 
-    df = df.copy()
+    book = PositionBook.from_frame(user_typed_frame("patrimonio"))
+    st.session_state["_posicoes"] = (versao, book)
+    return book
 
-    for col in ["Data", "Categoria", "Descrição"]:
-        if col not in df.columns:
-            df[col] = ""
 
-    if "Valor" not in df.columns:
-        possiveis = [c for c in df.columns if "valor" in c.lower()]
-        if possiveis:
-            df["Valor"] = df[possiveis[0]]
-        else:
-            df["Valor"] = 0.0
+def _current_position_book():
+    """Livro de posições em dia com a versão atual do patrimônio, ou None."""
+    hit = st.session_state.get("_posicoes")
+    if hit is not None and hit[0] == st.session_state.get("df_patrimonio_versao", 0):
+        return hit[1]
+    return None
 
-    df = df[["Data", "Categoria", "Descrição", "Valor"]]
-    return df
 
+def _keep_position_book(book):
+    """Marca o livro (já atualizado) como válido para a nova versão do patrimônio."""
+    st.session_state["_posicoes"] = (st.session_state.get("df_patrimonio_versao", 0), book)
 
-def normalize_df_patrimonio(df: pd.DataFrame) -> pd.DataFrame:
-    """Garante colunas padrão para patrimônio, incluindo 'Valor_Total_R$'."""
-    if df is None or df.empty:
-        return pd.DataFrame(
-            columns=[
-                "Data",
-                "Tipo",
-                "Ativo",
-                "Quantidade",
-                "Preço_R$",
-                "Valor_Total_R$",
-            ]
-        )
-
-    df = df.copy()
-
-    for col in ["Data", "Tipo", "Ativo", "Quantidade"]:
-        if col not in df.columns:
-            df[col] = "" if col != "Quantidade" else 0.0
 
-    if "Preço_R$" not in df.columns:
-        possiveis_preco = [c for c in df.columns if "preço" in c.lower() or "preco" in c.lower()]
-        if possiveis_preco:
-            df["Preço_R$"] = df[possiveis_preco[0]]
-        else:
-            df["Preço_R$"] = 0.0
+def user_history_balance() -> pd.Series:
+    """Saldo acumulado de todo o histórico, memorizado pelas versões dos frames."""
+    versoes = (
+        st.session_state.get("df_receitas_versao", 0),
+        st.session_state.get("df_despesas_versao", 0),
+    )
+    hit = st.session_state.get("_saldo_historico")
+    if hit is not None and hit[0] == versoes:
+        return hit[1]
 
-    if "Valor_Total_R$" not in df.columns:
-        possiveis_valor = [c for c in df.columns if "valor" in c.lower()]
-        if possiveis_valor:
-            df["Valor_Total_R$"] = df[possiveis_valor[0]]
-        else:
-            try:
-                df["Valor_Total_R$"] = df["Quantidade"].astype(float) * df["Preço_R$"].astype(float)
-            except Exception:
-                df["Valor_Total_R$"] = 0.0
-
-    df = df[
-        [
-            "Data",
-            "Tipo",
-            "Ativo",
-            "Quantidade",
-            "Preço_R$",
-            "Valor_Total_R$",
-        ]
-    ]
-    return df
+    saldo = history_balance(user_typed_frame("receitas"), user_typed_frame("despesas"))
+    st.session_state["_saldo_historico"] = (versoes, saldo)
+    return saldo
 
 
-def load_user_data(email: str):
-    """Carrega os dados do usuário pelo e-mail e joga no session_state (já normalizado)."""
-    data_all = load_all_data()
-    user_data = data_all.get(email, {})
+def user_category_analytics(kind: str) -> CategoryAnalytics:
+    """Análise por categoria do frame, memorizada pela versão dele."""
+    versao = st.session_state.get(f"df_{kind}_versao", 0)
+    hit = st.session_state.get(f"_analise_categorias_{kind}")
+    if hit is not None and hit[0] == versao:
+        return hit[1]
 
-    df_r = pd.DataFrame(user_data.get("receitas", []))
-    df_d = pd.DataFrame(user_data.get("despesas", []))
-    df_p = pd.DataFrame(user_data.get("patrimonio", []))
+    analise = CategoryAnalytics.from_frame(user_typed_frame(kind))
+    st.session_state[f"_analise_categorias_{kind}"] = (versao, analise)
+    return analise
 
-    st.session_state["df_receitas"] = normalize_df_receitas_despesas(df_r)
-    st.session_state["df_despesas"] = normalize_df_receitas_despesas(df_d)
-    st.session_state["df_patrimonio"] = normalize_df_patrimonio(df_p)
 
+def user_table_index(nome: str, versao, build) -> TableIndex:
+    """
+    Índice de paginação da tabela `nome`, memorizado por `versao`; `build`
+    monta o frame da tabela só quando a versão muda.
+    """
+    hit = st.session_state.get(f"_indice_tabela_{nome}")
+    if hit is not None and hit[0] == versao:
+        return hit[1]
 
-def save_user_data(email: str):
-    """Salva os dataframes atuais no JSON, usando o e-mail como chave."""
-    init_empty_user_frames()
+    index = TableIndex(build())
+    st.session_state[f"_indice_tabela_{nome}"] = (versao, index)
+    return index
 
-    df_r = normalize_df_receitas_despesas(st.session_state["df_receitas"])
-    df_d = normalize_df_receitas_despesas(st.session_state["df_despesas"])
-    df_p = normalize_df_patrimonio(st.session_state["df_patrimonio"])
 
-    data_all = load_all_data()
-    data_all[email] = {
-        "receitas": df_r.to_dict(orient="records"),
-        "despesas": df_d.to_dict(orient="records"),
-        "patrimonio": df_p.to_dict(orient="records"),
-    }
+def load_user_data(email: str):
+    """
+    Aponta o session_state para os frames do usuário no cache do processo
+    (compartilhados entre as abas; lidos do log só se ainda não estão lá).
+    """
+    versao, frames = user_frame_cache.get(email)
+    for kind, df in frames.items():
+        set_user_frame(kind, df)
+    st.session_state["_cache_versao"] = versao
 
-    save_all_data(data_all)
 
+def sync_user_data():
+    """
+    Recarrega os frames da sessão se outra aba do usuário gravou dados (ou
+    se a última gravação desta sessão não pôde ser publicada no cache).
+    """
+    email = st.session_state.get("user_email")
+    if email is None:
+        return
+    versao = st.session_state.get("_cache_versao")
+    if versao is None or user_frame_cache.version(email) != versao:
+        load_user_data(email)
+
+
+def _publish_user_data():
+    """Publica no cache do processo os frames que a sessão acabou de gravar."""
+    email = st.session_state.get("user_email")
+    if email is None:
+        return
+    st.session_state["_cache_versao"] = user_frame_cache.commit(
+        email,
+        st.session_state.get("_cache_versao"),
+        {kind: st.session_state[f"df_{kind}"] for kind in KINDS},
+    )
 
-# ==============================
-# FUNÇÃO PARA ENVIAR CÓDIGO POR E-MAIL (ICLOUD)
-# ==============================
 
-def send_email_code(email_to: str, code: str):
+def add_user_entry(kind: str, row: dict):
     """
-    Envia o código de login usando SMTP do iCloud.
+    Acrescenta uma linha ao dataframe da sessão e grava só essa linha no log
+    do usuário logado (kind: "receitas", "despesas" ou "patrimonio").
     """
+    init_empty_user_frames()
 
-    smtp_server = "smtp.mail.me.com"
-    smtp_port = 587  # TLS
-    smtp_user = "mateuskr@icloud.com"
-    smtp_password = "dklx-aojq-fond-tjfn"
+    df = st.session_state[f"df_{kind}"]
+    index = _current_monthly_index(kind) if kind != "patrimonio" else None
+    book = _current_position_book() if kind == "patrimonio" else None
+    set_user_frame(kind, append_frames(kind, df, pd.DataFrame([row])))
+    if index is not None:
+        index.add(row.get("Data"), row.get("Valor"))
+        _keep_monthly_index(kind, index)
+    if book is not None and book.add(row):
+        _keep_position_book(book)
 
-    subject = "Seu código de login - Dashboard Financeiro"
-    body = f"Seu código de acesso é: {code}"
+    if "user_email" in st.session_state:
+        append_user_record(st.session_state["user_email"], kind, row)
+        _publish_user_data()
 
-    msg = MIMEMultipart()
-    msg["From"] = smtp_user
-    msg["To"] = email_to
-    msg["Subject"] = subject
-    msg.attach(MIMEText(body, "plain", "utf-8"))
 
-    try:
-        with smtplib.SMTP(smtp_server, smtp_port) as server:
-            server.starttls()
-            server.login(smtp_user, smtp_password)
-            server.send_message(msg)
-        return True, None
-    except Exception as e:
-        return False, str(e)
+def add_user_entries(kind: str, df_novos: pd.DataFrame):
+    """
+    Acrescenta várias linhas de uma vez (importação de extrato): um único
+    concat no dataframe da sessão e uma única gravação no log do usuário.
+    """
+    if df_novos is None or df_novos.empty:
+        return
+    init_empty_user_frames()
+
+    set_user_frame(kind, append_frames(kind, st.session_state[f"df_{kind}"], df_novos))
+
+    if "user_email" in st.session_state:
+        append_user_records(
+            st.session_state["user_email"], kind, df_novos.to_dict(orient="records")
+        )
+        _publish_user_data()
 
 
 # ==============================
-# FUNÇÕES DE COTAÇÃO VIA YAHOO (SEM yfinance)
+# EDIÇÃO DOS LANÇAMENTOS (data_editor)
 # ==============================
 
-def yahoo_last_close(symbol: str):
+def _apply_editor_delta(kind: str, editor_key: str, mensagem: str, posicoes):
     """
-    Busca último preço de fechamento no Yahoo Finance via HTTP puro.
-    Retorna float ou None.
+    Callback do data_editor: aplica no dataframe da sessão e grava no log do
+    usuário apenas as linhas alteradas, excluídas e incluídas. O editor só
+    mostra uma página da tabela; `posicoes` leva cada linha dela à sua
+    posição no ledger inteiro.
     """
-    try:
-        url = (
-            "https://query1.finance.yahoo.com/v8/finance/chart/"
-            f"{urllib.parse.quote(symbol)}?range=1d&interval=1d"
-        )
-        req = urllib.request.Request(
-            url,
-            headers={"User-Agent": "Mozilla/5.0"},
+    delta = st.session_state.get(editor_key) or {}
+    key = f"df_{kind}"
+    df = st.session_state[key]
+
+    edited = {
+        int(posicoes[int(pos)]): {c: v for c, v in changes.items() if c in df.columns}
+        for pos, changes in delta.get("edited_rows", {}).items()
+    }
+    edited = {pos: changes for pos, changes in edited.items() if changes}
+    deleted = sorted(int(posicoes[int(pos)]) for pos in delta.get("deleted_rows", []))
+    added = [
+        {c: row.get(c) for c in df.columns}
+        for row in delta.get("added_rows", [])
+        if any(c in df.columns for c in row)
+    ]
+    if not (edited or deleted or added):
+        return
+
+    # Conteúdo das linhas alteradas/excluídas como a sessão as vê: se outra
+    # aba/réplica mexeu no log, o storage localiza cada uma por ele.
+    alvos = sorted(set(edited) | set(deleted))
+    originais = dict(zip(alvos, frame_records(kind, df.iloc[alvos])))
+
+    # Exclusões mudam as posições: nesse caso o índice mensal é refeito.
+    index = None
+    if kind != "patrimonio" and not deleted:
+        index = _current_monthly_index(kind)
+
+    # O frame pode ser o do cache compartilhado: copia só as colunas editadas.
+    colunas = {col for changes in edited.values() for col in changes}
+    if colunas:
+        df = df.assign(**{col: df[col].copy() for col in colunas})
+
+    for pos, changes in edited.items():
+        if index is not None and ("Data" in changes or "Valor" in changes):
+            old_data = df["Data"].iat[pos]
+            old_valor = df["Valor"].iat[pos]
+            index.update(
+                pos,
+                old_data,
+                old_valor,
+                changes.get("Data", old_data),
+                changes.get("Valor", old_valor),
+            )
+        for col, value in changes.items():
+            try:
+                set_cell(kind, df, pos, col, value)
+            except (TypeError, ValueError):
+                df[col] = df[col].astype(object)
+                df.iloc[pos, df.columns.get_loc(col)] = value
+
+    if deleted:
+        df = df.drop(index=df.index[deleted]).reset_index(drop=True)
+    if added:
+        df = append_frames(kind, df, pd.DataFrame(added, columns=df.columns))
+        if index is not None:
+            for row in added:
+                index.add(row.get("Data"), row.get("Valor"))
+
+    set_user_frame(kind, df)
+    _keep_monthly_index(kind, index)
+
+    if "user_email" in st.session_state:
+        email = st.session_state["user_email"]
+        append_user_changes(
+            email,
+            kind,
+            edited,
+            deleted,
+            added,
+            originals=originais,
+            base=user_frame_cache.stamp_of(email, st.session_state.get("_cache_versao")),
         )
-        with urllib.request.urlopen(req, timeout=10) as resp:
-            data = json.loads(resp.read().decode("utf-8"))
-
-        result = data.get("chart", {}).get("result")
-        if not result:
-            return None
-        result = result[0]
-        quote = result.get("indicators", {}).get("quote", [])
-        if not quote:
-            return None
-        closes = quote[0].get("close", [])
-        if not closes:
-            return None
-        last = closes[-1]
-        if last is None:
-            return None
-        return float(last)
-    except Exception:
-        return None
-
-
-def get_asset_price_brl(asset_type: str, ticker: str):
+        _publish_user_data()
+
+    # Nova key zera o estado do editor, cujo delta já foi aplicado acima.
+    st.session_state[f"editor_{kind}_versao"] = (
+        st.session_state.get(f"editor_{kind}_versao", 0) + 1
+    )
+    st.session_state[f"editor_{kind}_msg"] = mensagem
+
+
+def table_window(key: str, index: TableIndex) -> tuple:
     """
-    Busca o preço em R$ usando Yahoo Finance via HTTP.
-    - Ação / FII: usa dicionário + fallback .SA
-    - Criptomoeda: usa dicionário + fallback TICKER-USD e converte por USDBRL=X
+    Filtros (busca, período), ordenação e página da tabela. Devolve as
+    posições, no frame inteiro, das linhas da página atual e uma assinatura
+    da janela (para a key do widget que mostra a página).
     """
-    ticker = ticker.strip().upper()
-    if not ticker:
-        return None
-
-    try:
-        if asset_type == "Ação":
-            if ticker in ACAO_TICKERS:
-                symbol = ACAO_TICKERS[ticker]
-            else:
-                symbol = ticker
-                if not symbol.endswith(".SA"):
-                    symbol += ".SA"
-            return yahoo_last_close(symbol)
-
-        elif asset_type == "FII":
-            if ticker in FII_TICKERS:
-                symbol = FII_TICKERS[ticker]
-            else:
-                symbol = ticker
-                if not symbol.endswith(".SA"):
-                    symbol += ".SA"
-            return yahoo_last_close(symbol)
-
-        elif asset_type == "Criptomoeda":
-            if ticker in CRYPTO_TICKERS:
-                symbol = CRYPTO_TICKERS[ticker]
-            else:
-                symbol = f"{ticker}-USD"
+    with st.expander("Filtrar e ordenar"):
+        c1, c2, c3 = st.columns(3)
+        texto = c1.text_input("Buscar", key=f"{key}_busca")
+        periodo = ()
+        if index.date_col is not None:
+            periodo = c2.date_input("Período", value=(), key=f"{key}_periodo")
+        sort_by = c3.selectbox("Ordenar por", index.sort_columns, key=f"{key}_ordem")
+        descending = c3.toggle("Decrescente", key=f"{key}_decrescente")
+
+    inicio = periodo[0] if len(periodo) > 0 else None
+    fim = periodo[1] if len(periodo) > 1 else None
+    ordem = index.filtered_order(inicio, fim, texto, sort_by, descending)
+
+    tamanho = PAGE_SIZE
+    pagina = 1
+    if len(index) > PAGE_SIZES[0]:
+        c1, c2, c3 = st.columns([1, 1, 2])
+        tamanho = c1.selectbox(
+            "Linhas por página",
+            PAGE_SIZES,
+            index=PAGE_SIZES.index(PAGE_SIZE) if PAGE_SIZE in PAGE_SIZES else 0,
+            key=f"{key}_tamanho",
+        )
+        paginas = page_count(len(ordem), tamanho)
+        # Filtro novo pode deixar a página guardada além da última.
+        if st.session_state.get(f"{key}_pagina", 1) > paginas:
+            st.session_state[f"{key}_pagina"] = paginas
+        pagina = c2.number_input(
+            "Página", min_value=1, max_value=paginas, step=1, key=f"{key}_pagina"
+        )
+        posicoes = page_slice(ordem, pagina, tamanho)
+        primeira = (pagina - 1) * tamanho
+        filtradas = f" (filtradas de {len(index)})" if len(ordem) != len(index) else ""
+        c3.caption(
+            f"Linhas {primeira + min(1, len(posicoes))}–{primeira + len(posicoes)} "
+            f"de {len(ordem)}{filtradas}"
+        )
+    else:
+        posicoes = page_slice(ordem, pagina, tamanho)
 
-            price_usd = yahoo_last_close(symbol)
-            if price_usd is None:
-                return None
-            usd_brl = yahoo_last_close("USDBRL=X")
-            if usd_brl is None:
-                return None
-            return price_usd * usd_brl
+    assinatura = (texto, tuple(periodo), sort_by, descending, tamanho, pagina)
+    return posicoes, assinatura
 
-        else:
-            return None
-    except Exception:
-        return None
 
+def ledger_editor(kind: str, mensagem: str):
+    """
+    Tabela editável de receitas/despesas/patrimônio com gravação por delta.
+    Só a página filtrada vai para o navegador.
+    """
+    index = user_table_index(
+        kind,
+        st.session_state.get(f"df_{kind}_versao", 0),
+        lambda: typed_frame(kind, st.session_state[f"df_{kind}"]),
+    )
+    posicoes, assinatura = table_window(f"tabela_{kind}", index)
+
+    # A key muda com a janela: o estado do editor de uma página não vale
+    # para as linhas de outra.
+    versao = st.session_state.get(f"editor_{kind}_versao", 0)
+    editor_key = f"editor_{kind}_{versao}_{hash(assinatura) & 0xFFFFFFFF:x}"
+
+    st.data_editor(
+        editor_view(index.df.iloc[posicoes]),
+        num_rows="dynamic",
+        key=editor_key,
+        use_container_width=True,
+        column_config={"Data": st.column_config.DateColumn("Data", format="YYYY-MM-DD")},
+        on_change=_apply_editor_delta,
+        args=(kind, editor_key, mensagem, posicoes),
+    )
 
-def parse_date_column(df: pd.DataFrame, col: str = "Data") -> pd.DataFrame:
-    if df is None or df.empty or col not in df.columns:
-        return df
-    df = df.copy()
-    df[col] = pd.to_datetime(df[col], errors="coerce")
-    return df
+    mensagem = st.session_state.pop(f"editor_{kind}_msg", None)
+    if mensagem:
+        st.success(mensagem)
 
 
 # ==============================
 # TELA DE LOGIN
 # ==============================
 
+@timed("page.login")
 def login_page():
     st.title("Login - Dashboard Financeiro")
 
@@ -346,19 +473,24 @@ def login_page():
                 st.session_state["login_code"] = code
                 st.session_state["temp_email"] = email
 
-                ok, err = send_email_code(email, code)
-
-                if ok:
-                    st.success("Código enviado para seu e-mail.")
-                    st.session_state["login_step"] = "code"
-                    st.rerun()
-                else:
-                    st.error("Não foi possível enviar o código por e-mail.")
-                    st.info(f"Erro técnico: {err}")
-                    st.info(f"(Modo teste) Código gerado: {code}")
+                # Só enfileira: o e-mail sai pela thread do mailer.
+                st.session_state["_envio_codigo"] = send_email_code(email, code)
+                st.session_state["login_step"] = "code"
+                st.rerun()
 
     elif st.session_state["login_step"] == "code":
         st.write(f"E-mail: **{st.session_state.get('temp_email', '')}**")
+
+        envio = st.session_state.get("_envio_codigo")
+        if envio is None or envio.ok:
+            st.success("Código enviado para seu e-mail.")
+        elif not envio.done:
+            st.info("Enviando o código para seu e-mail...")
+        else:
+            st.error("Não foi possível enviar o código por e-mail.")
+            st.info(f"Erro técnico: {envio.error}")
+            st.info(f"(Modo teste) Código gerado: {st.session_state.get('login_code')}")
+
         code_input = st.text_input("Digite o código recebido:", type="password")
         if st.button("Entrar"):
             code_real = st.session_state.get("login_code")
@@ -371,6 +503,7 @@ def login_page():
                 st.session_state["login_code"] = None
                 st.session_state["login_step"] = "email"
                 st.session_state["temp_email"] = None
+                st.session_state["_envio_codigo"] = None
 
                 load_user_data(email)
 
@@ -383,6 +516,7 @@ def login_page():
             st.session_state["login_step"] = "email"
             st.session_state["login_code"] = None
             st.session_state["temp_email"] = None
+            st.session_state["_envio_codigo"] = None
             st.rerun()
 
 
@@ -390,13 +524,14 @@ def login_page():
 # PÁGINA DE LANÇAMENTOS (com edição)
 # ==============================
 
+@timed("page.lancamentos")
 def lancamentos_page():
     st.title("Lançamentos")
 
     init_empty_user_frames()
 
-    tab_receita, tab_despesa, tab_patrimonio = st.tabs(
-        ["Receita", "Despesa", "Patrimônio"]
+    tab_receita, tab_despesa, tab_patrimonio, tab_importar = st.tabs(
+        ["Receita", "Despesa", "Patrimônio", "Importar extrato"]
     )
 
     # ========== RECEITA ==========
@@ -420,34 +555,13 @@ def lancamentos_page():
                     "Valor": float(valor_rec),
                 }
 
-                df_r = normalize_df_receitas_despesas(
-                    st.session_state.get("df_receitas", pd.DataFrame())
-                )
-                df_r = pd.concat([df_r, pd.DataFrame([nova_linha])], ignore_index=True)
-
-                st.session_state["df_receitas"] = df_r
-
-                if "user_email" in st.session_state:
-                    save_user_data(st.session_state["user_email"])
+                add_user_entry("receitas", nova_linha)
 
                 st.success("Receita adicionada.")
                 st.rerun()
 
         st.markdown("### Receitas lançadas (clique para editar ou excluir)")
-        df_r_view = normalize_df_receitas_despesas(st.session_state.get("df_receitas"))
-        edited_r = st.data_editor(
-            df_r_view,
-            num_rows="dynamic",
-            key="editor_receitas",
-            use_container_width=True,
-        )
-        edited_r = normalize_df_receitas_despesas(edited_r)
-
-        if not edited_r.reset_index(drop=True).equals(df_r_view.reset_index(drop=True)):
-            st.session_state["df_receitas"] = edited_r
-            if "user_email" in st.session_state:
-                save_user_data(st.session_state["user_email"])
-            st.success("Receitas atualizadas.")
+        ledger_editor("receitas", "Receitas atualizadas.")
 
     # ========== DESPESA ==========
     with tab_despesa:
@@ -470,76 +584,81 @@ def lancamentos_page():
                     "Valor": float(valor_desp),
                 }
 
-                df_d = normalize_df_receitas_despesas(
-                    st.session_state.get("df_despesas", pd.DataFrame())
-                )
-                df_d = pd.concat([df_d, pd.DataFrame([nova_linha])], ignore_index=True)
-
-                st.session_state["df_despesas"] = df_d
-
-                if "user_email" in st.session_state:
-                    save_user_data(st.session_state["user_email"])
+                add_user_entry("despesas", nova_linha)
 
                 st.success("Despesa adicionada.")
                 st.rerun()
 
         st.markdown("### Despesas lançadas (clique para editar ou excluir)")
-        df_d_view = normalize_df_receitas_despesas(st.session_state.get("df_despesas"))
-        edited_d = st.data_editor(
-            df_d_view,
-            num_rows="dynamic",
-            key="editor_despesas",
-            use_container_width=True,
-        )
-        edited_d = normalize_df_receitas_despesas(edited_d)
-
-        if not edited_d.reset_index(drop=True).equals(df_d_view.reset_index(drop=True)):
-            st.session_state["df_despesas"] = edited_d
-            if "user_email" in st.session_state:
-                save_user_data(st.session_state["user_email"])
-            st.success("Despesas atualizadas.")
+        ledger_editor("despesas", "Despesas atualizadas.")
 
     # ========== PATRIMÔNIO ==========
     with tab_patrimonio:
         st.subheader("Lançar Patrimônio")
 
-        with st.form("form_patrimonio"):
-            data_pat = st.date_input("Data do lançamento", value=datetime.today())
-            tipo = st.selectbox(
-                "Tipo de ativo",
-                ["Criptomoeda", "Ação", "FII", "Outro"],
-            )
+        tipo = st.selectbox(
+            "Tipo de ativo",
+            ["Criptomoeda", "Ação", "FII", "Outro"],
+        )
 
-            ativo = ""
-            ativo_label = ""
+        ativo = ""
+        ativo_label = ""
 
-            if tipo == "Criptomoeda":
-                opcoes = list(CRYPTO_TICKERS.keys()) + ["Outro"]
-                escolha = st.selectbox("Cripto", opcoes)
-                if escolha == "Outro":
-                    ativo = st.text_input("Ticker da cripto (ex: XRP, DOGE)")
-                else:
-                    ativo = escolha
-                ativo_label = ativo
-            elif tipo == "Ação":
-                opcoes = list(ACAO_TICKERS.keys()) + ["Outro"]
-                escolha = st.selectbox("Ação", opcoes)
-                if escolha == "Outro":
-                    ativo = st.text_input("Ticker da ação (ex: PETR4, VALE3)")
-                else:
-                    ativo = escolha
-                ativo_label = ativo
-            elif tipo == "FII":
-                opcoes = list(FII_TICKERS.keys()) + ["Outro"]
-                escolha = st.selectbox("FII", opcoes)
-                if escolha == "Outro":
-                    ativo = st.text_input("Ticker do FII (ex: MXRF11)")
-                else:
-                    ativo = escolha
-                ativo_label = ativo
+        if tipo == "Criptomoeda":
+            opcoes = list(CRYPTO_TICKERS.keys()) + ["Outro"]
+            escolha = st.selectbox("Cripto", opcoes)
+            if escolha == "Outro":
+                ativo = st.text_input("Ticker da cripto (ex: XRP, DOGE)")
             else:
-                ativo = st.text_input("Descrição do ativo")
-                ativo_label = ativo
+                ativo = escolha
+            ativo_label = ativo
+        elif tipo == "Ação":
+            opcoes = list(ACAO_TICKERS.keys()) + ["Outro"]
+            escolha = st.selectbox("Ação", opcoes)
+            if escolha == "Outro":
+                ativo = st.text_input("Ticker da ação (ex: PETR4, VALE3)")
+            else:
+                ativo = escolha
+            ativo_label = ativo
+        elif tipo == "FII":
+            opcoes = list(FII_TICKERS.keys()) + ["Outro"]
+            escolha = st.selectbox("FII", opcoes)
+            if escolha == "Outro":
+                ativo = st.text_input("Ticker do FII (ex: MXRF11)")
+            else:
+                ativo = escolha
+            ativo_label = ativo
+        else:
+            ativo = st.text_input("Descrição do ativo")
+            ativo_label = ativo
+
+        # Tipo/ativo ficam fora do form para que a escolha do ticker já
+        # dispare a busca da cotação em segundo plano.
+        usa_cotacao = tipo in ["Criptomoeda", "Ação", "FII"]
+
+        if usa_cotacao and ativo_label:
+            prefetch_asset_price_brl(tipo, ativo_label)
+            pronto, preco_previo = wait_asset_price_brl(tipo, ativo_label)
+            if not pronto:
+                st.caption("Buscando cotação...")
+            elif preco_previo is None:
+                st.caption("Cotação indisponível para este ticker.")
+            elif asset_price_stale(tipo, ativo_label):
+                st.caption(
+                    f"Última cotação conhecida: R$ {preco_previo:,.2f} "
+                    "(Yahoo indisponível no momento)"
+                )
+            else:
+                st.caption(f"Cotação atual: R$ {preco_previo:,.2f}")
+
+        with st.form("form_patrimonio"):
+            operacao = st.radio(
+                "Operação",
+                ["Compra", "Venda"],
+                horizontal=True,
+                help="Vendas consomem os lotes mais antigos do ativo (FIFO).",
+            )
+            data_pat = st.date_input("Data do lançamento", value=datetime.today())
 
             qtd = st.number_input(
                 "Quantidade",
@@ -549,8 +668,6 @@ def lancamentos_page():
                 help="Para 'Outro', pode usar 1 e informar o valor total.",
             )
 
-            usa_cotacao = tipo in ["Criptomoeda", "Ação", "FII"]
-
             valor_manual = None
             if not usa_cotacao:
                 valor_manual = st.number_input(
@@ -564,17 +681,32 @@ def lancamentos_page():
             submitted_pat = st.form_submit_button("Adicionar patrimônio")
 
             if submitted_pat:
+                em_carteira = None
+                if operacao == "Venda" and ativo_label:
+                    em_carteira = user_position_book().quantity(tipo, ativo_label)
+
                 if not ativo_label:
                     st.error("Informe o ativo.")
                 elif qtd <= 0:
                     st.error("Quantidade deve ser maior que zero.")
+                elif em_carteira is not None and qtd > em_carteira + QTD_EPS:
+                    st.error(
+                        f"Quantidade maior que a posição em carteira ({em_carteira:,.4f})."
+                    )
                 else:
                     preco = 0.0
                     valor_total = 0.0
 
                     if usa_cotacao:
-                        preco = get_asset_price_brl(tipo, ativo_label)
-                        if preco is None:
+                        pronto, preco = wait_asset_price_brl(
+                            tipo, ativo_label, timeout=QUOTE_SUBMIT_WAIT
+                        )
+                        if not pronto:
+                            st.warning(
+                                "A cotação ainda está sendo buscada. "
+                                "Tente enviar novamente em instantes."
+                            )
+                        elif preco is None:
                             st.error(
                                 "Não foi possível obter a cotação. "
                                 "Confirme o ticker ou tente novamente."
@@ -591,82 +723,120 @@ def lancamentos_page():
                     if (usa_cotacao and preco is not None and preco > 0) or (
                         not usa_cotacao and valor_manual is not None and valor_manual > 0
                     ):
+                        # Venda: quantidade e valor negativos (saem da posição).
+                        sinal = -1.0 if operacao == "Venda" else 1.0
                         nova_linha = {
                             "Data": str(data_pat),
                             "Tipo": tipo,
                             "Ativo": ativo_label.upper(),
-                            "Quantidade": float(qtd),
+                            "Quantidade": sinal * float(qtd),
                             "Preço_R$": float(preco),
-                            "Valor_Total_R$": float(valor_total),
+                            "Valor_Total_R$": sinal * float(valor_total),
                         }
 
-                        df_p = normalize_df_patrimonio(
-                            st.session_state.get("df_patrimonio", pd.DataFrame())
-                        )
-                        df_p = pd.concat([df_p, pd.DataFrame([nova_linha])], ignore_index=True)
-
-                        st.session_state["df_patrimonio"] = df_p
+                        add_user_entry("patrimonio", nova_linha)
 
-                        if "user_email" in st.session_state:
-                            save_user_data(st.session_state["user_email"])
-
-                        st.success("Patrimônio adicionado.")
+                        st.success(
+                            "Venda registrada." if operacao == "Venda" else "Patrimônio adicionado."
+                        )
                         st.rerun()
 
         st.markdown("### Patrimônio lançado (clique para editar ou excluir)")
-        df_p_view = normalize_df_patrimonio(st.session_state.get("df_patrimonio"))
-        edited_p = st.data_editor(
-            df_p_view,
-            num_rows="dynamic",
-            key="editor_patrimonio",
-            use_container_width=True,
+        ledger_editor("patrimonio", "Patrimônio atualizado.")
+
+    # ========== IMPORTAR EXTRATO ==========
+    with tab_importar:
+        st.subheader("Importar extrato (CSV ou OFX)")
+        resumo = st.session_state.pop("_resumo_importacao", None)
+        if resumo:
+            st.success(resumo)
+        st.caption(
+            "Colunas reconhecidas no CSV: Data, Descrição/Histórico, Valor e "
+            "(opcional) Categoria. Lançamentos já existentes são ignorados."
         )
-        edited_p = normalize_df_patrimonio(edited_p)
-
-        if not edited_p.reset_index(drop=True).equals(df_p_view.reset_index(drop=True)):
-            st.session_state["df_patrimonio"] = edited_p
-            if "user_email" in st.session_state:
-                save_user_data(st.session_state["user_email"])
-            st.success("Patrimônio atualizado.")
+        arquivo = st.file_uploader("Arquivo do extrato", type=["csv", "ofx"])
+        modo_label = st.radio(
+            "Importar como",
+            ["Pelo sinal do valor", "Tudo como receita", "Tudo como despesa"],
+            horizontal=True,
+        )
+        modo = {
+            "Pelo sinal do valor": "sinal",
+            "Tudo como receita": "receitas",
+            "Tudo como despesa": "despesas",
+        }[modo_label]
+
+        if st.button("Importar", disabled=arquivo is None):
+            formato = "ofx" if arquivo.name.lower().endswith(".ofx") else "csv"
+            try:
+                with st.spinner("Importando..."):
+                    resultado = import_statement(
+                        arquivo,
+                        modo,
+                        user_typed_frame("receitas"),
+                        user_typed_frame("despesas"),
+                        formato=formato,
+                    )
+            except Exception as e:
+                st.error(f"Não foi possível ler o extrato: {e}")
+            else:
+                for kind in ("receitas", "despesas"):
+                    add_user_entries(kind, resultado[kind])
+
+                importadas = len(resultado["receitas"]) + len(resultado["despesas"])
+                st.session_state["_resumo_importacao"] = (
+                    f"{importadas} lançamentos importados "
+                    f"({len(resultado['receitas'])} receitas, "
+                    f"{len(resultado['despesas'])} despesas) de "
+                    f"{resultado['lidas']} linhas lidas; "
+                    f"{resultado['duplicadas']} duplicadas e "
+                    f"{resultado['invalidas']} inválidas ignoradas "
+                    f"({resultado['linhas_por_segundo']:,.0f} linhas/s)."
+                )
+                st.rerun()
 
 
 # ==============================
 # PÁGINA DE DASHBOARD
 # ==============================
 
+@timed("dashboard.line_chart")
+def line_chart(data):
+    """
+    st.line_chart medido (serialização dos dados do gráfico). Séries por
+    data passam antes por `charts.chart_series`, na resolução escolhida na
+    barra lateral e com número máximo de pontos.
+    """
+    if isinstance(data, pd.Series) and isinstance(data.index, pd.DatetimeIndex):
+        rotulo = st.session_state.get("grafico_resolucao", RESOLUCAO_PADRAO)
+        data = chart_series(data, RESOLUCOES.get(rotulo))
+    st.line_chart(data, use_container_width=True)
+
+
+@timed("page.dashboard")
 def dashboard_page():
     st.title("Dashboard")
 
     init_empty_user_frames()
 
-    df_r = normalize_df_receitas_despesas(st.session_state.get("df_receitas"))
-    df_d = normalize_df_receitas_despesas(st.session_state.get("df_despesas"))
-    df_p = normalize_df_patrimonio(st.session_state.get("df_patrimonio"))
-
-    df_r = parse_date_column(df_r)
-    df_d = parse_date_column(df_d)
-    df_p = parse_date_column(df_p)
+    # Frames normalizados e tipados só são refeitos quando os dados mudam.
+    df_r = user_typed_frame("receitas")
+    df_d = user_typed_frame("despesas")
+    df_p = user_typed_frame("patrimonio")
 
     # ------------------------------
     # FILTRO DE MÊS / ANO
     # ------------------------------
     st.sidebar.subheader("Filtro de período (Receita/Despesa)")
 
-    datas = []
-    if not df_r.empty:
-        datas.extend(df_r["Data"].dropna().tolist())
-    if not df_d.empty:
-        datas.extend(df_d["Data"].dropna().tolist())
+    idx_r = user_monthly_index("receitas")
+    idx_d = user_monthly_index("despesas")
 
-    if datas:
-        min_data = min(datas)
-        max_data = max(datas)
+    anos_com_dados = idx_r.anos() + idx_d.anos()
+    if anos_com_dados:
+        anos = list(range(min(anos_com_dados), max(anos_com_dados) + 1))
     else:
-        hoje = datetime.today()
-        min_data = max_data = hoje
-
-    anos = list(range(min_data.year, max_data.year + 1))
-    anos = sorted(list(set(anos)))
+        anos = [datetime.today().year]
 
     ano_sel = st.sidebar.selectbox("Ano", options=anos, index=len(anos) - 1)
     mes_sel = st.sidebar.selectbox(
@@ -676,25 +846,27 @@ def dashboard_page():
         format_func=lambda m: f"{m:02d}",
     )
 
+    st.sidebar.subheader("Gráficos")
+    st.sidebar.selectbox(
+        "Resolução das linhas",
+        options=list(RESOLUCOES),
+        index=list(RESOLUCOES).index(RESOLUCAO_PADRAO),
+        key="grafico_resolucao",
+        help="Saldo e patrimônio ficam com o último valor de cada período; "
+        "históricos longos ainda são reduzidos preservando picos e vales.",
+    )
+
     # ------------------------------
     # DASHBOARD RECEITA x DESPESA
     # ------------------------------
 
     st.subheader("Receitas x Despesas do mês")
 
-    def filtra_mes(df):
-        if df.empty:
-            return df
-        df = df.copy()
-        df["Ano"] = df["Data"].dt.year
-        df["Mes"] = df["Data"].dt.month
-        return df[(df["Ano"] == ano_sel) & (df["Mes"] == mes_sel)]
+    df_r_mes = idx_r.slice(df_r, ano_sel, mes_sel)
+    df_d_mes = idx_d.slice(df_d, ano_sel, mes_sel)
 
-    df_r_mes = filtra_mes(df_r)
-    df_d_mes = filtra_mes(df_d)
-
-    total_rec_mes = df_r_mes["Valor"].sum() if not df_r_mes.empty else 0.0
-    total_desp_mes = df_d_mes["Valor"].sum() if not df_d_mes.empty else 0.0
+    total_rec_mes = idx_r.total(ano_sel, mes_sel)
+    total_desp_mes = idx_d.total(ano_sel, mes_sel)
     saldo_mes = total_rec_mes - total_desp_mes
 
     c1, c2, c3 = st.columns(3)
@@ -705,41 +877,67 @@ def dashboard_page():
     # Lançamentos do mês (linha a linha)
     st.markdown("#### Lançamentos do mês (linha a linha)")
 
-    if not df_r_mes.empty:
-        df_r_mes_view = df_r_mes[["Data", "Categoria", "Descrição", "Valor"]].copy()
-        df_r_mes_view["Tipo"] = "Receita"
-    else:
-        df_r_mes_view = pd.DataFrame(columns=["Data", "Categoria", "Descrição", "Valor", "Tipo"])
+    df_ld = combine_entries(df_r_mes, df_d_mes)
 
-    if not df_d_mes.empty:
-        df_d_mes_view = df_d_mes[["Data", "Categoria", "Descrição", "Valor"]].copy()
-        df_d_mes_view["Tipo"] = "Despesa"
+    if not df_ld.empty:
+        st.dataframe(df_ld, use_container_width=True)
+
+        st.markdown("#### Saldo acumulado no mês")
+        line_chart(running_balance(df_ld))
     else:
-        df_d_mes_view = pd.DataFrame(columns=["Data", "Categoria", "Descrição", "Valor", "Tipo"])
+        st.info("Nenhum lançamento para o mês selecionado.")
 
-    df_ld = pd.concat([df_r_mes_view, df_d_mes_view], ignore_index=True) if not (
-        df_r_mes_view.empty and df_d_mes_view.empty
-    ) else pd.DataFrame(columns=["Data", "Categoria", "Descrição", "Valor", "Tipo"])
+    if st.toggle("Mostrar saldo acumulado de todo o histórico", key="saldo_historico"):
+        st.markdown("#### Saldo acumulado (todo o histórico)")
+        saldo_total = user_history_balance()
+        if saldo_total.empty:
+            st.info("Nenhum lançamento ainda.")
+        else:
+            line_chart(saldo_total)
 
-    if not df_ld.empty:
-        df_ld = df_ld.sort_values("Data")
-        st.dataframe(df_ld, use_container_width=True)
+    st.markdown("---")
 
-        df_ld_plot = df_ld.copy()
-        df_ld_plot["Data"] = df_ld_plot["Data"].dt.strftime("%Y-%m-%d")
-        df_ld_plot["Valor_signed"] = df_ld_plot.apply(
-            lambda row: row["Valor"] if row["Tipo"] == "Receita" else -row["Valor"],
-            axis=1,
-        )
-        df_ld_plot["Saldo_acumulado"] = df_ld_plot["Valor_signed"].cumsum()
+    # ------------------------------
+    # ANÁLISE POR CATEGORIA
+    # ------------------------------
+    st.subheader("Análise por categoria")
 
-        st.markdown("#### Saldo acumulado no mês (por lançamento)")
-        st.line_chart(
-            df_ld_plot.set_index("Data")["Saldo_acumulado"],
-            use_container_width=True,
-        )
+    c1, c2 = st.columns(2)
+    tipo_analise = c1.radio(
+        "Lançamentos", ["Despesas", "Receitas"], horizontal=True, key="analise_tipo"
+    )
+    janela = c2.selectbox(
+        "Média móvel (meses)",
+        options=list(JANELAS_CATEGORIA),
+        key="analise_janela",
+    )
+
+    analise = user_category_analytics(tipo_analise.lower())
+    if not len(analise):
+        st.info("Nenhum lançamento ainda.")
     else:
-        st.info("Nenhum lançamento para o mês selecionado.")
+        st.markdown(f"#### Por categoria em {mes_sel:02d}/{ano_sel}")
+        tabela = analise.month_table(ano_sel, mes_sel)
+        if tabela.empty:
+            st.info("Mês selecionado fora do histórico de lançamentos.")
+        else:
+            st.dataframe(
+                tabela,
+                hide_index=True,
+                use_container_width=True,
+                column_config={
+                    col: st.column_config.NumberColumn(format="R$ %.2f")
+                    for col in tabela.columns
+                    if col not in ("Categoria", "Δ %")
+                }
+                | {"Δ %": st.column_config.NumberColumn(format="%.1f%%")},
+            )
+
+        st.markdown("#### Total por mês e categoria (últimos 12 meses)")
+        st.bar_chart(analise.pivot().tail(12), use_container_width=True)
+
+        st.markdown(f"#### Média móvel de {janela} meses por categoria")
+        line_chart(analise.rolling_mean(janela))
 
     st.markdown("---")
 
@@ -749,19 +947,100 @@ def dashboard_page():
     st.subheader("Evolução do Patrimônio Total")
 
     if not df_p.empty:
-        df_p_evol = df_p.copy()
-        df_p_evol = df_p_evol.sort_values("Data")
-        df_p_evol["Valor_Total_R$"] = df_p_evol["Valor_Total_R$"].astype(float)
-        df_p_evol["Patrimonio_Acumulado"] = df_p_evol["Valor_Total_R$"].cumsum()
-        df_p_evol["Data_str"] = df_p_evol["Data"].dt.strftime("%Y-%m-%d")
-
-        st.line_chart(
-            df_p_evol.set_index("Data_str")["Patrimonio_Acumulado"],
-            use_container_width=True,
+        def evolucao():
+            df_p_evol = df_p.copy()
+            df_p_evol = df_p_evol.sort_values("Data")
+            df_p_evol["Valor_Total_R$"] = df_p_evol["Valor_Total_R$"].astype(float)
+            df_p_evol["Patrimonio_Acumulado"] = df_p_evol["Valor_Total_R$"].cumsum()
+            return df_p_evol
+
+        indice_evol = user_table_index(
+            "patrimonio_evolucao", st.session_state.get("df_patrimonio_versao", 0), evolucao
         )
+        df_p_evol = indice_evol.df
+
+        usa_historico = st.toggle(
+            "Valor de mercado em cada data (histórico de cotações)",
+            key="patrimonio_historico",
+            help="Usa os fechamentos diários guardados localmente; só datas "
+            "ainda não baixadas são buscadas no Yahoo.",
+        )
+
+        if usa_historico:
+            with st.spinner("Carregando histórico de cotações..."):
+                serie_mercado = portfolio_value_history(df_p)
+            line_chart(serie_mercado)
+        else:
+            line_chart(df_p_evol.set_index("Data")["Patrimonio_Acumulado"])
 
         st.markdown("#### Lançamentos de patrimônio")
-        st.dataframe(df_p_evol, use_container_width=True)
+        posicoes, _ = table_window("tabela_patrimonio_evolucao", indice_evol)
+        st.dataframe(df_p_evol.iloc[posicoes], use_container_width=True)
+
+        # ------------------------------
+        # POSIÇÕES E LOTES (FIFO)
+        # ------------------------------
+        st.markdown("#### Posições em carteira (lotes FIFO)")
+        book = user_position_book()
+        df_book = book.positions()
+
+        c1, c2 = st.columns(2)
+        c1.metric("Custo dos lotes em carteira", f"R$ {df_book['Custo_R$'].sum():,.2f}")
+        c2.metric("Resultado realizado (vendas)", f"R$ {df_book['Realizado_R$'].sum():,.2f}")
+        st.dataframe(df_book, hide_index=True, use_container_width=True)
+
+        with st.expander("Lotes em aberto"):
+            st.dataframe(book.lots(), hide_index=True, use_container_width=True)
+
+        # ------------------------------
+        # MARCAÇÃO A MERCADO (COTAÇÃO ATUAL)
+        # ------------------------------
+        st.markdown("#### Posições a preço de mercado")
+        if st.toggle(
+            "Reavaliar agora pela cotação atual",
+            key="reavaliar_patrimonio",
+            help="Busca em paralelo a cotação atual de todos os ativos da carteira.",
+        ):
+            with st.spinner("Buscando cotações..."):
+                df_pos = revalue_positions(df_p, book=book)
+
+            investido = df_pos["Valor_Investido_R$"].sum()
+            atual = df_pos["Valor_Atual_R$"].sum()
+
+            c1, c2, c3 = st.columns(3)
+            c1.metric("Valor investido", f"R$ {investido:,.2f}")
+            c2.metric("Valor atual", f"R$ {atual:,.2f}")
+            c3.metric(
+                "Variação",
+                f"R$ {atual - investido:,.2f}",
+                f"{(atual / investido - 1) * 100:.2f}%" if investido else None,
+            )
+
+            desatualizados = [
+                ativo
+                for tipo, ativo in zip(df_pos["Tipo"], df_pos["Ativo"])
+                if asset_price_stale(tipo, ativo)
+            ]
+            if desatualizados:
+                st.warning(
+                    "Yahoo indisponível: usando a última cotação conhecida para "
+                    + ", ".join(desatualizados)
+                    + "."
+                )
+
+            sem_cotacao = (
+                df_pos["Preço_Atual_R$"].isna()
+                & (df_pos["Tipo"] != "Outro")
+                & (df_pos["Quantidade"] != 0)
+            )
+            if sem_cotacao.any():
+                st.warning(
+                    "Sem cotação para: "
+                    + ", ".join(df_pos.loc[sem_cotacao, "Ativo"])
+                    + " (mantido o valor investido)."
+                )
+
+            st.dataframe(df_pos, use_container_width=True)
     else:
         st.info("Nenhum patrimônio lançado ainda.")
 
@@ -770,29 +1049,71 @@ def dashboard_page():
 # MAIN
 # ==============================
 
+def metrics_panel(trace: list):
+    """Painel "Desempenho" (só para ADMIN_EMAILS) com os tempos medidos."""
+    email = str(st.session_state.get("user_email", "")).lower()
+    if email not in ADMIN_EMAILS:
+        return
+
+    with st.sidebar.expander("Desempenho"):
+        ligado = st.toggle(
+            "Coletar métricas",
+            value=instrumentation.enabled(),
+            key="_coletar_metricas",
+            help="Vale para o processo todo (todas as sessões).",
+        )
+        if ligado != instrumentation.enabled():
+            instrumentation.set_enabled(ligado)
+            st.rerun()
+        if not ligado:
+            return
+
+        st.markdown("**Esta execução**")
+        if trace:
+            st.dataframe(pd.DataFrame(trace), hide_index=True, use_container_width=True)
+        else:
+            st.caption("Nada medido nesta execução.")
+
+        st.markdown("**Acumulado do processo**")
+        st.dataframe(
+            pd.DataFrame(instrumentation.registry.snapshot()),
+            hide_index=True,
+            use_container_width=True,
+        )
+        if st.button("Zerar métricas"):
+            instrumentation.registry.reset()
+            st.rerun()
+
+
 def main():
     authenticated = st.session_state.get("authenticated", False)
 
-    if not authenticated:
-        login_page()
-    else:
-        email = st.session_state.get("user_email", "Desconhecido")
-        st.sidebar.markdown(f"**Usuário:** {email}")
+    with instrumentation.rerun_trace() as trace:
+        if not authenticated:
+            login_page()
+        else:
+            sync_user_data()
 
-        if st.sidebar.button("Logout"):
-            if "user_email" in st.session_state:
-                save_user_data(st.session_state["user_email"])
+            email = st.session_state.get("user_email", "Desconhecido")
+            st.sidebar.markdown(f"**Usuário:** {email}")
 
-            for key in list(st.session_state.keys()):
-                del st.session_state[key]
-            st.rerun()
+            # Cada alteração já foi gravada no log quando aconteceu; o logout
+            # só limpa a sessão (um snapshot aqui apagaria gravações de outras
+            # abas/réplicas feitas depois do último sync).
+            if st.sidebar.button("Logout"):
+                for key in list(st.session_state.keys()):
+                    del st.session_state[key]
+                st.rerun()
 
-        pagina = st.sidebar.radio("Menu", ["Lançamentos", "Dashboard"])
+            pagina = st.sidebar.radio("Menu", ["Lançamentos", "Dashboard"])
 
-        if pagina == "Lançamentos":
-            lancamentos_page()
-        else:
-            dashboard_page()
+            if pagina == "Lançamentos":
+                lancamentos_page()
+            else:
+                dashboard_page()
+
+    if authenticated:
+        metrics_panel(trace)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,86 @@
+"""
+Análise por categoria: `aggregates.CategoryAnalytics` contra pandas.
+
+O caminho "pandas" é o que se escreveria direto no app: `pivot_table` por
+mês x categoria, `reindex` para o calendário contínuo, `rolling(N).mean()`
+para as médias móveis e `diff`/`pct_change` para a variação mensal. O
+`CategoryAnalytics` faz a mesma conta com um único `np.bincount` e somas
+acumuladas. Confere que os dois chegam aos mesmos números.
+
+Uso (na raiz do projeto):
+    python benchmarks/bench_category.py --rows 10000 100000 --repeat 5
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from frames import typed_frame  # noqa: E402
+from aggregates import CategoryAnalytics, JANELAS_CATEGORIA  # noqa: E402
+from bench_session_memory import synthetic_records  # noqa: E402
+
+
+def via_pandas(df: pd.DataFrame) -> dict:
+    mes = df["Data"].dt.to_period("M")
+    pivot = df.pivot_table(
+        index=mes, columns="Categoria", values="Valor", aggfunc="sum", fill_value=0.0
+    )
+    pivot = pivot.reindex(
+        pd.period_range(pivot.index.min(), pivot.index.max(), freq="M"), fill_value=0.0
+    )
+    return {
+        "pivot": pivot,
+        "medias": {j: pivot.rolling(j, min_periods=1).mean() for j in JANELAS_CATEGORIA},
+        "delta": pivot.diff(),
+    }
+
+
+def via_analytics(df: pd.DataFrame) -> dict:
+    analytics = CategoryAnalytics.from_frame(df)
+    return {
+        "pivot": analytics.pivot(),
+        "medias": {j: analytics.rolling_mean(j) for j in JANELAS_CATEGORIA},
+        "delta": analytics.month_delta(),
+    }
+
+
+def medir(fn, df, repeat: int) -> tuple:
+    melhor = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        resultado = fn(df)
+        melhor = min(melhor, time.perf_counter() - t0)
+    return melhor * 1000, resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'linhas':>9} {'meses':>6} | {'pandas (ms)':>12} {'CategoryAnalytics (ms)':>23}")
+    for n in args.rows:
+        df = typed_frame("despesas", pd.DataFrame(synthetic_records(n)["despesas"]))
+        t_pd, ref = medir(via_pandas, df, args.repeat)
+        t_ca, novo = medir(via_analytics, df, args.repeat)
+
+        np.testing.assert_allclose(novo["pivot"].to_numpy(), ref["pivot"].to_numpy())
+        for j in JANELAS_CATEGORIA:
+            np.testing.assert_allclose(
+                novo["medias"][j].to_numpy(), ref["medias"][j].to_numpy(), atol=1e-6
+            )
+        np.testing.assert_allclose(
+            novo["delta"].to_numpy()[1:], ref["delta"].to_numpy()[1:], atol=1e-6
+        )
+        print(f"{len(df):>9} {len(ref['pivot']):>6} | {t_pd:>12.1f} {t_ca:>23.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Gráficos de linha do dashboard: série inteira contra `charts.chart_series`.
+
+Monta o saldo acumulado de históricos sintéticos (vários lançamentos por
+dia) e compara o que vai para o `st.line_chart` sem redução (um ponto por
+lançamento) e depois de agregar por dia/semana/mês e aplicar LTTB até
+FINANCE_CHART_MAX_POINTS pontos: pontos, bytes serializados (Arrow, como o
+Streamlit faz) e tempo de preparo. Também confere se o LTTB manteve o
+mínimo e o máximo da série agregada.
+
+Uso (na raiz do projeto):
+    python benchmarks/bench_charts.py --rows 10000 100000 1000000
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+from streamlit.dataframe_util import convert_anything_to_arrow_bytes
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from charts import CHART_MAX_POINTS, RESOLUCOES, chart_series, resample_last  # noqa: E402
+
+
+def saldo_sintetico(n: int, seed: int = 0) -> pd.Series:
+    rng = np.random.default_rng(seed)
+    datas = np.sort(
+        np.datetime64("2000-01-01") + rng.integers(0, 25 * 365, n).astype("timedelta64[D]")
+    )
+    valores = rng.normal(10, 500, n)
+    return pd.Series(np.cumsum(valores), index=pd.DatetimeIndex(datas, name="Data"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    print(f"máximo de {CHART_MAX_POINTS} pontos")
+    for n in args.rows:
+        serie = saldo_sintetico(n)
+        bruto = convert_anything_to_arrow_bytes(serie.to_frame())
+        print(f"{n} lançamentos: série inteira {len(serie)} pontos, {len(bruto) / 1024:9.1f} KiB")
+        for rotulo, resolucao in RESOLUCOES.items():
+            t0 = time.perf_counter()
+            reduzida = chart_series(serie, resolucao)
+            t = (time.perf_counter() - t0) * 1000
+            corpo = convert_anything_to_arrow_bytes(reduzida.to_frame())
+            agregada = resample_last(serie, resolucao)
+            extremos = reduzida.min() == agregada.min() and reduzida.max() == agregada.max()
+            print(
+                f"  {rotulo:<11} {len(reduzida):6d} pontos, {len(corpo) / 1024:7.1f} KiB, "
+                f"{t:7.2f} ms, mín/máx preservados: {'sim' if extremos else 'não'}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Benchmark: troca do filtro de mês no dashboard com e sem a memorização dos
+frames tipados.
+
+Simula um histórico de N linhas e K reruns trocando só o mês selecionado.
+Sem cache, cada rerun normaliza e faz `pd.to_datetime` da coluna inteira;
+com cache, as datas são convertidas uma única vez.
+
+Uso (na raiz do projeto):
+    python benchmarks/bench_dashboard_cache.py --rows 100000 --reruns 12
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import frames  # noqa: E402
+
+
+def synthetic_receitas(rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    dias = pd.Timestamp("2015-01-01") + pd.to_timedelta(
+        rng.integers(0, 365 * 10, rows), unit="D"
+    )
+    return pd.DataFrame(
+        {
+            "Data": dias.strftime("%Y-%m-%d"),
+            "Categoria": rng.choice(["Salário", "Freela", "Aluguel"], rows),
+            "Descrição": "",
+            "Valor": rng.uniform(10, 5000, rows).round(2),
+        }
+    )
+
+
+def filtra_mes(df: pd.DataFrame, ano: int, mes: int) -> pd.DataFrame:
+    return df[(df["Data"].dt.year == ano) & (df["Data"].dt.month == mes)]
+
+
+class ContaToDatetime:
+    """Conta as chamadas de pd.to_datetime durante o benchmark."""
+
+    def __init__(self):
+        self.chamadas = 0
+        self._original = pd.to_datetime
+
+    def __enter__(self):
+        def wrapper(*args, **kwargs):
+            self.chamadas += 1
+            return self._original(*args, **kwargs)
+
+        pd.to_datetime = wrapper
+        return self
+
+    def __exit__(self, *exc):
+        pd.to_datetime = self._original
+
+
+def rerun_sem_cache(df_raw, ano, mes):
+    df = frames.parse_date_column(frames.normalize_df_receitas_despesas(df_raw))
+    return filtra_mes(df, ano, mes)["Valor"].sum()
+
+
+def rerun_com_cache(store, df_raw, versao, ano, mes):
+    df = frames.cached_typed_frame(store, "receitas", df_raw, versao)
+    return filtra_mes(df, ano, mes)["Valor"].sum()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--reruns", type=int, default=12)
+    args = parser.parse_args()
+
+    df_raw = synthetic_receitas(args.rows)
+    meses = [(2020, m) for m in range(1, 13)] * (args.reruns // 12 + 1)
+    meses = meses[: args.reruns]
+
+    with ContaToDatetime() as conta:
+        t0 = time.perf_counter()
+        for ano, mes in meses:
+            rerun_sem_cache(df_raw, ano, mes)
+        t_sem = time.perf_counter() - t0
+    chamadas_sem = conta.chamadas
+
+    store = {}
+    with ContaToDatetime() as conta:
+        t0 = time.perf_counter()
+        rerun_com_cache(store, df_raw, 1, *meses[0])  # primeiro render (dados novos)
+        t_primeiro = time.perf_counter() - t0
+        chamadas_primeiro = conta.chamadas
+
+        t0 = time.perf_counter()
+        for ano, mes in meses:
+            rerun_com_cache(store, df_raw, 1, ano, mes)
+        t_com = time.perf_counter() - t0
+    chamadas_trocas = conta.chamadas - chamadas_primeiro
+
+    print(f"linhas: {args.rows:,}  reruns trocando o mês: {args.reruns}")
+    print(
+        f"sem cache: {t_sem / args.reruns * 1000:8.2f} ms/rerun  "
+        f"pd.to_datetime: {chamadas_sem} chamadas"
+    )
+    print(f"com cache: primeiro render {t_primeiro * 1000:8.2f} ms")
+    print(
+        f"com cache: {t_com / args.reruns * 1000:8.2f} ms/rerun  "
+        f"pd.to_datetime nas trocas de mês: {chamadas_trocas} chamadas"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Vazão da importação de extratos (`importer.import_statement`).
+
+Gera um CSV sintético no formato de extrato brasileiro (';', datas
+DD/MM/AAAA, valores '1.234,56'), importa em blocos e importa de novo sobre
+o resultado (tudo deve sair como duplicata). Mostra linhas/s e o pico de
+memória residente do processo.
+
+Uso (na raiz do projeto):
+    python benchmarks/bench_import.py --rows 500000 --chunksize 50000
+"""
+
+import os
+import sys
+import argparse
+import resource
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from importer import import_statement, IMPORT_CHUNKSIZE  # noqa: E402
+
+
+def write_statement(path: str, rows: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    datas = (
+        pd.Timestamp("2015-01-01")
+        + pd.to_timedelta(rng.integers(0, 365 * 10, rows), unit="D")
+    ).strftime("%d/%m/%Y")
+    valores = rng.uniform(-5000, 5000, rows).round(2)
+    descricoes = rng.choice(["Mercado", "Aluguel", "Salário", "Pix", "Farmácia"], rows)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("Data;Histórico;Valor (R$)\n")
+        for data, desc, valor in zip(datas, descricoes, valores.tolist()):
+            f.write(f"{data};{desc} {int(abs(valor)) % 997};{valor:.2f}".replace(".", ",") + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--chunksize", type=int, default=IMPORT_CHUNKSIZE)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "extrato.csv")
+        write_statement(path, args.rows)
+        print(f"extrato: {args.rows:,} linhas, {os.path.getsize(path) / 1e6:.1f} MB")
+
+        vazio = pd.DataFrame(columns=["Data", "Categoria", "Descrição", "Valor"])
+        primeira = import_statement(path, "sinal", vazio, vazio, chunksize=args.chunksize)
+        novas = len(primeira["receitas"]) + len(primeira["despesas"])
+        print(
+            f"importação:  {primeira['segundos']:.2f} s, "
+            f"{primeira['linhas_por_segundo']:,.0f} linhas/s, "
+            f"{novas:,} novas, {primeira['duplicadas']:,} duplicadas, "
+            f"{primeira['invalidas']:,} inválidas"
+        )
+
+        segunda = import_statement(
+            path,
+            "sinal",
+            primeira["receitas"],
+            primeira["despesas"],
+            chunksize=args.chunksize,
+        )
+        novas = len(segunda["receitas"]) + len(segunda["despesas"])
+        print(
+            f"reimportação: {segunda['segundos']:.2f} s, "
+            f"{segunda['linhas_por_segundo']:,.0f} linhas/s, "
+            f"{novas:,} novas, {segunda['duplicadas']:,} duplicadas"
+        )
+
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"pico de memória residente: {pico:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
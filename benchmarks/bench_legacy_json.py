@@ -0,0 +1,117 @@
+"""
+Leitura e gravação do `user_data.json` legado: formato antigo contra o indexado.
+
+Antigo: `json.load` do arquivo inteiro para ler um usuário e `json.dump`
+com indent=2 de todos para gravar. Novo (`storage` com
+FINANCE_STORAGE_BACKEND=json): arquivo compacto gravado pelo codec de
+`json_codec`, com índice de trechos por usuário; ler um usuário decodifica
+só o trecho dele e alterar um usuário copia os demais como bytes.
+
+Uso (na raiz do projeto):
+    python benchmarks/bench_legacy_json.py --users 1 100 10000 --rows 20
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import storage  # noqa: E402
+import json_codec  # noqa: E402
+from bench_session_memory import synthetic_records  # noqa: E402
+
+
+def old_save(data: dict):
+    with open(storage.DATA_FILE, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+def old_load_user(email: str) -> dict:
+    with open(storage.DATA_FILE, "r", encoding="utf-8") as f:
+        return json.load(f).get(email) or {}
+
+
+def old_update_user(email: str, update):
+    with open(storage.DATA_FILE, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    data[email] = update(data.get(email))
+    old_save(data)
+
+
+def medir(func, *args, repeat: int = 3) -> float:
+    melhor = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        func(*args)
+        melhor = min(melhor, time.perf_counter() - t0)
+    return melhor * 1000
+
+
+def novo_load_frio(email: str):
+    # Sem o índice em memória: lê o .idx do disco (como um processo novo).
+    storage._legacy_index_cache.clear()
+    return storage.load_legacy_user(email)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 100, 10_000])
+    parser.add_argument("--rows", type=int, default=20, help="lançamentos por usuário")
+    args = parser.parse_args()
+
+    print(f"codec: {json_codec.codec.name}, {args.rows} lançamentos por usuário")
+    print(
+        f"{'usuários':>9} | {'arquivo (MB)':>13} | {'gravar todos (ms)':>18} | "
+        f"{'ler 1 usuário (ms)':>24} | {'alterar 1 usuário (ms)':>22}"
+    )
+    print(
+        f"{'':>9} | {'antigo  novo':>13} | {'antigo    novo':>18} | "
+        f"{'antigo  novo frio/quente':>24} | {'antigo    novo':>22}"
+    )
+
+    registros = synthetic_records(args.rows)
+    cwd = os.getcwd()
+    for n in args.users:
+        data = {f"usuario{i}@example.com": registros for i in range(n)}
+        alvo = f"usuario{n // 2}@example.com"
+
+        def update(user_data):
+            user_data = dict(user_data or {})
+            user_data["receitas"] = list(user_data.get("receitas", [])) + [
+                {"Data": "2024-01-01", "Categoria": "X", "Descrição": "", "Valor": 1.0}
+            ]
+            return user_data
+
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            try:
+                t_old_save = medir(old_save, data)
+                size_old = os.path.getsize(storage.DATA_FILE)
+                t_old_load = medir(old_load_user, alvo)
+                t_old_update = medir(old_update_user, alvo, update)
+
+                os.remove(storage.DATA_FILE)
+                t_new_save = medir(storage.save_all_data, data)
+                size_new = os.path.getsize(storage.DATA_FILE)
+                t_new_cold = medir(novo_load_frio, alvo)
+                t_new_warm = medir(storage.load_legacy_user, alvo)
+                t_new_update = medir(storage.update_all_data_user, alvo, update)
+
+                assert storage.load_legacy_user(alvo) == old_load_user(alvo)
+            finally:
+                os.chdir(cwd)
+
+        print(
+            f"{n:>9,} | {size_old / 1e6:>6.1f} {size_new / 1e6:>6.1f} | "
+            f"{t_old_save:>8.1f} {t_new_save:>9.1f} | "
+            f"{t_old_load:>8.1f} {t_new_cold:>7.2f} {t_new_warm:>7.2f} | "
+            f"{t_old_update:>9.1f} {t_new_update:>12.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
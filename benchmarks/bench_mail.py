@@ -0,0 +1,105 @@
+"""
+Pico de logins: envio do código inline (SMTP por login) contra a fila do `mailer`.
+
+Contra o servidor de `fake_smtp.py` (com latência de sessão simulando
+STARTTLS + login de um servidor real), N usuários pedem o código ao mesmo
+tempo. Inline, cada login abre a própria conexão e espera a troca inteira;
+com o `mailer.MailWorker`, o login só enfileira e a thread entrega tudo
+por uma conexão reaproveitada. Depois derruba algumas conexões no meio
+para conferir que as mensagens são reenviadas.
+
+Uso (na raiz do projeto):
+    python benchmarks/bench_mail.py --logins 50 --handshake 0.3
+"""
+
+import os
+import sys
+import time
+import logging
+import smtplib
+import argparse
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mailer import MailWorker, login_code_message, send_email_code  # noqa: E402
+from fake_smtp import FakeSMTP  # noqa: E402
+
+
+def envio_inline(port: int, email_to: str, code: str):
+    """Como o login fazia antes: uma sessão SMTP inteira por código."""
+    with smtplib.SMTP("127.0.0.1", port, timeout=10) as server:
+        server.login("bench", "senha")
+        server.send_message(login_code_message(email_to, code, sender="bench@example.com"))
+
+
+def pico(n: int, login) -> tuple:
+    """(tempos de resposta de cada login em ms, duração total em s)."""
+
+    def um_login(i):
+        t0 = time.perf_counter()
+        login(f"usuario{i}@example.com", f"{i:06d}")
+        return (time.perf_counter() - t0) * 1000
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=n) as pool:
+        tempos = list(pool.map(um_login, range(n)))
+    return tempos, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--logins", type=int, default=50)
+    parser.add_argument("--handshake", type=float, default=0.3, help="latência da sessão (s)")
+    parser.add_argument("--message", type=float, default=0.01, help="latência por mensagem (s)")
+    args = parser.parse_args()
+    logging.getLogger("mailer").setLevel(logging.CRITICAL)
+
+    fake = FakeSMTP(handshake_latency=args.handshake, message_latency=args.message).start()
+    try:
+        tempos, total = pico(args.logins, lambda to, code: envio_inline(fake.port, to, code))
+        print(f"{args.logins} logins simultâneos, sessão {args.handshake * 1000:.0f} ms")
+        print(
+            f"  inline: resposta mediana {statistics.median(tempos):8.1f} ms, "
+            f"pior {max(tempos):8.1f} ms, {fake.connections} conexões, "
+            f"todos entregues em {total:.2f} s"
+        )
+
+        fake.connections = 0
+        fake.messages.clear()
+        worker = MailWorker(
+            host="127.0.0.1", port=fake.port, user="bench", password="senha",
+            starttls=False, backoff=0.05,
+        )
+        t0 = time.perf_counter()
+        jobs = []
+        tempos, _ = pico(
+            args.logins, lambda to, code: jobs.append(send_email_code(to, code, worker))
+        )
+        for job in jobs:
+            job.wait(60)
+        total = time.perf_counter() - t0
+        assert all(job.ok for job in jobs) and len(fake.messages) == args.logins
+        print(
+            f"  fila:   resposta mediana {statistics.median(tempos):8.3f} ms, "
+            f"pior {max(tempos):8.3f} ms, {fake.connections} conexões, "
+            f"todos entregues em {total:.2f} s"
+        )
+
+        fake.messages.clear()
+        fake.drop_next = 3
+        jobs = [send_email_code(f"queda{i}@example.com", "123456", worker) for i in range(10)]
+        for job in jobs:
+            job.wait(60)
+        print(
+            f"  3 conexões derrubadas no meio: {sum(job.ok for job in jobs)}/10 entregues, "
+            f"tentativas {[job.attempts for job in jobs]}"
+        )
+        worker.stop(10)
+    finally:
+        fake.stop()
+
+
+if __name__ == "__main__":
+    main()
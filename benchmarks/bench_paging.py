@@ -0,0 +1,73 @@
+"""
+Tabelas de lançamentos: ledger inteiro no data_editor contra uma página.
+
+Mede o que cada rerun da página de lançamentos paga para mandar a tabela
+ao navegador (`editor_view` + serialização Arrow, como o Streamlit faz) com
+o frame inteiro e com uma página do `paging.TableIndex`, e o custo de
+montar o índice e servir páginas com busca de texto, período e ordenação.
+
+Uso (na raiz do projeto):
+    python benchmarks/bench_paging.py --rows 10000 100000 --page-size 100
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import pandas as pd
+from streamlit.dataframe_util import convert_pandas_df_to_arrow_bytes
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from frames import typed_frame, editor_view  # noqa: E402
+from paging import TableIndex, page_slice  # noqa: E402
+from bench_session_memory import synthetic_records  # noqa: E402
+
+
+def medir(fn, repeat: int) -> tuple:
+    melhor = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        resultado = fn()
+        melhor = min(melhor, time.perf_counter() - t0)
+    return melhor * 1000, resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    for n in args.rows:
+        df = typed_frame("despesas", pd.DataFrame(synthetic_records(n)["despesas"]))
+        print(f"{len(df)} linhas, páginas de {args.page_size}")
+
+        t, corpo = medir(lambda: convert_pandas_df_to_arrow_bytes(editor_view(df)), args.repeat)
+        print(f"  ledger inteiro:          {t:8.2f} ms, {len(corpo) / 1024:9.1f} KiB por rerun")
+
+        t_idx, index = medir(lambda: TableIndex(df), args.repeat)
+        cenarios = {
+            "página sem filtro": {},
+            "busca de texto": {"texto": "mercado"},
+            "período de 1 ano": {"inicio": "2020-01-01", "fim": "2020-12-31"},
+            "ordenado por Valor desc": {"sort_by": "Valor", "descending": True},
+            "busca + período + ordem": {
+                "texto": "lazer", "inicio": "2018-01-01", "fim": "2022-12-31",
+                "sort_by": "Categoria",
+            },
+        }
+        print(f"  índice (por versão):     {t_idx:8.2f} ms")
+        for nome, filtros in cenarios.items():
+            def pagina():
+                posicoes = page_slice(index.filtered_order(**filtros), 1, args.page_size)
+                return convert_pandas_df_to_arrow_bytes(editor_view(df.iloc[posicoes]))
+
+            t, corpo = medir(pagina, args.repeat)
+            print(f"  {nome + ':':<24} {t:8.2f} ms, {len(corpo) / 1024:9.1f} KiB por rerun")
+
+
+if __name__ == "__main__":
+    main()
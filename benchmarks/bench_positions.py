@@ -0,0 +1,129 @@
+"""
+Posições com lotes FIFO: `portfolio.PositionBook` contra um laço em Python.
+
+Gera uma carteira sintética (compras e vendas, algumas vendendo mais que a
+posição) espalhada por centenas de tickers e compara:
+1. montar o livro inteiro: `PositionBook.from_frame` (NumPy, agrupado por
+   ativo) contra o laço lançamento a lançamento com uma fila de lotes por
+   ativo; confere que quantidade, custo e realizado batem;
+2. um lançamento novo: `PositionBook.add` contra remontar o livro.
+
+Uso (na raiz do projeto):
+    python benchmarks/bench_positions.py --trades 5000 50000 --tickers 300
+"""
+
+import os
+import sys
+import time
+import argparse
+from collections import defaultdict, deque
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from frames import typed_frame  # noqa: E402
+from portfolio import PositionBook  # noqa: E402
+
+
+def carteira(n: int, tickers: int, seed: int = 0) -> list:
+    rng = np.random.default_rng(seed)
+    datas = pd.Timestamp("2015-01-01") + pd.to_timedelta(rng.integers(0, 3650, n), unit="D")
+    qtd = rng.integers(1, 200, n).astype(float)
+    qtd[rng.random(n) < 0.4] *= -1
+    preco = rng.uniform(5, 100, n).round(2)
+    ativos = rng.integers(0, tickers, n)
+    return [
+        {
+            "Data": d.strftime("%Y-%m-%d"),
+            "Tipo": "Ação",
+            "Ativo": f"ATV{a}",
+            "Quantidade": q,
+            "Preço_R$": p,
+            "Valor_Total_R$": q * p,
+        }
+        for d, a, q, p in zip(datas, ativos, qtd, preco)
+    ]
+
+
+def laco_fifo(rows: list) -> dict:
+    """Referência: percorre os lançamentos em ordem com uma fila de lotes por ativo."""
+    lotes = defaultdict(deque)
+    realizado = defaultdict(float)
+    for i in sorted(range(len(rows)), key=lambda i: (rows[i]["Data"], i)):
+        r = rows[i]
+        chave = (r["Tipo"], r["Ativo"])
+        q, v = r["Quantidade"], r["Valor_Total_R$"]
+        if q > 0:
+            lotes[chave].append([q, v / q])
+            continue
+        pedido = -q
+        vendido = min(pedido, sum(lote[0] for lote in lotes[chave]))
+        realizado[chave] += abs(v) * vendido / pedido
+        resta = vendido
+        while resta > 1e-12:
+            lote = lotes[chave][0]
+            parte = min(lote[0], resta)
+            realizado[chave] -= parte * lote[1]
+            lote[0] -= parte
+            resta -= parte
+            if lote[0] <= 1e-12:
+                lotes[chave].popleft()
+    return {
+        chave: (
+            sum(lote[0] for lote in lotes[chave]),
+            sum(lote[0] * lote[1] for lote in lotes[chave]),
+            realizado[chave],
+        )
+        for chave in set(lotes) | set(realizado)
+    }
+
+
+def medir(fn, repeat: int = 3) -> tuple:
+    melhor = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        resultado = fn()
+        melhor = min(melhor, time.perf_counter() - t0)
+    return melhor * 1000, resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--trades", type=int, nargs="+", default=[5_000, 50_000])
+    parser.add_argument("--tickers", type=int, default=300)
+    parser.add_argument("--adds", type=int, default=200)
+    args = parser.parse_args()
+
+    for n in args.trades:
+        rows = carteira(n, args.tickers)
+        df = typed_frame("patrimonio", pd.DataFrame(rows))
+
+        t_laco, ref = medir(lambda: laco_fifo(rows))
+        t_book, book = medir(lambda: PositionBook.from_frame(df))
+        pos = book.positions().set_index(["Tipo", "Ativo"])
+        esperado = pd.DataFrame.from_dict(
+            ref, orient="index", columns=["Quantidade", "Custo_R$", "Realizado_R$"]
+        )
+        np.testing.assert_allclose(
+            pos.loc[esperado.index, esperado.columns].to_numpy(), esperado.to_numpy(),
+            atol=1e-4,
+        )
+
+        # Lançamentos novos (data de hoje) sobre o livro pronto.
+        novos = carteira(args.adds, args.tickers, seed=1)
+        for r in novos:
+            r["Data"] = "2030-01-01"
+        t0 = time.perf_counter()
+        for r in novos:
+            assert book.add(r)
+        t_add = (time.perf_counter() - t0) / args.adds * 1000
+
+        print(f"{n} lançamentos, {args.tickers} tickers")
+        print(f"  livro inteiro: laço Python {t_laco:8.1f} ms | PositionBook {t_book:7.1f} ms")
+        print(f"  lançamento novo: remontar {t_book:8.1f} ms | add {t_add:9.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Cotações contra um Yahoo falso: reuso de conexões, quedas e circuit breaker.
+
+1. Reuso: N buscas seguidas com uma conexão `urllib` nova por chamada
+   (como antes) contra o `quote_client.QuoteClient` (keep-alive). Com
+   `--tls` (padrão se houver openssl) cada conexão nova paga o handshake.
+2. Queda: o servidor passa a responder 503. Mede cada envio do formulário
+   (`get_asset_price_brl`) com e sem circuit breaker e mostra que, com o
+   circuito aberto, a resposta é imediata e vem da última cotação conhecida
+   marcada como desatualizada.
+3. Lentidão: o servidor demora mais que o timeout do cliente.
+
+Uso (na raiz do projeto):
+    python benchmarks/bench_quotes.py --requests 200 --calls 10
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import quotes  # noqa: E402
+from quote_client import QuoteClient  # noqa: E402
+from fake_yahoo import FakeYahoo, price_for  # noqa: E402
+
+ATIVO = ("Ação", "PETR4")
+
+
+def reuso(fake: FakeYahoo, n: int):
+    url = fake.chart_url + "PETR4.SA?range=1d&interval=1d"
+
+    fake.reset_counts()
+    t0 = time.perf_counter()
+    for _ in range(n):
+        req = urllib.request.Request(url, headers={"User-Agent": "Mozilla/5.0"})
+        with urllib.request.urlopen(req, timeout=3, context=fake.ssl_context) as resp:
+            json.loads(resp.read())
+    antigo = (time.perf_counter() - t0) / n * 1000
+    conexoes_antigo = fake.connections
+
+    fake.reset_counts()
+    client = QuoteClient(ssl_context=fake.ssl_context)
+    t0 = time.perf_counter()
+    for _ in range(n):
+        client.get_json(url)
+    novo = (time.perf_counter() - t0) / n * 1000
+    conexoes_novo = fake.connections
+    client.close()
+
+    print(f"1. reuso ({n} buscas seguidas, {'https' if fake.tls else 'http'})")
+    print(f"   urllib por chamada: {antigo:7.2f} ms/busca, {conexoes_antigo} conexões")
+    print(f"   QuoteClient:        {novo:7.2f} ms/busca, {conexoes_novo} conexões")
+
+
+def envios_durante_queda(fake: FakeYahoo, client: QuoteClient, calls: int) -> list:
+    quotes.quote_client = client
+    quotes.quote_cache.clear()
+    fake.down = False
+    esperado = price_for(quotes.resolve_symbol(*ATIVO))
+    assert quotes.get_asset_price_brl(*ATIVO) == esperado
+
+    # TTL vencido: a próxima leitura precisa ir ao Yahoo, que caiu.
+    quotes.quote_cache.ttl = 0
+    fake.down = True
+    tempos = []
+    for _ in range(calls):
+        t0 = time.perf_counter()
+        preco = quotes.get_asset_price_brl(*ATIVO)
+        tempos.append((time.perf_counter() - t0) * 1000)
+        assert preco == esperado and quotes.asset_price_stale(*ATIVO)
+    fake.down = False
+    quotes.quote_cache.ttl = quotes.QUOTE_CACHE_TTL
+    return tempos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--calls", type=int, default=10, help="envios durante a queda")
+    parser.add_argument("--tls", action=argparse.BooleanOptionalAction, default=None)
+    args = parser.parse_args()
+    tls = shutil.which("openssl") is not None if args.tls is None else args.tls
+
+    # As falhas esperadas nos cenários iriam poluir a saída.
+    logging.getLogger("quotes").setLevel(logging.ERROR)
+
+    fake = FakeYahoo(tls=tls).start()
+    quotes.YAHOO_CHART_URL = fake.chart_url
+    try:
+        reuso(fake, args.requests)
+
+        config = dict(timeout=1.0, retries=2, backoff=0.1, ssl_context=fake.ssl_context)
+        sem = envios_durante_queda(
+            fake, QuoteClient(breaker_failures=10**9, **config), args.calls
+        )
+        com = envios_durante_queda(
+            fake, QuoteClient(breaker_failures=2, breaker_cooldown=30, **config), args.calls
+        )
+        print(f"2. queda (503), {args.calls} envios; retries=2, backoff=0.1 s")
+        print(f"   sem breaker: {sum(sem):8.1f} ms no total, {sem[-1]:7.2f} ms o último")
+        print(f"   com breaker: {sum(com):8.1f} ms no total, {com[-1]:7.2f} ms o último")
+        print("   (todos devolveram a última cotação conhecida, marcada como desatualizada)")
+
+        fake.latency = 0.5
+        client = QuoteClient(
+            timeout=0.1, retries=1, backoff=0.0, breaker_failures=2,
+            ssl_context=fake.ssl_context,
+        )
+        quotes.quote_client = client
+        quotes.quote_cache.clear()
+        tempos = []
+        for _ in range(4):
+            t0 = time.perf_counter()
+            quotes.get_asset_price_brl(*ATIVO)
+            tempos.append((time.perf_counter() - t0) * 1000)
+        print("3. lentidão (servidor 500 ms, timeout 100 ms, breaker após 2 falhas)")
+        print("   envios: " + ", ".join(f"{t:.1f} ms" for t in tempos))
+        print(f"   circuito: {client.breaker(fake.chart_url).state}")
+    finally:
+        fake.stop()
+
+
+if __name__ == "__main__":
+    main()
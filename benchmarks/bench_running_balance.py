@@ -0,0 +1,106 @@
+"""
+Microbenchmark do saldo acumulado: implementação antiga (apply linha a
+linha + strftime + cópias) contra a vetorizada de `aggregates`
+(`combine_entries` + `running_balance`, usada na tabela do mês, e
+`history_balance`, usada no histórico completo).
+
+Uso (na raiz do projeto):
+    python benchmarks/bench_running_balance.py --sizes 1000 10000 100000 1000000
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aggregates import combine_entries, running_balance, history_balance  # noqa: E402
+
+# A versão antiga é lenta demais para tamanhos muito grandes.
+MAX_ROWS_ANTIGO = 200_000
+
+
+def synthetic(rows: int, seed: int) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(
+        {
+            "Data": pd.Timestamp("2015-01-01")
+            + pd.to_timedelta(rng.integers(0, 365 * 10, rows), unit="D"),
+            "Categoria": rng.choice(["Mercado", "Aluguel", "Salário"], rows),
+            "Descrição": "",
+            "Valor": rng.uniform(1, 1000, rows).round(2),
+        }
+    )
+
+
+def saldo_antigo(df_r: pd.DataFrame, df_d: pd.DataFrame) -> pd.Series:
+    df_r_view = df_r[["Data", "Categoria", "Descrição", "Valor"]].copy()
+    df_r_view["Tipo"] = "Receita"
+    df_d_view = df_d[["Data", "Categoria", "Descrição", "Valor"]].copy()
+    df_d_view["Tipo"] = "Despesa"
+    df_ld = pd.concat([df_r_view, df_d_view], ignore_index=True)
+    df_ld = df_ld.sort_values("Data")
+
+    df_ld_plot = df_ld.copy()
+    df_ld_plot["Data"] = df_ld_plot["Data"].dt.strftime("%Y-%m-%d")
+    df_ld_plot["Valor_signed"] = df_ld_plot.apply(
+        lambda row: row["Valor"] if row["Tipo"] == "Receita" else -row["Valor"],
+        axis=1,
+    )
+    df_ld_plot["Saldo_acumulado"] = df_ld_plot["Valor_signed"].cumsum()
+    return df_ld_plot.set_index("Data")["Saldo_acumulado"]
+
+
+def saldo_novo(df_r: pd.DataFrame, df_d: pd.DataFrame) -> pd.Series:
+    return running_balance(combine_entries(df_r, df_d))
+
+
+def medir(func, *args, repeat: int = 3) -> float:
+    melhor = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        func(*args)
+        melhor = min(melhor, time.perf_counter() - t0)
+    return melhor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000]
+    )
+    args = parser.parse_args()
+
+    print(
+        f"{'linhas':>10} {'antigo (ms)':>12} {'tabela (ms)':>12} "
+        f"{'histórico (ms)':>15} {'ganho':>8}"
+    )
+    for n in args.sizes:
+        df_r = synthetic(n // 2, 1)
+        df_d = synthetic(n - n // 2, 2)
+
+        novo = medir(saldo_novo, df_r, df_d)
+        historico = medir(history_balance, df_r, df_d)
+        np.testing.assert_allclose(
+            saldo_novo(df_r, df_d).iloc[-1], history_balance(df_r, df_d).iloc[-1]
+        )
+
+        if n <= MAX_ROWS_ANTIGO:
+            antigo = medir(saldo_antigo, df_r, df_d, repeat=1)
+            np.testing.assert_allclose(
+                saldo_antigo(df_r, df_d).iloc[-1], saldo_novo(df_r, df_d).iloc[-1]
+            )
+            ganho = f"{antigo / novo:>7.0f}x"
+            antigo = f"{antigo * 1000:>12.1f}"
+        else:
+            antigo, ganho = f"{'-':>12}", f"{'-':>8}"
+
+        print(f"{n:>10,} {antigo} {novo * 1000:>12.1f} {historico * 1000:>15.1f} {ganho}")
+
+
+if __name__ == "__main__":
+    main()
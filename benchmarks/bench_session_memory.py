@@ -0,0 +1,162 @@
+"""
+Memória por sessão dos lançamentos de um usuário: esquema antigo contra o compacto.
+
+Antigo: frames montados de listas de dicts (Data/Categoria/Tipo/Ativo como
+str do Python, Valor às vezes object depois do data_editor) mais a cópia
+tipada memorizada para o dashboard. Compacto: um único frame por tipo no
+esquema de `frames.LEDGER_SCHEMA`, que já serve como versão tipada.
+
+Uso (na raiz do projeto):
+    python benchmarks/bench_session_memory.py --rows 100000
+"""
+
+import os
+import sys
+import argparse
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from frames import (  # noqa: E402
+    USE_ARROW_STRINGS,
+    typed_frame,
+    frame_memory,
+    normalize_df_receitas_despesas,
+    normalize_df_patrimonio,
+)
+
+CATEGORIAS = ["Salário", "Mercado", "Aluguel", "Transporte", "Lazer", "Saúde", "Educação"]
+TIPOS = ["Ação", "FII", "Criptomoeda", "Outro"]
+ATIVOS = ["PETR4", "VALE3", "ITUB4", "MXRF11", "HGLG11", "BTC", "ETH", "CDB"]
+
+
+def synthetic_records(rows: int, seed: int = 0) -> dict:
+    """Registros como saem do storage (listas de dicts com strings)."""
+    rng = np.random.default_rng(seed)
+    n_p = max(1, rows // 10)
+    n_rd = rows - n_p
+
+    def datas(n):
+        return (
+            pd.Timestamp("2015-01-01") + pd.to_timedelta(rng.integers(0, 3650, n), unit="D")
+        ).strftime("%Y-%m-%d").tolist()
+
+    def lancamentos(n):
+        return [
+            {"Data": d, "Categoria": c, "Descrição": f"Lançamento {i}", "Valor": v}
+            for i, (d, c, v) in enumerate(
+                zip(
+                    datas(n),
+                    rng.choice(CATEGORIAS, n).tolist(),
+                    rng.uniform(1, 5000, n).round(2).tolist(),
+                )
+            )
+        ]
+
+    qtd = rng.uniform(0.1, 100, n_p).round(4)
+    preco = rng.uniform(1, 500, n_p).round(2)
+    patrimonio = [
+        {
+            "Data": d,
+            "Tipo": t,
+            "Ativo": a,
+            "Quantidade": q,
+            "Preço_R$": p,
+            "Valor_Total_R$": q * p,
+        }
+        for d, t, a, q, p in zip(
+            datas(n_p),
+            rng.choice(TIPOS, n_p).tolist(),
+            rng.choice(ATIVOS, n_p).tolist(),
+            qtd.tolist(),
+            preco.tolist(),
+        )
+    ]
+    return {
+        "receitas": lancamentos(n_rd // 2),
+        "despesas": lancamentos(n_rd - n_rd // 2),
+        "patrimonio": patrimonio,
+    }
+
+
+def old_typed(kind: str, df: pd.DataFrame) -> pd.DataFrame:
+    """Cópia tipada como era memorizada antes (datetime64[ns] + float64)."""
+    if kind == "patrimonio":
+        numericas = ["Quantidade", "Preço_R$", "Valor_Total_R$"]
+    else:
+        numericas = ["Valor"]
+    return df.assign(
+        Data=pd.to_datetime(df["Data"], errors="coerce").astype("datetime64[ns]"),
+        **{c: pd.to_numeric(df[c], errors="coerce").astype("float64") for c in numericas},
+    )
+
+
+def as_object(df: pd.DataFrame) -> pd.DataFrame:
+    """Colunas de texto como object (o que o pandas < 3 devolvia por padrão)."""
+    return df.astype(
+        {c: object for c in df.columns if pd.api.types.is_string_dtype(df[c].dtype)}
+    )
+
+
+def sessao_antiga(records: dict) -> dict:
+    sessao = {}
+    for kind, rows in records.items():
+        df = pd.DataFrame(rows)
+        if kind == "patrimonio":
+            df = as_object(normalize_df_patrimonio(df))
+        else:
+            df = as_object(normalize_df_receitas_despesas(df))
+        if kind != "patrimonio":
+            # Depois de uma edição no data_editor o Valor vira object.
+            df["Valor"] = df["Valor"].astype(object)
+        sessao[f"df_{kind}"] = df
+        sessao[f"_tipado_{kind}"] = as_object(old_typed(kind, df))
+    return sessao
+
+
+def sessao_compacta(records: dict) -> dict:
+    sessao = {}
+    for kind, rows in records.items():
+        df = typed_frame(kind, pd.DataFrame(rows))
+        sessao[f"df_{kind}"] = df
+        sessao[f"_tipado_{kind}"] = typed_frame(kind, df)  # mesmo objeto
+    return sessao
+
+
+def memoria(sessao: dict) -> int:
+    vistos = {}
+    for df in sessao.values():
+        vistos[id(df)] = df
+    return sum(frame_memory(df) for df in vistos.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=100_000)
+    args = parser.parse_args()
+
+    records = synthetic_records(args.rows)
+    antiga = sessao_antiga(records)
+    compacta = sessao_compacta(records)
+
+    print(f"usuário com {args.rows:,} lançamentos (strings pyarrow: {USE_ARROW_STRINGS})")
+    print(f"{'frame':<22} {'antigo (MB)':>12} {'compacto (MB)':>14}")
+    for key in antiga:
+        if key.startswith("_tipado_"):
+            novo = "(mesmo frame)"
+        else:
+            novo = f"{frame_memory(compacta[key]) / 1e6:.2f}"
+        print(f"{key:<22} {frame_memory(antiga[key]) / 1e6:>12.2f} {novo:>14}")
+
+    total_antigo = memoria(antiga)
+    total_novo = memoria(compacta)
+    print(
+        f"{'total por sessão':<22} {total_antigo / 1e6:>12.2f} {total_novo / 1e6:>14.2f}"
+        f"  ({total_antigo / total_novo:.1f}x menor)"
+    )
+
+
+if __name__ == "__main__":
+    main()
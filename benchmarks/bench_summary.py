@@ -0,0 +1,159 @@
+"""
+Resumo mensal do `/api/summary`: recálculo completo contra atualização incremental.
+
+Antes, cada lançamento novo fazia o servidor montar o resumo de novo a
+partir dos frames inteiros (`monthly_summary`). Com o
+`aggregates.MonthlySummary` materializado, o lançamento corrige só o mês
+dele e o saldo acumulado dali em diante. Mede o custo por lançamento dos
+dois caminhos e confere que chegam ao mesmo resumo. Depois aplica edições
+e exclusões (`update` / `remove`, o caminho do `/edit-transaction` e do
+`/delete-transaction`) e confere de novo contra o recálculo completo; um
+histórico pequeno é esvaziado lançamento a lançamento, conferindo a cada
+passo (meses que ficam vazios saem do resumo).
+
+Uso (na raiz do projeto):
+    python benchmarks/bench_summary.py --rows 10000 100000 --adds 200 --changes 200
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from frames import typed_frame, append_frames, set_cell  # noqa: E402
+from aggregates import MonthlySummary, monthly_summary  # noqa: E402
+from bench_session_memory import synthetic_records  # noqa: E402
+
+
+def conferir(resumo: MonthlySummary, frames: dict, esperado: pd.DataFrame = None):
+    """Confere o resumo incremental contra `esperado` (por padrão, o recálculo dos frames)."""
+    if esperado is None:
+        esperado = monthly_summary(frames["receitas"], frames["despesas"])
+    obtido = resumo.to_frame()
+    assert obtido["year_month"].tolist() == esperado["year_month"].tolist()
+    assert np.allclose(
+        obtido.drop(columns="year_month").to_numpy(dtype="float64"),
+        esperado.drop(columns="year_month").to_numpy(dtype="float64"),
+    )
+
+
+def alterar(rng, resumo: MonthlySummary, frames: dict) -> float:
+    """Exclui ou edita (data e valor) um lançamento ao acaso; devolve o tempo do resumo."""
+    kind = "receitas" if rng.random() < 0.5 else "despesas"
+    df = frames[kind]
+    if df.empty:
+        return 0.0
+    pos = int(rng.integers(len(df)))
+    old_data, old_valor = df["Data"].iat[pos], df["Valor"].iat[pos]
+
+    if rng.random() < 0.5:
+        frames[kind] = df.drop(index=df.index[pos]).reset_index(drop=True)
+        t0 = time.perf_counter()
+        resumo.remove(kind, old_data, old_valor)
+        return time.perf_counter() - t0
+
+    df = df.assign(Data=df["Data"].copy(), Valor=df["Valor"].copy())
+    nova_data = pd.Timestamp("2015-01-01") + pd.Timedelta(days=int(rng.integers(0, 3650)))
+    set_cell(kind, df, pos, "Data", nova_data)
+    set_cell(kind, df, pos, "Valor", round(float(rng.uniform(1, 500)), 2))
+    frames[kind] = df
+    t0 = time.perf_counter()
+    resumo.update(kind, old_data, old_valor, df["Data"].iat[pos], df["Valor"].iat[pos])
+    return time.perf_counter() - t0
+
+
+def conferir_esvaziamento(rng):
+    """Histórico esparso esvaziado um lançamento por vez, conferindo cada passo."""
+    records = synthetic_records(40)
+    frames = {
+        kind: typed_frame(kind, pd.DataFrame(records[kind])) for kind in ("receitas", "despesas")
+    }
+    resumo = MonthlySummary.from_frames(frames["receitas"], frames["despesas"])
+    passos = 0
+    while not (frames["receitas"].empty and frames["despesas"].empty):
+        kind = "receitas" if frames["despesas"].empty or (
+            not frames["receitas"].empty and rng.random() < 0.5
+        ) else "despesas"
+        df = frames[kind]
+        pos = int(rng.integers(len(df)))
+        resumo.remove(kind, df["Data"].iat[pos], df["Valor"].iat[pos])
+        frames[kind] = df.drop(index=df.index[pos]).reset_index(drop=True)
+        conferir(resumo, frames)
+        passos += 1
+    assert len(resumo) == 0
+    return passos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--adds", type=int, default=200, help="lançamentos novos")
+    parser.add_argument("--changes", type=int, default=200, help="edições/exclusões")
+    args = parser.parse_args()
+
+    print(
+        f"{'linhas':>9} {'meses':>6} | {'recálculo (ms/lanç.)':>21} "
+        f"{'incremental (ms/lanç.)':>23} {'edição/exclusão (ms)':>21}"
+    )
+    rng = np.random.default_rng(0)
+    for n in args.rows:
+        records = synthetic_records(n)
+        frames = {
+            kind: typed_frame(kind, pd.DataFrame(records[kind]))
+            for kind in ("receitas", "despesas")
+        }
+        novos = [
+            (
+                "receitas" if rng.random() < 0.5 else "despesas",
+                {
+                    "Data": str(pd.Timestamp("2015-01-01") + pd.Timedelta(days=int(d))),
+                    "Categoria": "Outros",
+                    "Descrição": "",
+                    "Valor": float(v),
+                },
+            )
+            for d, v in zip(
+                rng.integers(0, 3650, args.adds), rng.uniform(1, 500, args.adds).round(2)
+            )
+        ]
+
+        # O append no frame acontece nos dois caminhos; só o resumo é medido.
+        t_completo = 0.0
+        esperado = None
+        completo = dict(frames)
+        for kind, row in novos:
+            completo[kind] = append_frames(kind, completo[kind], pd.DataFrame([row]))
+            t0 = time.perf_counter()
+            esperado = monthly_summary(completo["receitas"], completo["despesas"])
+            t_completo += time.perf_counter() - t0
+        t_completo /= args.adds
+
+        resumo = MonthlySummary.from_frames(frames["receitas"], frames["despesas"])
+        t0 = time.perf_counter()
+        for kind, row in novos:
+            resumo.add(kind, row["Data"], row["Valor"])
+            resumo.rows()
+        t_incremental = (time.perf_counter() - t0) / args.adds
+
+        # O último recálculo medido já é o resumo esperado depois dos lançamentos.
+        conferir(resumo, completo, esperado)
+
+        t_alteracao = sum(alterar(rng, resumo, completo) for _ in range(args.changes))
+        conferir(resumo, completo)
+        print(
+            f"{n:>9,} {len(resumo):>6} | {t_completo * 1000:>21.2f} "
+            f"{t_incremental * 1000:>23.2f} "
+            f"{t_alteracao / max(1, args.changes) * 1000:>21.2f}"
+        )
+
+    passos = conferir_esvaziamento(rng)
+    print(f"esvaziamento: {passos} exclusões conferidas contra o recálculo completo")
+
+
+if __name__ == "__main__":
+    main()
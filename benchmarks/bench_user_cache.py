@@ -0,0 +1,74 @@
+"""
+Login de várias abas do mesmo usuário: leitura por sessão contra o cache do processo.
+
+Grava um log sintético (via `storage`) num diretório temporário e simula N
+abas fazendo login. Sem cache, cada aba relê o log e monta seus frames;
+com `user_cache.UserFrameCache`, só a primeira aba lê e as demais recebem
+referências para os mesmos frames. Mostra o tempo médio de login e a
+memória ocupada pelos frames de todas as abas juntas.
+
+Uso (na raiz do projeto):
+    python benchmarks/bench_user_cache.py --rows 100000 --tabs 1 3 10
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import storage  # noqa: E402
+from frames import frame_memory  # noqa: E402
+from user_cache import UserFrameCache, load_user_frames  # noqa: E402
+from bench_session_memory import synthetic_records  # noqa: E402
+
+EMAIL = "bench@example.com"
+
+
+def memoria_abas(abas: list) -> int:
+    frames = {}
+    for sessao in abas:
+        for df in sessao.values():
+            frames[id(df)] = df
+    return sum(frame_memory(df) for df in frames.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--tabs", type=int, nargs="+", default=[1, 3, 10])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        storage.write_user_snapshot(EMAIL, synthetic_records(args.rows))
+        print(f"usuário com {args.rows:,} lançamentos")
+        print(
+            f"{'abas':>5} {'login sem cache (ms)':>21} {'com cache (ms)':>15} "
+            f"{'memória sem (MB)':>17} {'com (MB)':>9}"
+        )
+
+        for n in args.tabs:
+            abas, t0 = [], time.perf_counter()
+            for _ in range(n):
+                abas.append(load_user_frames(EMAIL))
+            sem_cache = (time.perf_counter() - t0) / n
+            mem_sem = memoria_abas(abas)
+
+            cache = UserFrameCache()
+            abas, t0 = [], time.perf_counter()
+            for _ in range(n):
+                abas.append(cache.get(EMAIL)[1])
+            com_cache = (time.perf_counter() - t0) / n
+            mem_com = memoria_abas(abas)
+
+            print(
+                f"{n:>5} {sem_cache * 1000:>21.1f} {com_cache * 1000:>15.1f} "
+                f"{mem_sem / 1e6:>17.1f} {mem_com / 1e6:>9.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
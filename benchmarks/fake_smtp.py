@@ -0,0 +1,115 @@
+"""
+Servidor SMTP local de depuração, com latências e quedas injetáveis.
+
+Fala o suficiente do protocolo para o `smtplib` (EHLO/HELO, AUTH PLAIN,
+MAIL, RCPT, DATA, RSET, NOOP, QUIT), guarda as mensagens recebidas e conta
+conexões. `handshake_latency` simula o custo de abrir uma sessão (TLS +
+login de um servidor real) e `message_latency` o de cada mensagem;
+`drop_next` derruba as próximas N conexões logo depois do DATA.
+
+Uso em outros scripts:
+    fake = FakeSMTP(handshake_latency=0.3).start()
+    worker = MailWorker(host="127.0.0.1", port=fake.port, starttls=False, password="")
+"""
+
+import time
+import threading
+import socketserver
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def _reply(self, line: str):
+        self.wfile.write((line + "\r\n").encode("ascii"))
+
+    def handle(self):
+        fake = self.server.fake
+        fake._count_connection()
+        self._reply("220 fake-smtp pronto")
+        dados = None
+        while True:
+            raw = self.rfile.readline()
+            if not raw:
+                return
+            if dados is not None:
+                if raw.rstrip(b"\r\n") == b".":
+                    if fake._take_drop():
+                        return
+                    if fake.message_latency:
+                        time.sleep(fake.message_latency)
+                    fake._store(b"".join(dados))
+                    dados = None
+                    self._reply("250 2.0.0 aceito")
+                else:
+                    dados.append(raw)
+                continue
+
+            comando = raw.decode("ascii", "replace").strip()
+            verbo = comando.split(" ", 1)[0].upper()
+            if verbo in ("EHLO", "HELO"):
+                if fake.handshake_latency:
+                    time.sleep(fake.handshake_latency)
+                if verbo == "EHLO":
+                    self._reply("250-fake-smtp")
+                    self._reply("250 AUTH PLAIN")
+                else:
+                    self._reply("250 fake-smtp")
+            elif verbo == "AUTH":
+                self._reply("235 2.7.0 autenticado")
+            elif verbo in ("MAIL", "RCPT", "RSET", "NOOP"):
+                self._reply("250 2.0.0 ok")
+            elif verbo == "DATA":
+                dados = []
+                self._reply("354 termine com <CRLF>.<CRLF>")
+            elif verbo == "QUIT":
+                self._reply("221 2.0.0 tchau")
+                return
+            else:
+                self._reply("502 5.5.2 comando desconhecido")
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 256  # o padrão (5) derruba conexões num pico
+
+
+class FakeSMTP:
+    def __init__(self, handshake_latency: float = 0.0, message_latency: float = 0.0):
+        self.handshake_latency = handshake_latency
+        self.message_latency = message_latency
+        self.drop_next = 0
+        self.connections = 0
+        self.messages = []
+        self._lock = threading.Lock()
+        self._server = None
+
+    def _count_connection(self):
+        with self._lock:
+            self.connections += 1
+
+    def _take_drop(self) -> bool:
+        with self._lock:
+            if self.drop_next > 0:
+                self.drop_next -= 1
+                return True
+            return False
+
+    def _store(self, data: bytes):
+        with self._lock:
+            self.messages.append(data)
+
+    def start(self) -> "FakeSMTP":
+        self._server = _Server(("127.0.0.1", 0), _Handler)
+        self._server.fake = self
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
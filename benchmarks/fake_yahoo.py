@@ -0,0 +1,147 @@
+"""
+Servidor local que imita o endpoint de chart do Yahoo, com falhas injetáveis.
+
+Responde `/v8/finance/chart/<símbolo>` em HTTP/1.1 (keep-alive) com um
+preço fixo por símbolo. Latência, taxa de erros, status de erro e "queda
+total" podem ser mudados com o servidor rodando, e o servidor conta
+requisições e conexões recebidas (para medir o reuso de conexões). Com
+`tls=True` serve HTTPS com um certificado autoassinado gerado pelo
+`openssl` da máquina.
+
+Uso em outros scripts:
+    fake = FakeYahoo(latency=0.02).start()
+    quotes.YAHOO_CHART_URL = fake.chart_url
+"""
+
+import os
+import ssl
+import json
+import time
+import random
+import shutil
+import tempfile
+import threading
+import subprocess
+import urllib.parse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+USD_BRL_SYMBOL = "USDBRL=X"
+
+
+def price_for(symbol: str) -> float:
+    """Preço determinístico do símbolo (para conferir o que o cliente leu)."""
+    return 5.0 if symbol == USD_BRL_SYMBOL else 10.0 + len(symbol)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Cabeçalhos e corpo num único envio (senão Nagle + ACK atrasado somam
+    # ~40 ms por resposta numa conexão keep-alive).
+    wbufsize = -1
+
+    def setup(self):
+        super().setup()
+        self.server.fake._count("connections")
+
+    def do_GET(self):
+        fake = self.server.fake
+        fake._count("requests")
+        if fake.latency:
+            time.sleep(fake.latency)
+
+        if fake.down or (fake.error_rate and fake._rng.random() < fake.error_rate):
+            self._send(fake.error_status, {"chart": {"result": None, "error": "fake"}})
+            return
+
+        path = urllib.parse.urlparse(self.path).path
+        symbol = urllib.parse.unquote(path.rsplit("/", 1)[-1])
+        self._send(
+            200,
+            {"chart": {"result": [{"indicators": {"quote": [{"close": [price_for(symbol)]}]}}]}},
+        )
+
+    def _send(self, status: int, payload: dict):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeYahoo:
+    def __init__(
+        self,
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        error_status: int = 503,
+        tls: bool = False,
+        seed: int = 0,
+    ):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.down = False
+        self.tls = tls
+        self.requests = 0
+        self.connections = 0
+        self.ssl_context = None  # contexto do cliente que confia no certificado
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._httpd = None
+        self._tmp = None
+
+    def _count(self, name: str):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def reset_counts(self):
+        with self._lock:
+            self.requests = 0
+            self.connections = 0
+
+    def start(self) -> "FakeYahoo":
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.fake = self
+        if self.tls:
+            self._wrap_tls()
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+        return self
+
+    def _wrap_tls(self):
+        if shutil.which("openssl") is None:
+            raise RuntimeError("tls=True precisa do openssl instalado")
+        self._tmp = tempfile.mkdtemp()
+        cert = os.path.join(self._tmp, "cert.pem")
+        key = os.path.join(self._tmp, "key.pem")
+        subprocess.run(
+            [
+                "openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes",
+                "-keyout", key, "-out", cert, "-days", "1",
+                "-subj", "/CN=127.0.0.1", "-addext", "subjectAltName=IP:127.0.0.1",
+            ],
+            check=True,
+            capture_output=True,
+        )
+        server_ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        server_ctx.load_cert_chain(cert, key)
+        self._httpd.socket = server_ctx.wrap_socket(self._httpd.socket, server_side=True)
+        self.ssl_context = ssl.create_default_context(cafile=cert)
+
+    @property
+    def chart_url(self) -> str:
+        scheme = "https" if self.tls else "http"
+        return f"{scheme}://127.0.0.1:{self._httpd.server_address[1]}/v8/finance/chart/"
+
+    def stop(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+        if self._tmp is not None:
+            shutil.rmtree(self._tmp, ignore_errors=True)
+            self._tmp = None
@@ -0,0 +1,189 @@
+"""
+Várias réplicas no mesmo diretório de dados: invalidação do cache entre processos.
+
+Sobe N processos (como réplicas do Streamlit atrás de um balanceador), cada
+um com o seu `user_cache.UserFrameCache`, apontando para o mesmo
+diretório. A cada rodada cada processo grava um lançamento num usuário
+(como o `add_user_entry` do app: grava e publica com `commit`) e, depois
+de uma barreira, todos leem todos os usuários pelo cache e comparam com o
+que está em disco. Mede:
+
+- leituras desatualizadas (tem que dar 0);
+- recargas por processo: só os usuários que outra réplica alterou;
+- custo de um acesso com o cache válido (um stat) contra reler o log.
+
+No fim, todos os processos gravam no mesmo usuário ao mesmo tempo, para
+conferir que nenhuma gravação concorrente se perde na visão de nenhum deles.
+
+Uso (na raiz do projeto):
+    python benchmarks/multiprocess_cache.py --procs 4 --users 20 --rounds 10
+Sai com código 1 se alguma réplica leu dados desatualizados.
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import multiprocessing as mp
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import storage  # noqa: E402
+from frames import append_frames  # noqa: E402
+from user_cache import UserFrameCache, load_user_frames  # noqa: E402
+from bench_session_memory import synthetic_records  # noqa: E402
+
+
+def usuario(i: int) -> str:
+    return f"usuario{i}@example.com"
+
+
+def lancamento(proc: int, rodada: int) -> dict:
+    return {
+        "Data": f"2026-01-{1 + rodada % 28:02d}",
+        "Categoria": f"Réplica {proc}",
+        "Descrição": f"rodada {rodada}",
+        "Valor": float(proc * 1000 + rodada),
+    }
+
+
+def gravar(cache: UserFrameCache, email: str, row: dict):
+    """O que o app faz num lançamento novo: grava no log e publica no cache."""
+    versao, frames = cache.get(email)
+    storage.append_user_record(email, "receitas", row)
+    novos = append_frames("receitas", frames["receitas"], pd.DataFrame([row]))
+    cache.commit(email, versao, {"receitas": novos})
+
+
+def conferir(cache: UserFrameCache, emails: list) -> int:
+    """Quantos usuários o cache mostra diferente do disco."""
+    desatualizados = 0
+    for email in emails:
+        _, frames = cache.get(email)
+        em_disco = storage.load_user_records(email)
+        if any(len(frames[kind]) != len(em_disco[kind]) for kind in storage.KINDS):
+            desatualizados += 1
+    return desatualizados
+
+
+def replica(proc: int, procs: int, pasta: str, emails: list, rodadas: int, barreira, saida):
+    os.chdir(pasta)
+    leituras = []
+
+    def loader(email):
+        leituras.append(email)
+        return load_user_frames(email)
+
+    cache = UserFrameCache(loader=loader)
+    for email in emails:
+        cache.get(email)
+    barreira.wait()
+
+    desatualizados = 0
+    recargas_por_rodada = []
+    for rodada in range(rodadas):
+        # Cada rodada, cada réplica escreve num usuário diferente.
+        gravar(cache, emails[(rodada * procs + proc) % len(emails)], lancamento(proc, rodada))
+        barreira.wait()
+        antes = len(leituras)
+        desatualizados += conferir(cache, emails)
+        recargas_por_rodada.append(len(leituras) - antes)
+        barreira.wait()
+
+    # Acesso com o cache válido: só a conferência do carimbo.
+    t0 = time.perf_counter()
+    for _ in range(200):
+        for email in emails:
+            cache.get(email)
+    acesso_us = (time.perf_counter() - t0) / (200 * len(emails)) * 1e6
+
+    t0 = time.perf_counter()
+    for email in emails:
+        load_user_frames(email)
+    releitura_us = (time.perf_counter() - t0) / len(emails) * 1e6
+
+    # Todas as réplicas gravam no mesmo usuário ao mesmo tempo.
+    barreira.wait()
+    for rodada in range(rodadas):
+        gravar(cache, emails[0], lancamento(proc, 1000 + rodada))
+    barreira.wait()
+    desatualizados += conferir(cache, emails[:1])
+    _, frames = cache.get(emails[0])
+
+    saida.put(
+        {
+            "proc": proc,
+            "desatualizados": desatualizados,
+            "recargas": recargas_por_rodada,
+            "acesso_us": acesso_us,
+            "releitura_us": releitura_us,
+            "linhas_mesmo_usuario": len(frames["receitas"]),
+        }
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--procs", type=int, default=4)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--rows", type=int, default=2000, help="lançamentos por usuário")
+    args = parser.parse_args()
+
+    pasta = tempfile.mkdtemp(prefix="finance-replicas-")
+    try:
+        os.chdir(pasta)
+        emails = [usuario(i) for i in range(args.users)]
+        for email in emails:
+            storage.write_user_snapshot(email, synthetic_records(args.rows))
+        linhas_iniciais = len(storage.load_user_records(emails[0])["receitas"])
+
+        ctx = mp.get_context("spawn")
+        barreira = ctx.Barrier(args.procs)
+        saida = ctx.Queue()
+        processos = [
+            ctx.Process(
+                target=replica,
+                args=(i, args.procs, pasta, emails, args.rounds, barreira, saida),
+            )
+            for i in range(args.procs)
+        ]
+        for p in processos:
+            p.start()
+        resultados = sorted((saida.get() for _ in processos), key=lambda r: r["proc"])
+        for p in processos:
+            p.join()
+
+        print(f"{args.procs} réplicas, {args.users} usuários, {args.rounds} rodadas")
+        for r in resultados:
+            print(
+                f"  réplica {r['proc']}: desatualizados {r['desatualizados']}, "
+                f"recargas por rodada {r['recargas']} "
+                f"(de {args.users} usuários; {args.procs - 1} alterados por outras réplicas), "
+                f"acesso {r['acesso_us']:.1f} µs vs releitura {r['releitura_us']:.0f} µs"
+            )
+
+        esperado = linhas_iniciais + sum(
+            1 for rodada in range(args.rounds) for proc in range(args.procs)
+            if (rodada * args.procs + proc) % args.users == 0
+        ) + args.procs * args.rounds
+        vistos = {r["linhas_mesmo_usuario"] for r in resultados}
+        print(
+            f"  gravações concorrentes no mesmo usuário: esperado {esperado} linhas, "
+            f"réplicas viram {sorted(vistos)}"
+        )
+
+        falhou = any(r["desatualizados"] for r in resultados) or vistos != {esperado}
+        print("FALHOU" if falhou else "ok")
+    finally:
+        os.chdir("/")
+        shutil.rmtree(pasta, ignore_errors=True)
+    sys.exit(1 if falhou else 0)
+
+
+if __name__ == "__main__":
+    main()
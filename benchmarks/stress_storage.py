@@ -0,0 +1,102 @@
+"""
+Teste de estresse do armazenamento: N processos x T threads gravando ao
+mesmo tempo (usuários diferentes e também o mesmo usuário compartilhado) e,
+no fim, conferência de que nenhum lançamento foi perdido.
+
+Uso (na raiz do projeto):
+    python benchmarks/stress_storage.py --processes 4 --threads 4 --rows 50
+    python benchmarks/stress_storage.py --backend json
+"""
+
+import os
+import sys
+import argparse
+import tempfile
+import threading
+import multiprocessing
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import storage  # noqa: E402
+
+SHARED_EMAIL = "compartilhado@example.com"
+
+
+def _row(worker: str, i: int) -> dict:
+    return {
+        "Data": "2024-01-01",
+        "Categoria": "Estresse",
+        "Descrição": f"{worker}-{i}",
+        "Valor": float(i),
+    }
+
+
+def _worker(workdir: str, backend: str, proc_id: int, threads: int, rows: int):
+    os.chdir(workdir)
+    storage.STORAGE_BACKEND = backend
+
+    def run(thread_id: int):
+        worker = f"p{proc_id}t{thread_id}"
+        email = f"{worker}@example.com"
+        for i in range(rows):
+            storage.append_user_record(email, "receitas", _row(worker, i))
+            storage.append_user_record(SHARED_EMAIL, "despesas", _row(worker, i))
+            if i % 10 == 9:
+                # Reescrita completa do próprio usuário no meio das gravações.
+                records = storage.load_user_records(email)
+                storage.write_user_snapshot(email, records)
+
+    ts = [threading.Thread(target=run, args=(t,)) for t in range(threads)]
+    for t in ts:
+        t.start()
+    for t in ts:
+        t.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--rows", type=int, default=50)
+    parser.add_argument("--backend", choices=["ledger", "json"], default="ledger")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="stress_storage_")
+    procs = [
+        multiprocessing.Process(
+            target=_worker,
+            args=(workdir, args.backend, p, args.threads, args.rows),
+        )
+        for p in range(args.processes)
+    ]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+
+    os.chdir(workdir)
+    storage.STORAGE_BACKEND = args.backend
+
+    perdidos = 0
+    for p in range(args.processes):
+        for t in range(args.threads):
+            email = f"p{p}t{t}@example.com"
+            n = len(storage.load_user_records(email)["receitas"])
+            if n != args.rows:
+                print(f"{email}: esperado {args.rows}, encontrado {n}")
+                perdidos += args.rows - n
+
+    esperado = args.processes * args.threads * args.rows
+    n = len(storage.load_user_records(SHARED_EMAIL)["despesas"])
+    if n != esperado:
+        print(f"{SHARED_EMAIL}: esperado {esperado}, encontrado {n}")
+        perdidos += esperado - n
+
+    if perdidos:
+        print(f"FALHOU: {perdidos} lançamentos perdidos ({workdir})")
+        sys.exit(1)
+    print(f"OK: nenhum lançamento perdido ({args.backend}, {workdir})")
+
+
+if __name__ == "__main__":
+    main()
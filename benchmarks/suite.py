@@ -0,0 +1,317 @@
+"""
+Suíte de benchmarks dos caminhos quentes: armazenamento, frames, dashboard e cotações.
+
+Gera usuários sintéticos (usuários × lançamentos × ativos) num diretório
+temporário e mede, para cada tamanho:
+
+- storage: `load_all_data` (user_data.json legado com todos os usuários),
+  `load_legacy_user`, `load_user_records` (log JSONL) e a reescrita do
+  log de um usuário num snapshot (`frame_records` + `write_user_snapshot`);
+- frames: `normalize_df_receitas_despesas`, `normalize_df_patrimonio`,
+  `parse_date_column` e `typed_frame`;
+- dashboard: os cálculos do `dashboard_page` (índice mensal e recorte do
+  mês, saldo acumulado do mês e do histórico, cumsum do patrimônio);
+- cotações: `get_asset_price_brl` / `get_asset_prices_brl`, frias e
+  quentes, contra o servidor local de `fake_yahoo.py` (nada sai para a
+  internet).
+
+Os resultados vão para um JSON (com commit, versões e parâmetros), e
+`--compare` confronta com um JSON anterior para achar regressões entre
+commits (sai com código 1 se algum caso piorou além de `--threshold`).
+
+Uso (na raiz do projeto):
+    python benchmarks/suite.py --rows 1000 10000 100000 --output atual.json
+    python benchmarks/suite.py --output novo.json --compare atual.json
+    python benchmarks/suite.py --only dashboard cotacoes
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import statistics
+import subprocess
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+import storage  # noqa: E402
+import quotes  # noqa: E402
+import json_codec  # noqa: E402
+from frames import (  # noqa: E402
+    typed_frame,
+    frame_records,
+    parse_date_column,
+    normalize_df_receitas_despesas,
+    normalize_df_patrimonio,
+)
+from aggregates import (  # noqa: E402
+    MonthlyIndex,
+    combine_entries,
+    running_balance,
+    history_balance,
+)
+from bench_session_memory import synthetic_records  # noqa: E402
+from fake_yahoo import FakeYahoo  # noqa: E402
+
+GRUPOS = ["storage", "frames", "dashboard", "cotacoes"]
+TIPOS_ATIVO = ["Ação", "FII", "Criptomoeda"]
+
+
+# ==============================
+# DADOS SINTÉTICOS
+# ==============================
+
+def synthetic_assets(n: int) -> list:
+    """n pares (tipo, ticker) distintos, alternando ação, FII e cripto."""
+    return [(TIPOS_ATIVO[i % 3], f"AT{i:04d}") for i in range(n)]
+
+
+def synthetic_user(rows: int, assets: list, seed: int) -> dict:
+    """Registros de um usuário com o patrimônio espalhado pelos `assets`."""
+    records = synthetic_records(rows, seed)
+    rng = np.random.default_rng(seed)
+    escolha = rng.integers(0, len(assets), len(records["patrimonio"]))
+    for row, i in zip(records["patrimonio"], escolha.tolist()):
+        row["Tipo"], row["Ativo"] = assets[i]
+    return records
+
+
+# ==============================
+# MEDIÇÃO
+# ==============================
+
+def medir(func, repeat: int, setup=None) -> dict:
+    """Melhor e mediana (ms) de `repeat` execuções; `setup` roda fora do tempo."""
+    tempos = []
+    for _ in range(repeat):
+        args = setup() if setup is not None else ()
+        t0 = time.perf_counter()
+        func(*args)
+        tempos.append((time.perf_counter() - t0) * 1000)
+    return {
+        "best_ms": round(min(tempos), 4),
+        "median_ms": round(statistics.median(tempos), 4),
+        "repeat": repeat,
+    }
+
+
+def casos_storage(emails: list, records: dict):
+    alvo = emails[len(emails) // 2]
+    frames = {kind: typed_frame(kind, pd.DataFrame(records[kind])) for kind in storage.KINDS}
+
+    def save_user_data():
+        storage.write_user_snapshot(
+            alvo, {kind: frame_records(kind, frames[kind]) for kind in storage.KINDS}
+        )
+
+    def load_legacy_user_frio():
+        storage._legacy_index_cache.clear()
+        storage.load_legacy_user(alvo)
+
+    yield "storage.load_all_data", storage.load_all_data, None
+    yield "storage.load_legacy_user", load_legacy_user_frio, None
+    yield "storage.load_user_records", lambda: storage.load_user_records(alvo), None
+    yield "storage.save_user_data", save_user_data, None
+
+
+def casos_frames(records: dict):
+    def bruto(kind):
+        return lambda: (pd.DataFrame(records[kind]),)
+
+    yield "frames.normalize_df_receitas_despesas", normalize_df_receitas_despesas, bruto("receitas")
+    yield "frames.normalize_df_patrimonio", normalize_df_patrimonio, bruto("patrimonio")
+    yield "frames.parse_date_column", parse_date_column, bruto("despesas")
+    yield "frames.typed_frame", lambda df: typed_frame("despesas", df), bruto("despesas")
+
+
+def casos_dashboard(records: dict):
+    df_r = typed_frame("receitas", pd.DataFrame(records["receitas"]))
+    df_d = typed_frame("despesas", pd.DataFrame(records["despesas"]))
+    df_p = typed_frame("patrimonio", pd.DataFrame(records["patrimonio"]))
+    ultima = max(df_r["Data"].max(), df_d["Data"].max())
+
+    def filtro_mes():
+        idx_r, idx_d = MonthlyIndex.from_frame(df_r), MonthlyIndex.from_frame(df_d)
+        idx_r.anos() + idx_d.anos()
+        df_r_mes = idx_r.slice(df_r, ultima.year, ultima.month)
+        df_d_mes = idx_d.slice(df_d, ultima.year, ultima.month)
+        idx_r.total(ultima.year, ultima.month) - idx_d.total(ultima.year, ultima.month)
+        return combine_entries(df_r_mes, df_d_mes)
+
+    df_ld = filtro_mes()
+
+    def patrimonio_cumsum():
+        # Mesmo cálculo do gráfico "Evolução do Patrimônio Total".
+        df_p_evol = df_p.sort_values("Data")
+        acumulado = df_p_evol["Valor_Total_R$"].astype(float).cumsum()
+        datas = df_p_evol["Data"].dt.strftime("%Y-%m-%d")
+        return pd.Series(acumulado.to_numpy(), index=datas)
+
+    yield "dashboard.filtro_mes", filtro_mes, None
+    yield "dashboard.saldo_mes", lambda: running_balance(df_ld), None
+    yield "dashboard.saldo_historico", lambda: history_balance(df_r, df_d), None
+    yield "dashboard.patrimonio_cumsum", patrimonio_cumsum, None
+
+
+def casos_cotacoes(assets: list):
+    um = assets[0]
+    cripto = next((a for a in assets if a[0] == "Criptomoeda"), um)
+
+    def frio():
+        quotes.quote_cache.clear()
+        return ()
+
+    yield "cotacoes.get_asset_price_brl.frio", lambda: quotes.get_asset_price_brl(*um), frio
+    yield "cotacoes.get_asset_price_brl.cripto_frio", lambda: quotes.get_asset_price_brl(*cripto), frio
+    yield "cotacoes.get_asset_price_brl.quente", lambda: quotes.get_asset_price_brl(*um), None
+    yield "cotacoes.get_asset_prices_brl.carteira_fria", lambda: quotes.get_asset_prices_brl(assets), frio
+    yield "cotacoes.get_asset_prices_brl.carteira_quente", lambda: quotes.get_asset_prices_brl(assets), None
+
+
+# ==============================
+# EXECUÇÃO E COMPARAÇÃO
+# ==============================
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=BASE_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def run(args) -> dict:
+    grupos = args.only or GRUPOS
+    assets = synthetic_assets(args.assets)
+    results = []
+
+    def registrar(nome, func, setup, **params):
+        r = {"name": nome, **params, **medir(func, args.repeat, setup)}
+        results.append(r)
+        print(f"  {nome:<48} {r['best_ms']:>10.3f} ms  (mediana {r['median_ms']:.3f})")
+
+    cwd = os.getcwd()
+    for rows in args.rows:
+        print(f"{args.users} usuários × {rows:,} lançamentos × {args.assets} ativos")
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            try:
+                emails = [f"usuario{i}@example.com" for i in range(args.users)]
+                todos = {e: synthetic_user(rows, assets, seed=i) for i, e in enumerate(emails)}
+                records = todos[emails[len(emails) // 2]]
+                params = {"users": args.users, "rows": rows, "assets": args.assets}
+
+                casos = []
+                if "storage" in grupos:
+                    storage.save_all_data(todos)
+                    for email, user_records in todos.items():
+                        storage.write_user_snapshot(email, user_records)
+                    casos += casos_storage(emails, records)
+                if "frames" in grupos:
+                    casos += casos_frames(records)
+                if "dashboard" in grupos:
+                    casos += casos_dashboard(records)
+                for nome, func, setup in casos:
+                    registrar(nome, func, setup, **params)
+            finally:
+                os.chdir(cwd)
+
+    if "cotacoes" in grupos:
+        print(f"cotações: {args.assets} ativos, stub com {args.stub_latency:g} ms de latência")
+        fake = FakeYahoo(latency=args.stub_latency / 1000).start()
+        quotes.YAHOO_CHART_URL = fake.chart_url
+        try:
+            for nome, func, setup in casos_cotacoes(assets):
+                registrar(nome, func, setup, assets=args.assets)
+            quotes.quote_cache.clear()
+        finally:
+            fake.stop()
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "json_codec": json_codec.codec.name,
+            "storage_backend": storage.STORAGE_BACKEND,
+            "params": {
+                "users": args.users,
+                "rows": args.rows,
+                "assets": args.assets,
+                "repeat": args.repeat,
+                "stub_latency_ms": args.stub_latency,
+                "only": grupos,
+            },
+        },
+        "results": results,
+    }
+
+
+def _chave(r: dict) -> tuple:
+    return (r["name"], r.get("users"), r.get("rows"), r.get("assets"))
+
+
+def compare(atual: dict, base: dict, threshold: float) -> list:
+    """Imprime a razão atual/base de cada caso e devolve os que pioraram."""
+    anteriores = {_chave(r): r for r in base["results"]}
+    print(f"\ncomparação com {base['meta'].get('commit') or 'base'} (melhor tempo, atual/base)")
+    piores = []
+    for r in atual["results"]:
+        b = anteriores.get(_chave(r))
+        if b is None or not b["best_ms"]:
+            continue
+        razao = r["best_ms"] / b["best_ms"]
+        marca = ""
+        if razao > 1 + threshold:
+            marca = "  <- regressão"
+            piores.append(r)
+        print(f"  {r['name']:<48} {r.get('rows') or '':>8} {razao:>7.2f}x{marca}")
+    return piores
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=5, help="usuários no arquivo legado")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000, 10_000, 50_000])
+    parser.add_argument("--assets", type=int, default=20, help="ativos distintos na carteira")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--stub-latency", type=float, default=20.0, help="latência do stub do Yahoo (ms)"
+    )
+    parser.add_argument("--only", nargs="+", choices=GRUPOS)
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--compare", metavar="BASE_JSON")
+    parser.add_argument(
+        "--threshold", type=float, default=0.25, help="piora tolerada no --compare (0.25 = 25%%)"
+    )
+    args = parser.parse_args()
+
+    atual = run(args)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(atual, f, ensure_ascii=False, indent=2)
+    print(f"\nresultados em {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            base = json.load(f)
+        if compare(atual, base, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Preparação das séries dos gráficos de linha do dashboard.
+
+Saldo acumulado e evolução do patrimônio têm um ponto por lançamento (ou
+por dia), então o tamanho do gráfico crescia com o histórico. Antes de ir
+para o `st.line_chart` a série passa por `chart_series`:
+
+1. índice de datas de verdade (eixo temporal, não categórico);
+2. agregação na resolução escolhida (dia, semana ou mês), ficando com o
+   último valor de cada período (o saldo no fim do dia/semana/mês);
+3. se ainda passar de FINANCE_CHART_MAX_POINTS pontos, LTTB (Largest
+   Triangle Three Buckets), que escolhe em cada faixa o ponto que mais
+   preserva a forma da curva (picos e vales não somem como numa média).
+
+Assim o payload do gráfico tem no máximo FINANCE_CHART_MAX_POINTS pontos,
+qualquer que seja o tamanho do histórico.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+CHART_MAX_POINTS = max(3, int(os.environ.get("FINANCE_CHART_MAX_POINTS", "1000")))
+
+# Rótulo na tela -> resolução (None = um ponto por lançamento).
+RESOLUCOES = {"Lançamento": None, "Dia": "D", "Semana": "W", "Mês": "M"}
+RESOLUCAO_PADRAO = "Dia"
+
+
+def _period_start(datas: np.ndarray, resolucao: str) -> np.ndarray:
+    """Início do período (dia, semana começando na segunda ou mês) de cada data."""
+    if resolucao == "M":
+        return datas.astype("datetime64[M]").astype("datetime64[D]")
+    dias = datas.astype("datetime64[D]")
+    if resolucao == "W":
+        # 1970-01-01 foi uma quinta: +3 leva a segunda para o resto 0.
+        n = dias.astype(np.int64)
+        return (n - (n + 3) % 7).astype("datetime64[D]")
+    return dias
+
+
+def resample_last(serie: pd.Series, resolucao: str) -> pd.Series:
+    """
+    Último valor de cada período de uma série já ordenada por data,
+    indexado pelo início do período.
+    """
+    if resolucao is None or serie.empty:
+        return serie
+    inicio = _period_start(serie.index.to_numpy(dtype="datetime64[ns]"), resolucao)
+    ultimo = np.append(inicio[1:] != inicio[:-1], True)
+    return pd.Series(
+        serie.to_numpy()[ultimo],
+        index=pd.DatetimeIndex(inicio[ultimo].astype("datetime64[ns]"), name=serie.index.name),
+        name=serie.name,
+    )
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Índices dos `n_out` pontos escolhidos pelo Largest Triangle Three
+    Buckets. O primeiro e o último ponto ficam sempre; o resto é dividido em
+    n_out - 2 faixas e, de cada uma, fica o ponto que forma o maior
+    triângulo com o ponto escolhido na faixa anterior e a média da próxima.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    bordas = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    escolhidos = np.empty(n_out, dtype=np.int64)
+    escolhidos[0] = 0
+    escolhidos[-1] = n - 1
+
+    # Médias de todas as faixas de uma vez; a "próxima" da última faixa é
+    # o último ponto.
+    tamanhos = np.diff(bordas)
+    media_x = np.append(np.add.reduceat(x[:n - 1], bordas[:-1]) / tamanhos, x[n - 1])
+    media_y = np.append(np.add.reduceat(y[:n - 1], bordas[:-1]) / tamanhos, y[n - 1])
+
+    a = 0
+    for i in range(n_out - 2):
+        ini, fim = bordas[i], bordas[i + 1]
+        prox_x, prox_y = media_x[i + 1], media_y[i + 1]
+        xs, ys = x[ini:fim], y[ini:fim]
+        area = np.abs((x[a] - prox_x) * (ys - y[a]) - (x[a] - xs) * (prox_y - y[a]))
+        a = ini + int(np.argmax(area))
+        escolhidos[i + 1] = a
+    return escolhidos
+
+
+def chart_series(
+    serie: pd.Series, resolucao: str = "D", max_points: int = CHART_MAX_POINTS
+) -> pd.Series:
+    """
+    Série pronta para o gráfico de linha: índice datetime ordenado, sem
+    datas/valores vazios, agregada em `resolucao` ("D", "W", "M" ou None) e
+    com no máximo `max_points` pontos.
+    """
+    if serie is None or serie.empty:
+        return serie
+
+    index = serie.index
+    if not isinstance(index, pd.DatetimeIndex):
+        index = pd.DatetimeIndex(pd.to_datetime(index, errors="coerce"), name=index.name)
+    valores = pd.to_numeric(serie, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+    validos = ~(index.isna() | np.isnan(valores))
+    serie = pd.Series(valores[validos], index=index[validos], name=serie.name)
+    if not serie.index.is_monotonic_increasing:
+        serie = serie.sort_index(kind="stable")
+
+    serie = resample_last(serie, resolucao)
+    if len(serie) > max_points:
+        x = serie.index.to_numpy(dtype="datetime64[ns]").astype(np.int64).astype(np.float64)
+        serie = serie.iloc[lttb(x, serie.to_numpy(), max(3, max_points))]
+    return serie
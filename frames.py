@@ -0,0 +1,286 @@
+"""
+DataFrames dos lançamentos: normalização das colunas e esquema compacto.
+
+Os frames da sessão ficam em tipos compactos (`LEDGER_SCHEMA`): Data em
+datetime64[s], Categoria/Tipo/Ativo como `category`, valores em float64 e
+Descrição em strings do pyarrow quando ele está instalado. Assim cada
+sessão guarda uma única cópia dos dados, já pronta para o dashboard, em
+vez de listas de strings Python mais uma cópia tipada.
+
+A conversão custa uma passada completa em cada coluna, então é memorizada
+por uma versão do dataframe de origem e pulada quando o frame já está no
+esquema: reruns do dashboard (ex.: trocar o mês no filtro) reutilizam o
+mesmo frame pronto.
+"""
+
+import importlib.util
+import os
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import timed
+
+# Strings do pyarrow ocupam bem menos que objetos str do Python; sem o
+# pyarrow (ou com FINANCE_ARROW_STRINGS=0) a Descrição fica como object.
+USE_ARROW_STRINGS = (
+    importlib.util.find_spec("pyarrow") is not None
+    and os.environ.get("FINANCE_ARROW_STRINGS", "1") != "0"
+)
+TEXT_DTYPE = pd.StringDtype("pyarrow") if USE_ARROW_STRINGS else np.dtype(object)
+
+DATE_DTYPE = np.dtype("datetime64[s]")
+
+# Tipo compacto de cada coluna: "data", "categoria", "texto" ou "valor".
+LEDGER_SCHEMA = {
+    "receitas": {
+        "Data": "data",
+        "Categoria": "categoria",
+        "Descrição": "texto",
+        "Valor": "valor",
+    },
+    "patrimonio": {
+        "Data": "data",
+        "Tipo": "categoria",
+        "Ativo": "categoria",
+        "Quantidade": "valor",
+        "Preço_R$": "valor",
+        "Valor_Total_R$": "valor",
+    },
+}
+LEDGER_SCHEMA["despesas"] = LEDGER_SCHEMA["receitas"]
+
+
+@timed("frames.normalize_df_receitas_despesas")
+def normalize_df_receitas_despesas(df: pd.DataFrame) -> pd.DataFrame:
+    """Garante colunas padrão para receitas/despesas, especialmente 'Valor'."""
+    if df is None or df.empty:
+        return pd.DataFrame(columns=["Data", "Categoria", "Descrição", "Valor"])
+
+    df = df.copy()
+
+    for col in ["Data", "Categoria", "Descrição"]:
+        if col not in df.columns:
+            df[col] = ""
+
+    if "Valor" not in df.columns:
+        possiveis = [c for c in df.columns if "valor" in c.lower()]
+        if possiveis:
+            df["Valor"] = df[possiveis[0]]
+        else:
+            df["Valor"] = 0.0
+
+    df = df[["Data", "Categoria", "Descrição", "Valor"]]
+    return df
+
+
+@timed("frames.normalize_df_patrimonio")
+def normalize_df_patrimonio(df: pd.DataFrame) -> pd.DataFrame:
+    """Garante colunas padrão para patrimônio, incluindo 'Valor_Total_R$'."""
+    if df is None or df.empty:
+        return pd.DataFrame(
+            columns=[
+                "Data",
+                "Tipo",
+                "Ativo",
+                "Quantidade",
+                "Preço_R$",
+                "Valor_Total_R$",
+            ]
+        )
+
+    df = df.copy()
+
+    for col in ["Data", "Tipo", "Ativo", "Quantidade"]:
+        if col not in df.columns:
+            df[col] = "" if col != "Quantidade" else 0.0
+
+    if "Preço_R$" not in df.columns:
+        possiveis_preco = [c for c in df.columns if "preço" in c.lower() or "preco" in c.lower()]
+        if possiveis_preco:
+            df["Preço_R$"] = df[possiveis_preco[0]]
+        else:
+            df["Preço_R$"] = 0.0
+
+    if "Valor_Total_R$" not in df.columns:
+        possiveis_valor = [c for c in df.columns if "valor" in c.lower()]
+        if possiveis_valor:
+            df["Valor_Total_R$"] = df[possiveis_valor[0]]
+        else:
+            try:
+                df["Valor_Total_R$"] = df["Quantidade"].astype(float) * df["Preço_R$"].astype(float)
+            except Exception:
+                df["Valor_Total_R$"] = 0.0
+
+    df = df[
+        [
+            "Data",
+            "Tipo",
+            "Ativo",
+            "Quantidade",
+            "Preço_R$",
+            "Valor_Total_R$",
+        ]
+    ]
+    return df
+
+
+def parse_date_column(df: pd.DataFrame, col: str = "Data") -> pd.DataFrame:
+    if df is None or df.empty or col not in df.columns:
+        return df
+    df = df.copy()
+    df[col] = pd.to_datetime(df[col], errors="coerce")
+    return df
+
+
+# ==============================
+# ESQUEMA COMPACTO
+# ==============================
+
+def _is_compact(dtype, tipo: str) -> bool:
+    if tipo == "data":
+        return dtype == DATE_DTYPE
+    if tipo == "valor":
+        return dtype == np.float64
+    if tipo == "categoria":
+        return isinstance(dtype, pd.CategoricalDtype)
+    return dtype == TEXT_DTYPE
+
+
+def _compact_column(serie: pd.Series, tipo: str) -> pd.Series:
+    if _is_compact(serie.dtype, tipo):
+        return serie
+    if tipo == "data":
+        return pd.to_datetime(serie, errors="coerce").astype(DATE_DTYPE)
+    if tipo == "valor":
+        return pd.to_numeric(serie, errors="coerce").astype("float64")
+    texto = serie.fillna("").astype(str)
+    return texto.astype("category") if tipo == "categoria" else texto.astype(TEXT_DTYPE)
+
+
+@timed("frames.typed_frame")
+def typed_frame(kind: str, df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Normaliza o dataframe e converte as colunas para o esquema compacto de
+    `LEDGER_SCHEMA`. Colunas que já estão no tipo certo não são copiadas;
+    um frame já compacto é devolvido como está.
+    """
+    schema = LEDGER_SCHEMA[kind]
+    if df is not None and list(df.columns) == list(schema) and all(
+        _is_compact(df.dtypes[col], tipo) for col, tipo in schema.items()
+    ):
+        return df
+
+    if kind == "patrimonio":
+        df = normalize_df_patrimonio(df)
+    else:
+        df = normalize_df_receitas_despesas(df)
+
+    return df.assign(
+        **{col: _compact_column(df[col], tipo) for col, tipo in schema.items()}
+    )
+
+
+def append_frames(kind: str, df: pd.DataFrame, novos: pd.DataFrame) -> pd.DataFrame:
+    """
+    Concatena linhas novas ao frame mantendo o esquema compacto (as
+    categorias dos dois lados são unidas antes, para o concat não cair em
+    object).
+    """
+    df = typed_frame(kind, df)
+    novos = typed_frame(kind, novos)
+    if novos.empty:
+        return df
+    if df.empty:
+        return novos.reset_index(drop=True)
+
+    for col, tipo in LEDGER_SCHEMA[kind].items():
+        if tipo != "categoria":
+            continue
+        categorias = df[col].cat.categories.union(novos[col].cat.categories)
+        df = df.assign(**{col: df[col].cat.set_categories(categorias)})
+        novos = novos.assign(**{col: novos[col].cat.set_categories(categorias)})
+    return pd.concat([df, novos], ignore_index=True)
+
+
+def set_cell(kind: str, df: pd.DataFrame, pos: int, col: str, value):
+    """
+    Grava (no lugar) um valor vindo do data_editor na linha `pos`,
+    convertendo para o tipo da coluna e criando a categoria se for nova.
+    """
+    tipo = LEDGER_SCHEMA[kind].get(col)
+    if tipo == "data":
+        value = pd.to_datetime(value, errors="coerce")
+    elif tipo == "valor":
+        value = pd.to_numeric(value, errors="coerce")
+        value = np.nan if pd.isna(value) else float(value)
+    elif tipo is not None:
+        value = "" if value is None else str(value)
+
+    if tipo == "categoria" and value not in df[col].cat.categories:
+        df[col] = df[col].cat.add_categories([value])
+    df.iloc[pos, df.columns.get_loc(col)] = value
+
+
+def frame_records(kind: str, df: pd.DataFrame) -> list:
+    """
+    Linhas do frame como dicts prontos para JSON (Data em AAAA-MM-DD,
+    categorias/textos como str, valores ausentes como None).
+    """
+    schema = LEDGER_SCHEMA[kind]
+    if df is None or df.empty:
+        return []
+
+    out = {}
+    for col, tipo in schema.items():
+        serie = df[col] if col in df.columns else pd.Series(None, index=df.index)
+        if tipo == "data":
+            datas = pd.to_datetime(serie, errors="coerce")
+            out[col] = datas.dt.strftime("%Y-%m-%d").astype(object).where(datas.notna(), None)
+        elif tipo == "valor":
+            valores = pd.to_numeric(serie, errors="coerce").astype(object)
+            out[col] = valores.where(valores.notna(), None)
+        else:
+            out[col] = serie.astype(object).where(serie.notna(), None).map(
+                lambda v: v if v is None else str(v)
+            )
+    return pd.DataFrame(out).to_dict(orient="records")
+
+
+def editor_view(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Cópia rasa para o data_editor com as colunas `category` como texto
+    (senão o editor só deixa escolher entre as categorias já existentes).
+    """
+    categoricas = {
+        col: TEXT_DTYPE
+        for col in df.columns
+        if isinstance(df[col].dtype, pd.CategoricalDtype)
+    }
+    return df.astype(categoricas) if categoricas else df
+
+
+def frame_memory(df: pd.DataFrame) -> int:
+    """Bytes ocupados pelo frame, contando o conteúdo das strings."""
+    if df is None:
+        return 0
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+def cached_typed_frame(store, kind: str, df: pd.DataFrame, version) -> pd.DataFrame:
+    """
+    `typed_frame` memorizado em `store` (dict-like, ex.: st.session_state):
+    só reconstrói quando `version` muda.
+    """
+    memo = store.get("_frames_tipados")
+    if memo is None:
+        memo = {}
+        store["_frames_tipados"] = memo
+
+    hit = memo.get(kind)
+    if hit is not None and hit[0] == version:
+        return hit[1]
+
+    typed = typed_frame(kind, df)
+    memo[kind] = (version, typed)
+    return typed
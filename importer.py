@@ -0,0 +1,313 @@
+"""
+Importação em lote de extratos (CSV ou OFX) para receitas/despesas.
+
+O arquivo é lido em blocos (`chunksize` linhas por vez), então mesmo
+extratos com centenas de milhares de linhas não são materializados de uma
+vez. Cada bloco passa pelo mesmo mapeamento de colunas do app
+(`normalize_df_receitas_despesas`), tem datas e valores validados e é
+comparado (por hash) com os lançamentos já existentes, descartando os que
+já estão no ledger. A comparação conta ocorrências: lançamentos idênticos
+no próprio extrato (ex.: duas compras iguais na padaria no mesmo dia) são
+todos importados, e reimportar o mesmo extrato não duplica nada. As
+linhas novas são devolvidas prontas para uma única gravação em lote.
+"""
+
+import os
+import re
+import time
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+from frames import normalize_df_receitas_despesas
+
+IMPORT_CHUNKSIZE = 50_000
+
+# Cabeçalhos comuns em extratos -> colunas do app.
+COLUMN_ALIASES = {
+    "data": "Data",
+    "date": "Data",
+    "data lancamento": "Data",
+    "data do lancamento": "Data",
+    "data movimento": "Data",
+    "categoria": "Categoria",
+    "category": "Categoria",
+    "descricao": "Descrição",
+    "description": "Descrição",
+    "historico": "Descrição",
+    "lancamento": "Descrição",
+    "memo": "Descrição",
+    "valor": "Valor",
+    "valor (r$)": "Valor",
+    "amount": "Valor",
+    "value": "Valor",
+}
+
+CATEGORIA_PADRAO = "Importado"
+
+# Destino das linhas: tudo receita, tudo despesa ou pelo sinal do valor.
+MODOS_IMPORTACAO = ("receitas", "despesas", "sinal")
+
+FORMATOS_DATA = ("%Y-%m-%d", "%Y%m%d", "%d/%m/%Y", "%d/%m/%y")
+
+
+def _simplify(text: str) -> str:
+    text = unicodedata.normalize("NFKD", str(text)).encode("ascii", "ignore").decode()
+    return text.strip().lower()
+
+
+def _open_binary(file):
+    if isinstance(file, (str, os.PathLike)):
+        return open(file, "rb")
+    file.seek(0)
+    return file
+
+
+# ==============================
+# LEITURA EM BLOCOS (CSV / OFX)
+# ==============================
+
+def iter_csv_chunks(file, chunksize: int = IMPORT_CHUNKSIZE):
+    """
+    Blocos (DataFrames de strings) de um CSV de extrato. O separador é
+    detectado pela primeira linha (';' ou ',').
+    """
+    raw = _open_binary(file)
+    try:
+        header = raw.readline().decode("utf-8-sig", errors="replace")
+        raw.seek(0)
+        sep = ";" if header.count(";") > header.count(",") else ","
+
+        with pd.read_csv(
+            raw,
+            sep=sep,
+            dtype=str,
+            keep_default_na=False,
+            chunksize=chunksize,
+            encoding="utf-8-sig",
+            encoding_errors="replace",
+            skipinitialspace=True,
+        ) as reader:
+            yield from reader
+    finally:
+        if raw is not file:
+            raw.close()
+
+
+_OFX_TAG = re.compile(r"<(\w+)>([^<\r\n]*)")
+
+
+def iter_ofx_chunks(file, chunksize: int = IMPORT_CHUNKSIZE):
+    """
+    Blocos de um OFX (SGML ou XML), lido linha a linha: cada <STMTTRN>
+    vira uma linha com Data (DTPOSTED), Descrição (MEMO/NAME) e Valor
+    (TRNAMT).
+    """
+    raw = _open_binary(file)
+    try:
+        linhas = []
+        atual = None
+        for line in raw:
+            text = line.decode("latin-1", errors="replace")
+            upper = text.upper()
+            if "<STMTTRN>" in upper:
+                atual = {}
+            if atual is not None:
+                for tag, valor in _OFX_TAG.findall(text):
+                    atual.setdefault(tag.upper(), valor.strip())
+            if "</STMTTRN>" in upper and atual is not None:
+                linhas.append(
+                    {
+                        "Data": atual.get("DTPOSTED", "")[:8],
+                        "Descrição": atual.get("MEMO") or atual.get("NAME", ""),
+                        "Valor": atual.get("TRNAMT", ""),
+                    }
+                )
+                atual = None
+                if len(linhas) >= chunksize:
+                    yield pd.DataFrame(linhas)
+                    linhas = []
+        if linhas:
+            yield pd.DataFrame(linhas)
+    finally:
+        if raw is not file:
+            raw.close()
+
+
+# ==============================
+# VALIDAÇÃO E DEDUPLICAÇÃO
+# ==============================
+
+def _parse_valor(serie: pd.Series) -> pd.Series:
+    """Valores como texto ('1.234,56', 'R$ -10,00', '-10.5') -> float."""
+    if pd.api.types.is_numeric_dtype(serie):
+        return serie.astype("float64")
+    texto = serie.astype(str).str.replace(r"[R$\s]", "", regex=True)
+    brasileiro = texto.str.contains(",", regex=False)
+    texto = texto.where(
+        ~brasileiro,
+        texto.str.replace(".", "", regex=False).str.replace(",", ".", regex=False),
+    )
+    return pd.to_numeric(texto, errors="coerce")
+
+
+def _parse_data(serie: pd.Series) -> pd.Series:
+    """
+    Datas ISO (AAAA-MM-DD), AAAAMMDD (OFX) ou DD/MM/AAAA. O formato da
+    primeira linha é tentado primeiro na coluna inteira; os outros só nas
+    linhas que sobraram.
+    """
+    texto = serie.astype(str).str.strip()
+    primeira = texto.iloc[0] if len(texto) else ""
+    formatos = sorted(FORMATOS_DATA, key=lambda fmt: not _matches(primeira, fmt))
+
+    datas = pd.Series(pd.NaT, index=texto.index, dtype="datetime64[ns]")
+    for fmt in formatos:
+        faltando = datas.isna()
+        if not faltando.any():
+            break
+        datas[faltando] = pd.to_datetime(texto[faltando], format=fmt, errors="coerce")
+    return datas
+
+
+def _matches(texto: str, fmt: str) -> bool:
+    try:
+        time.strptime(texto, fmt)
+        return True
+    except ValueError:
+        return False
+
+
+def prepare_chunk(chunk: pd.DataFrame) -> pd.DataFrame:
+    """
+    Mapeia os cabeçalhos do extrato para as colunas do app, normaliza com
+    `normalize_df_receitas_despesas` e valida Data/Valor. Linhas inválidas
+    são descartadas. Data sai como texto AAAA-MM-DD e Valor como float
+    (com sinal).
+    """
+    renomear = {}
+    for col in chunk.columns:
+        destino = COLUMN_ALIASES.get(_simplify(col))
+        if destino and destino not in renomear.values():
+            renomear[col] = destino
+    df = normalize_df_receitas_despesas(chunk.rename(columns=renomear))
+    if df.empty:
+        return df
+
+    datas = _parse_data(df["Data"])
+    valores = _parse_valor(df["Valor"])
+    validas = datas.notna() & valores.notna()
+
+    categoria = df["Categoria"].fillna("").astype(str).str.strip()
+    return pd.DataFrame(
+        {
+            "Data": datas[validas].dt.strftime("%Y-%m-%d"),
+            "Categoria": categoria[validas].replace("", CATEGORIA_PADRAO),
+            "Descrição": df["Descrição"][validas].fillna("").astype(str).str.strip(),
+            "Valor": valores[validas].astype("float64"),
+        }
+    ).reset_index(drop=True)
+
+
+def entry_hashes(df: pd.DataFrame) -> np.ndarray:
+    """
+    Hash (uint64) de cada lançamento por (Data, Descrição, Valor em
+    centavos), usado para achar duplicatas.
+    """
+    if df is None or df.empty:
+        return np.empty(0, dtype="uint64")
+    datas = pd.to_datetime(df["Data"], errors="coerce").dt.strftime("%Y-%m-%d")
+    centavos = (pd.to_numeric(df["Valor"], errors="coerce").fillna(0.0).abs() * 100).round()
+    chave = pd.DataFrame(
+        {
+            "Data": datas.fillna("").to_numpy(),
+            "Descrição": df["Descrição"].fillna("").astype(str).str.strip().to_numpy(),
+            "Centavos": centavos.astype("int64").to_numpy(),
+        }
+    )
+    return pd.util.hash_pandas_object(chave, index=False).to_numpy()
+
+
+def import_statement(
+    file,
+    modo: str,
+    existing_receitas: pd.DataFrame,
+    existing_despesas: pd.DataFrame,
+    formato: str = "csv",
+    chunksize: int = IMPORT_CHUNKSIZE,
+) -> dict:
+    """
+    Lê o extrato em blocos e devolve as linhas novas, já separadas em
+    receitas e despesas, e as estatísticas da importação:
+
+        {"receitas": DataFrame, "despesas": DataFrame, "lidas": int,
+         "invalidas": int, "duplicadas": int, "segundos": float,
+         "linhas_por_segundo": float}
+
+    `modo`: "receitas", "despesas" ou "sinal" (positivo = receita,
+    negativo = despesa). Os valores gravados são sempre positivos.
+    """
+    if modo not in MODOS_IMPORTACAO:
+        raise ValueError(f"Modo de importação inválido: {modo}")
+
+    inicio = time.perf_counter()
+    if formato == "ofx":
+        chunks = iter_ofx_chunks(file, chunksize)
+    else:
+        chunks = iter_csv_chunks(file, chunksize)
+
+    # Ocorrências de cada hash no ledger e nas linhas já lidas do extrato:
+    # a k-ésima ocorrência no extrato é duplicata se o ledger tem ao menos k.
+    no_ledger = {
+        "receitas": pd.Series(entry_hashes(existing_receitas)).value_counts(),
+        "despesas": pd.Series(entry_hashes(existing_despesas)).value_counts(),
+    }
+    no_extrato = {kind: pd.Series(dtype="int64") for kind in no_ledger}
+    novos = {"receitas": [], "despesas": []}
+    lidas = invalidas = duplicadas = 0
+
+    for chunk in chunks:
+        lidas += len(chunk)
+        df = prepare_chunk(chunk)
+        invalidas += len(chunk) - len(df)
+        if df.empty:
+            continue
+
+        if modo == "sinal":
+            destino = np.where(df["Valor"].to_numpy() < 0, "despesas", "receitas")
+        else:
+            destino = np.full(len(df), modo)
+        df["Valor"] = df["Valor"].abs()
+
+        for kind in ("receitas", "despesas"):
+            parte = df[destino == kind]
+            if parte.empty:
+                continue
+            hashes = pd.Series(entry_hashes(parte))
+            ocorrencia = (
+                hashes.map(no_extrato[kind]).fillna(0).to_numpy(dtype="int64")
+                + hashes.groupby(hashes).cumcount().to_numpy()
+            )
+            repetidas = ocorrencia < hashes.map(no_ledger[kind]).fillna(0).to_numpy(dtype="int64")
+            no_extrato[kind] = no_extrato[kind].add(hashes.value_counts(), fill_value=0)
+            duplicadas += int(repetidas.sum())
+            novos[kind].append(parte[~repetidas])
+
+    segundos = time.perf_counter() - inicio
+    resultado = {
+        kind: (
+            pd.concat(partes, ignore_index=True)
+            if partes
+            else pd.DataFrame(columns=["Data", "Categoria", "Descrição", "Valor"])
+        )
+        for kind, partes in novos.items()
+    }
+    resultado.update(
+        lidas=lidas,
+        invalidas=invalidas,
+        duplicadas=duplicadas,
+        segundos=segundos,
+        linhas_por_segundo=lidas / segundos if segundos > 0 else float("inf"),
+    )
+    return resultado
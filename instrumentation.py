@@ -0,0 +1,318 @@
+"""
+Instrumentação dos caminhos quentes (tempo, chamadas e bytes de E/S).
+
+Funções marcadas com `@timed("nome")` (ou blocos em `with span("nome")`)
+acumulam, por nome, número de chamadas, erros, tempo total e máximo, e os
+bytes lidos/gravados informados com `count_bytes` durante a chamada (os
+bytes vão para o bloco mais interno em andamento, então não são contados
+em dobro nos blocos de fora).
+
+Desligada (o padrão), cada chamada instrumentada custa só a leitura de
+uma flag global antes de chamar a função original. Liga com
+FINANCE_METRICS=1 ou pelo painel de administração do app (vale para o
+processo todo).
+
+Saídas:
+- `rerun_trace()`: lista dos blocos medidos numa execução do script do
+  Streamlit (o painel "Desempenho" mostra a última);
+- FINANCE_METRICS_LOG: log rotativo em JSON Lines, uma linha por execução;
+- `prometheus_text()`: texto no formato do Prometheus, servido em
+  `/metrics` pelo `server.py` e, no processo do Streamlit, por
+  `start_metrics_server` quando FINANCE_METRICS_PORT está definido.
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+import functools
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+METRICS_ENABLED = os.environ.get("FINANCE_METRICS", "0") == "1"
+METRICS_LOG = os.environ.get("FINANCE_METRICS_LOG", "")
+METRICS_LOG_BYTES = int(os.environ.get("FINANCE_METRICS_LOG_BYTES", str(5 * 1024 * 1024)))
+METRICS_LOG_BACKUPS = int(os.environ.get("FINANCE_METRICS_LOG_BACKUPS", "3"))
+METRICS_PORT = int(os.environ.get("FINANCE_METRICS_PORT", "0") or 0)
+
+_enabled = METRICS_ENABLED
+_local = threading.local()
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def set_enabled(flag: bool):
+    global _enabled
+    _enabled = bool(flag)
+
+
+# ==============================
+# REGISTRO ACUMULADO
+# ==============================
+
+class Stat:
+    __slots__ = ("count", "errors", "total", "max", "bytes_read", "bytes_written")
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.bytes_read = 0
+        self.bytes_written = 0
+
+
+class Registry:
+    """Estatísticas por nome, acumuladas desde o início do processo (ou do reset)."""
+
+    def __init__(self):
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, elapsed: float, read: int, written: int, error: bool):
+        with self._lock:
+            stat = self._stats.get(name)
+            if stat is None:
+                stat = self._stats[name] = Stat()
+            stat.count += 1
+            stat.errors += error
+            stat.total += elapsed
+            stat.max = max(stat.max, elapsed)
+            stat.bytes_read += read
+            stat.bytes_written += written
+
+    def snapshot(self) -> list:
+        """Linhas (dicts) ordenadas pelo tempo total, maior primeiro."""
+        with self._lock:
+            linhas = [
+                {
+                    "nome": name,
+                    "chamadas": s.count,
+                    "erros": s.errors,
+                    "total_ms": s.total * 1000,
+                    "media_ms": s.total / s.count * 1000 if s.count else 0.0,
+                    "max_ms": s.max * 1000,
+                    "bytes_lidos": s.bytes_read,
+                    "bytes_gravados": s.bytes_written,
+                }
+                for name, s in self._stats.items()
+            ]
+        return sorted(linhas, key=lambda linha: linha["total_ms"], reverse=True)
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+registry = Registry()
+
+
+# ==============================
+# MEDIÇÃO
+# ==============================
+
+def _stack() -> list:
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+class span:
+    """Context manager que mede o bloco com o nome dado (se ligado)."""
+
+    __slots__ = ("name", "bytes_read", "bytes_written", "_t0", "_active")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self._active = False
+
+    def __enter__(self):
+        self._active = _enabled
+        if self._active:
+            _stack().append(self)
+            self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if not self._active:
+            return False
+        elapsed = time.perf_counter() - self._t0
+        stack = _stack()
+        stack.pop()
+        registry.record(
+            self.name, elapsed, self.bytes_read, self.bytes_written, exc_type is not None
+        )
+        trace = getattr(_local, "trace", None)
+        if trace is not None:
+            trace.append(
+                {
+                    "nome": self.name,
+                    "nivel": len(stack),
+                    "ms": elapsed * 1000,
+                    "bytes_lidos": self.bytes_read,
+                    "bytes_gravados": self.bytes_written,
+                }
+            )
+        return False
+
+
+def timed(name: str):
+    """Decorador: mede cada chamada da função como `span(name)`."""
+
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with span(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+def count_bytes(read: int = 0, written: int = 0):
+    """Soma bytes de E/S ao bloco medido mais interno desta thread."""
+    if not _enabled:
+        return
+    stack = getattr(_local, "stack", None)
+    if stack:
+        stack[-1].bytes_read += read
+        stack[-1].bytes_written += written
+
+
+# ==============================
+# EXECUÇÃO DO SCRIPT (RERUN)
+# ==============================
+
+_log = None
+_log_lock = threading.Lock()
+
+
+def _rerun_log():
+    global _log
+    if not METRICS_LOG:
+        return None
+    with _log_lock:
+        if _log is None:
+            _log = logging.getLogger("finance.metrics")
+            _log.propagate = False
+            _log.setLevel(logging.INFO)
+            handler = RotatingFileHandler(
+                METRICS_LOG,
+                maxBytes=METRICS_LOG_BYTES,
+                backupCount=METRICS_LOG_BACKUPS,
+                encoding="utf-8",
+            )
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            _log.addHandler(handler)
+        return _log
+
+
+@contextmanager
+def rerun_trace():
+    """
+    Coleta os blocos medidos nesta thread durante o `with` (uma execução
+    do script) e devolve a lista; vazia se a instrumentação está desligada.
+    Com FINANCE_METRICS_LOG, grava a execução como uma linha JSON.
+    """
+    trace = []
+    if not _enabled:
+        yield trace
+        return
+
+    anterior = getattr(_local, "trace", None)
+    _local.trace = trace
+    t0 = time.perf_counter()
+    try:
+        yield trace
+    finally:
+        _local.trace = anterior
+        log = _rerun_log()
+        if log is not None:
+            log.info(
+                json.dumps(
+                    {
+                        "ts": time.time(),
+                        "total_ms": (time.perf_counter() - t0) * 1000,
+                        "spans": trace,
+                    },
+                    ensure_ascii=False,
+                )
+            )
+
+
+# ==============================
+# EXPORTAÇÃO (PROMETHEUS)
+# ==============================
+
+_METRICAS = [
+    ("finance_calls_total", "counter", "chamadas", "Chamadas medidas."),
+    ("finance_call_errors_total", "counter", "erros", "Chamadas que terminaram em exceção."),
+    ("finance_call_seconds_total", "counter", "total_ms", "Tempo total das chamadas (s)."),
+    ("finance_call_seconds_max", "gauge", "max_ms", "Chamada mais lenta (s)."),
+    ("finance_bytes_read_total", "counter", "bytes_lidos", "Bytes lidos."),
+    ("finance_bytes_written_total", "counter", "bytes_gravados", "Bytes gravados."),
+]
+
+
+def prometheus_text() -> str:
+    """Estatísticas acumuladas no formato texto do Prometheus."""
+    linhas = registry.snapshot()
+    saida = []
+    for metrica, tipo, campo, ajuda in _METRICAS:
+        saida.append(f"# HELP {metrica} {ajuda}")
+        saida.append(f"# TYPE {metrica} {tipo}")
+        for linha in linhas:
+            valor = linha[campo]
+            if campo.endswith("_ms"):
+                valor = valor / 1000
+            nome = linha["nome"].replace("\\", "\\\\").replace('"', '\\"')
+            saida.append(f'{metrica}{{name="{nome}"}} {valor}')
+    return "\n".join(saida) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = prometheus_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_metrics_server = None
+_metrics_server_lock = threading.Lock()
+
+
+def start_metrics_server(port: int = METRICS_PORT, host: str = "127.0.0.1"):
+    """
+    Sobe (uma vez por processo, numa thread) um endpoint `/metrics`. Não
+    faz nada com port=0. Devolve o servidor ou None.
+    """
+    global _metrics_server
+    if not port:
+        return None
+    with _metrics_server_lock:
+        if _metrics_server is None:
+            _metrics_server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            _metrics_server.daemon_threads = True
+            threading.Thread(
+                target=_metrics_server.serve_forever, name="metrics", daemon=True
+            ).start()
+        return _metrics_server
@@ -0,0 +1,136 @@
+"""
+Codec JSON plugável usado pelo armazenamento.
+
+Usa o orjson ou o msgspec quando instalados (bem mais rápidos que o
+`json` da biblioteca padrão, tanto para ler quanto para gravar) e cai no
+`json` padrão caso contrário. FINANCE_JSON_CODEC força um codec
+("orjson", "msgspec" ou "json"); o padrão "auto" escolhe o mais rápido
+disponível.
+
+`dumps` devolve bytes UTF-8. `loads` aceita bytes ou str e, se o codec
+rápido recusar o texto (ex.: NaN gravado pelo `json` padrão em arquivos
+antigos), tenta de novo com o `json` padrão; erros de decodificação saem
+sempre como `json.JSONDecodeError`.
+"""
+
+import os
+import json
+import math
+from datetime import date, datetime
+
+JSON_CODEC = os.environ.get("FINANCE_JSON_CODEC", "auto")
+
+
+def _default(obj):
+    """Tipos que aparecem nos registros mas não são JSON nativo."""
+    if hasattr(obj, "item") and callable(obj.item):  # escalares NumPy
+        return obj.item()
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    raise TypeError(f"Tipo não serializável em JSON: {type(obj).__name__}")
+
+
+def _clean_floats(obj):
+    """NaN/inf viram null (o `json` padrão gravaria NaN, que não é JSON)."""
+    if isinstance(obj, float):
+        return None if math.isnan(obj) or math.isinf(obj) else obj
+    if isinstance(obj, dict):
+        return {k: _clean_floats(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_clean_floats(v) for v in obj]
+    return obj
+
+
+class StdlibCodec:
+    name = "json"
+
+    def dumps(self, obj, indent=None) -> bytes:
+        kwargs = {
+            "ensure_ascii": False,
+            "indent": indent,
+            # Mesmo formato compacto dos codecs rápidos (sem espaços).
+            "separators": (",", ":") if indent is None else None,
+            "default": _default,
+        }
+        try:
+            text = json.dumps(obj, allow_nan=False, **kwargs)
+        except ValueError:
+            text = json.dumps(_clean_floats(obj), **kwargs)
+        return text.encode("utf-8")
+
+    def loads(self, data):
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            data = bytes(data).decode("utf-8")
+        return json.loads(data)
+
+
+class OrjsonCodec:
+    name = "orjson"
+
+    def __init__(self):
+        import orjson
+
+        self._orjson = orjson
+
+    def dumps(self, obj, indent=None) -> bytes:
+        option = self._orjson.OPT_SERIALIZE_NUMPY
+        if indent:
+            option |= self._orjson.OPT_INDENT_2
+        return self._orjson.dumps(obj, default=_default, option=option)
+
+    def loads(self, data):
+        try:
+            return self._orjson.loads(data)
+        except self._orjson.JSONDecodeError:
+            return _stdlib.loads(data)
+
+
+class MsgspecCodec:
+    name = "msgspec"
+
+    def __init__(self):
+        import msgspec
+
+        self._msgspec = msgspec
+        self._encoder = msgspec.json.Encoder(enc_hook=_default)
+        self._decoder = msgspec.json.Decoder()
+
+    def dumps(self, obj, indent=None) -> bytes:
+        data = self._encoder.encode(obj)
+        if indent:
+            data = self._msgspec.json.format(data, indent=indent)
+        return data
+
+    def loads(self, data):
+        try:
+            return self._decoder.decode(data)
+        except self._msgspec.DecodeError:
+            return _stdlib.loads(data)
+
+
+_stdlib = StdlibCodec()
+
+_CODECS = {"orjson": OrjsonCodec, "msgspec": MsgspecCodec, "json": StdlibCodec}
+
+
+def get_codec(name: str = JSON_CODEC):
+    """Instancia o codec pedido; "auto" tenta orjson, depois msgspec, depois json."""
+    if name != "auto":
+        return _CODECS[name]()
+    for candidate in ("orjson", "msgspec"):
+        try:
+            return _CODECS[candidate]()
+        except ImportError:
+            continue
+    return _stdlib
+
+
+codec = get_codec()
+
+
+def dumps(obj, indent=None) -> bytes:
+    return codec.dumps(obj, indent=indent)
+
+
+def loads(data):
+    return codec.loads(data)
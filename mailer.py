@@ -0,0 +1,324 @@
+"""
+Envio de e-mails (códigos de login) em segundo plano.
+
+`send_email_code` só coloca a mensagem numa fila e volta na hora; uma
+thread do processo esvazia a fila usando uma única conexão SMTP já
+autenticada (STARTTLS + login uma vez), reaproveitada entre mensagens.
+Mensagens que chegam juntas (ex.: um pico de logins de manhã) saem em lote
+na mesma sessão. Se a conexão cair ou o servidor responder com erro
+temporário, a conexão é refeita e a mensagem é reagendada (espera
+exponencial a partir de FINANCE_SMTP_RETRY_BACKOFF), até
+FINANCE_SMTP_RETRIES tentativas. A espera é só dessa mensagem: a thread
+continua entregando as demais enquanto o reenvio não vence. Depois de
+FINANCE_SMTP_IDLE segundos sem mensagens a conexão é encerrada (QUIT) para
+não ser derrubada pelo servidor.
+
+Usuário e senha vêm de FINANCE_SMTP_USER e FINANCE_SMTP_PASSWORD (não há
+valor padrão); sem eles, cada envio falha na hora com a explicação.
+
+Cada envio devolve um `MailJob`, que a página de login consulta para saber
+se o código já saiu ou se falhou (e por quê).
+
+Para testar localmente, aponte para um servidor SMTP de depuração:
+    FINANCE_SMTP_HOST=127.0.0.1 FINANCE_SMTP_PORT=1025 FINANCE_SMTP_STARTTLS=0 \\
+    FINANCE_SMTP_AUTH=0 streamlit run app.py
+"""
+
+import os
+import time
+import heapq
+import queue
+import itertools
+import logging
+import smtplib
+import threading
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+
+SMTP_HOST = os.environ.get("FINANCE_SMTP_HOST", "smtp.mail.me.com")
+SMTP_PORT = int(os.environ.get("FINANCE_SMTP_PORT", "587"))  # TLS
+SMTP_USER = os.environ.get("FINANCE_SMTP_USER", "")
+SMTP_PASSWORD = os.environ.get("FINANCE_SMTP_PASSWORD", "")
+SMTP_FROM = os.environ.get("FINANCE_SMTP_FROM", SMTP_USER)
+# FINANCE_SMTP_AUTH=0 envia sem login (ex.: servidor SMTP local de depuração).
+SMTP_AUTH = os.environ.get("FINANCE_SMTP_AUTH", "1") != "0"
+SMTP_STARTTLS = os.environ.get("FINANCE_SMTP_STARTTLS", "1") != "0"
+SMTP_TIMEOUT = float(os.environ.get("FINANCE_SMTP_TIMEOUT", "10"))
+SMTP_RETRIES = int(os.environ.get("FINANCE_SMTP_RETRIES", "3"))
+SMTP_RETRY_BACKOFF = float(os.environ.get("FINANCE_SMTP_RETRY_BACKOFF", "1"))
+SMTP_IDLE = float(os.environ.get("FINANCE_SMTP_IDLE", "30"))
+SMTP_BATCH = int(os.environ.get("FINANCE_SMTP_BATCH", "50"))
+
+log = logging.getLogger(__name__)
+
+# Conexão que caiu antes da resposta: é refeita e a mensagem volta para a
+# fila. `smtplib.SMTPException` herda de OSError, então as respostas do
+# servidor ficam de fora de propósito: 4xx voltam para a fila, 5xx são
+# definitivas.
+_TRANSIENT = (smtplib.SMTPServerDisconnected, ConnectionError)
+
+
+class MailJob:
+    """Uma mensagem na fila; `wait` bloqueia até ela sair ou falhar de vez."""
+
+    def __init__(self, msg):
+        self.msg = msg
+        self.attempts = 0
+        self.error = None
+        self._done = threading.Event()
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    @property
+    def ok(self) -> bool:
+        return self._done.is_set() and self.error is None
+
+    def wait(self, timeout: float = None) -> bool:
+        return self._done.wait(timeout)
+
+    def _finish(self, error: str = None):
+        self.error = error
+        self._done.set()
+
+
+class MailWorker:
+    """Fila + thread que envia por uma conexão SMTP reaproveitada."""
+
+    def __init__(
+        self,
+        host: str = SMTP_HOST,
+        port: int = SMTP_PORT,
+        user: str = SMTP_USER,
+        password: str = SMTP_PASSWORD,
+        auth: bool = SMTP_AUTH,
+        starttls: bool = SMTP_STARTTLS,
+        timeout: float = SMTP_TIMEOUT,
+        retries: int = SMTP_RETRIES,
+        backoff: float = SMTP_RETRY_BACKOFF,
+        idle: float = SMTP_IDLE,
+        batch: int = SMTP_BATCH,
+        smtp_factory=smtplib.SMTP,
+    ):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.auth = auth
+        self.starttls = starttls
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.idle = idle
+        self.batch = batch
+        self.smtp_factory = smtp_factory
+        self.sent = 0
+        self.failed = 0
+        self.connections = 0
+        self._queue = queue.Queue()
+        # Reenvios agendados (instante, ordem, job); só a thread de envio mexe.
+        self._delayed = []
+        self._seq = itertools.count()
+        self._smtp = None
+        self._last_use = 0.0
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, msg) -> MailJob:
+        """Enfileira a mensagem e volta na hora (a thread sobe na 1ª vez)."""
+        job = MailJob(msg)
+        faltando = self.missing_settings(msg)
+        if faltando:
+            self._fail(job, f"Configure {', '.join(faltando)} para enviar e-mails.")
+            return job
+        self._ensure_thread()
+        self._queue.put(job)
+        return job
+
+    def missing_settings(self, msg=None) -> list:
+        """Variáveis de ambiente que faltam para enviar `msg` (login e remetente)."""
+        exigidas = []
+        if self.auth:
+            exigidas += [("FINANCE_SMTP_USER", self.user), ("FINANCE_SMTP_PASSWORD", self.password)]
+        if msg is not None:
+            exigidas.append(("FINANCE_SMTP_FROM", msg["From"]))
+        return [nome for nome, valor in exigidas if not valor]
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="mailer", daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout: float = None):
+        """Envia o que já está na fila (inclusive reenvios agendados) e encerra a thread."""
+        with self._lock:
+            thread = self._thread
+        if thread is None:
+            return
+        self._queue.put(None)
+        thread.join(timeout)
+
+    # ------------------------------
+    # Thread de envio
+    # ------------------------------
+
+    def _run(self):
+        parando = False
+        while True:
+            lote = self._due_retries()
+            if not lote:
+                if parando and not self._delayed and self._queue.empty():
+                    self._disconnect()
+                    return
+                try:
+                    job = self._queue.get(timeout=self._wait_timeout())
+                except queue.Empty:
+                    if self._smtp is not None and time.monotonic() - self._last_use >= self.idle:
+                        self._disconnect()
+                    continue
+                if job is None:
+                    parando = True
+                    continue
+                lote = [job]
+
+            while len(lote) < self.batch:
+                try:
+                    proximo = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if proximo is None:
+                    parando = True  # encerra depois do que ainda falta
+                    break
+                lote.append(proximo)
+            self._send_batch(lote)
+
+    def _due_retries(self) -> list:
+        """Reenvios cujo horário já chegou (no máximo um lote)."""
+        agora = time.monotonic()
+        lote = []
+        while self._delayed and self._delayed[0][0] <= agora and len(lote) < self.batch:
+            lote.append(heapq.heappop(self._delayed)[2])
+        return lote
+
+    def _wait_timeout(self):
+        """
+        Quanto esperar por mensagens novas: até o próximo reenvio vencer ou
+        até a conexão aberta ficar ociosa (None = sem limite).
+        """
+        agora = time.monotonic()
+        prazos = []
+        if self._delayed:
+            prazos.append(self._delayed[0][0] - agora)
+        if self._smtp is not None:
+            prazos.append(self._last_use + self.idle - agora)
+        return max(0.0, min(prazos)) if prazos else None
+
+    def _send_batch(self, lote: list):
+        for i, job in enumerate(lote):
+            job.attempts += 1
+            try:
+                self._deliver(job.msg)
+            except smtplib.SMTPResponseException as e:
+                if 400 <= e.smtp_code < 500:
+                    self._retry_later(job, f"{e.smtp_code} {e.smtp_error!r}")
+                else:
+                    self._fail(job, f"{e.smtp_code} {e.smtp_error!r}")
+            except smtplib.SMTPRecipientsRefused as e:
+                self._fail(job, f"destinatário recusado: {list(e.recipients)}")
+            except _TRANSIENT as e:
+                self._reconnect_later(lote, i, e)
+                return
+            except smtplib.SMTPException as e:
+                # Outros erros de protocolo (ex.: servidor sem STARTTLS/AUTH).
+                self._disconnect()
+                self._fail(job, f"{type(e).__name__}: {e}")
+            except OSError as e:
+                # Timeout, DNS, rede fora: a conexão fica num estado incerto.
+                self._reconnect_later(lote, i, e)
+                return
+            else:
+                self.sent += 1
+                job._finish()
+
+    def _reconnect_later(self, lote: list, i: int, error: Exception):
+        """
+        Conexão caiu (ou não abriu): reagenda `lote[i]` e devolve o resto do
+        lote para a fila, para ser reenviado numa conexão nova.
+        """
+        self._disconnect()
+        self._retry_later(lote[i], f"{type(error).__name__}: {error}")
+        for resto in lote[i + 1:]:
+            self._queue.put(resto)
+
+    def _deliver(self, msg):
+        reused = self._smtp is not None
+        try:
+            self._connection().send_message(msg)
+        except _TRANSIENT:
+            # Conexão parada que o servidor já fechou: refaz na hora, sem
+            # contar como tentativa. Respostas de erro e timeouts não entram
+            # aqui: o servidor pode já ter aceitado a mensagem.
+            self._disconnect()
+            if not reused:
+                raise
+            self._connection().send_message(msg)
+        self._last_use = time.monotonic()
+
+    def _retry_later(self, job: MailJob, error: str):
+        if job.attempts > self.retries:
+            self._fail(job, error)
+            return
+        log.warning("Falha ao enviar e-mail (tentativa %d): %s", job.attempts, error)
+        # Agenda o reenvio em vez de dormir: as outras mensagens continuam saindo.
+        quando = time.monotonic() + self.backoff * 2 ** (job.attempts - 1)
+        heapq.heappush(self._delayed, (quando, next(self._seq), job))
+
+    def _fail(self, job: MailJob, error: str):
+        log.error("E-mail para %s não enviado: %s", job.msg["To"], error)
+        self.failed += 1
+        job._finish(error)
+
+    def _connection(self):
+        if self._smtp is None:
+            smtp = self.smtp_factory(self.host, self.port, timeout=self.timeout)
+            try:
+                if self.starttls:
+                    smtp.starttls()
+                if self.auth:
+                    smtp.login(self.user, self.password)
+            except BaseException:
+                smtp.close()
+                raise
+            self._smtp = smtp
+            self._last_use = time.monotonic()
+            self.connections += 1
+        return self._smtp
+
+    def _disconnect(self):
+        smtp, self._smtp = self._smtp, None
+        if smtp is None:
+            return
+        try:
+            smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            smtp.close()
+
+
+mail_worker = MailWorker()
+
+
+def login_code_message(email_to: str, code: str, sender: str = SMTP_FROM):
+    msg = MIMEMultipart()
+    msg["From"] = sender
+    msg["To"] = email_to
+    msg["Subject"] = "Seu código de login - Dashboard Financeiro"
+    msg.attach(MIMEText(f"Seu código de acesso é: {code}", "plain", "utf-8"))
+    return msg
+
+
+def send_email_code(email_to: str, code: str, worker: MailWorker = None) -> MailJob:
+    """Enfileira o e-mail com o código de login e devolve o `MailJob` (não bloqueia)."""
+    worker = worker or mail_worker
+    return worker.submit(login_code_message(email_to, code, sender=SMTP_FROM or worker.user))
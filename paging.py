@@ -0,0 +1,165 @@
+"""
+Paginação das tabelas de lançamentos no servidor.
+
+O `TableIndex` é montado uma vez por versão do frame e guarda a ordem das
+linhas por data (para o filtro de período por busca binária) e, sob
+demanda, a ordem por cada coluna pedida na ordenação. `filtered_order`
+aplica período, busca de texto e ordenação e devolve as posições (no frame
+inteiro) das linhas que passaram; `page_slice` recorta a página. O app
+serializa para o navegador apenas as linhas da página e usa as mesmas
+posições para levar as edições do data_editor de volta às linhas certas
+do ledger.
+
+Sem filtros, uma página custa só o fatiamento da ordem já calculada; com
+filtros, uma máscara vetorizada sobre o frame (a da busca de texto fica
+guardada para o mesmo termo).
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+PAGE_SIZES = (50, 100, 250, 500, 1000)
+PAGE_SIZE = int(os.environ.get("FINANCE_PAGE_SIZE", "100"))
+
+# Ordenação "natural": a ordem em que as linhas estão no ledger.
+ORDEM_LEDGER = "Ordem de lançamento"
+
+
+def _sort_keys(serie: pd.Series) -> np.ndarray:
+    """Chaves numéricas para ordenar a coluna (vazios/NaT sempre no fim)."""
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        categorias = serie.cat.categories.astype(str)
+        rank = np.empty(len(categorias), dtype=np.int64)
+        rank[np.argsort(categorias.to_numpy(), kind="stable")] = np.arange(len(categorias))
+        codes = serie.cat.codes.to_numpy()
+        return np.where(codes >= 0, rank[codes], len(categorias))
+    if pd.api.types.is_datetime64_any_dtype(serie.dtype):
+        valores = serie.to_numpy()
+        chaves = valores.astype("datetime64[s]").astype(np.int64).astype(np.float64)
+        chaves[np.isnat(valores)] = np.inf
+        return chaves
+    if pd.api.types.is_numeric_dtype(serie.dtype):
+        chaves = pd.to_numeric(serie, errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+        return np.where(np.isnan(chaves), np.inf, chaves)
+    # Texto: posto de cada valor distinto em ordem alfabética.
+    codes, uniques = pd.factorize(serie.astype(str).where(serie.notna()), sort=True)
+    return np.where(codes >= 0, codes, len(uniques))
+
+
+def _text_mask(serie: pd.Series, termo: str) -> np.ndarray:
+    """Linhas cuja coluna contém `termo` (sem diferenciar maiúsculas)."""
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        # Compara só as categorias e espalha pelos códigos.
+        achou = np.asarray(
+            serie.cat.categories.astype(str).str.contains(termo, case=False, regex=False),
+            dtype=bool,
+        )
+        codes = serie.cat.codes.to_numpy()
+        return np.where(codes >= 0, achou[codes], False)
+    if not (pd.api.types.is_string_dtype(serie.dtype) or serie.dtype == object):
+        serie = serie.astype(str)
+    return serie.str.contains(termo, case=False, regex=False, na=False).to_numpy(dtype=bool)
+
+
+class TableIndex:
+    """Índices de ordenação/filtro de um frame, para servir páginas dele."""
+
+    def __init__(self, df: pd.DataFrame, date_col: str = "Data", text_cols=None):
+        self.df = df
+        self.date_col = date_col if date_col in df.columns else None
+        if text_cols is None:
+            text_cols = [
+                col
+                for col in df.columns
+                if isinstance(df[col].dtype, pd.CategoricalDtype)
+                or pd.api.types.is_string_dtype(df[col].dtype)
+                or df[col].dtype == object
+            ]
+        self.text_cols = list(text_cols)
+        self._ordens = {}
+        self._busca = None  # (termo, máscara) da última busca de texto
+
+        self._datas = None
+        self._ordem_data = None
+        if self.date_col is not None:
+            datas = pd.to_datetime(df[self.date_col], errors="coerce").to_numpy()
+            # NaT fica no fim da ordem; o searchsorted nunca o alcança.
+            self._ordem_data = np.argsort(datas, kind="stable")
+            self._datas = datas[self._ordem_data]
+
+    def __len__(self) -> int:
+        return len(self.df)
+
+    @property
+    def sort_columns(self) -> list:
+        return [ORDEM_LEDGER] + list(self.df.columns)
+
+    def order(self, col: str = ORDEM_LEDGER, descending: bool = False) -> np.ndarray:
+        """Posições das linhas ordenadas por `col` (memorizado por coluna)."""
+        if col == ORDEM_LEDGER or col not in self.df.columns:
+            ordem = np.arange(len(self.df))
+        elif col == self.date_col:
+            ordem = self._ordem_data
+        else:
+            ordem = self._ordens.get(col)
+            if ordem is None:
+                ordem = np.argsort(_sort_keys(self.df[col]), kind="stable")
+                self._ordens[col] = ordem
+        return ordem[::-1] if descending else ordem
+
+    def _date_mask(self, inicio, fim) -> np.ndarray:
+        mascara = np.zeros(len(self.df), dtype=bool)
+        lo = 0 if inicio is None else np.searchsorted(
+            self._datas, np.datetime64(pd.Timestamp(inicio)), side="left"
+        )
+        if fim is None:
+            hi = len(self._datas) - int(np.isnat(self._datas).sum())
+        else:
+            # Fim inclusivo: tudo antes do dia seguinte.
+            limite = np.datetime64(pd.Timestamp(fim).normalize() + pd.Timedelta(days=1))
+            hi = np.searchsorted(self._datas, limite, side="left")
+        mascara[self._ordem_data[lo:hi]] = True
+        return mascara
+
+    def _search_mask(self, termo: str) -> np.ndarray:
+        if self._busca is not None and self._busca[0] == termo:
+            return self._busca[1]
+        mascara = np.zeros(len(self.df), dtype=bool)
+        for col in self.text_cols:
+            mascara |= _text_mask(self.df[col], termo)
+        self._busca = (termo, mascara)
+        return mascara
+
+    def filtered_order(
+        self,
+        inicio=None,
+        fim=None,
+        texto: str = "",
+        sort_by: str = ORDEM_LEDGER,
+        descending: bool = False,
+    ) -> np.ndarray:
+        """Posições (no frame inteiro) das linhas que passam nos filtros, já ordenadas."""
+        ordem = self.order(sort_by, descending)
+        texto = (texto or "").strip()
+        usa_datas = self.date_col is not None and (inicio is not None or fim is not None)
+        if not usa_datas and not texto:
+            return ordem
+
+        mascara = self._date_mask(inicio, fim) if usa_datas else None
+        if texto:
+            busca = self._search_mask(texto)
+            mascara = busca if mascara is None else mascara & busca
+        return ordem[mascara[ordem]]
+
+
+def page_count(total: int, page_size: int) -> int:
+    """Número de páginas (ao menos 1, para a tabela vazia)."""
+    return max(1, -(-total // page_size))
+
+
+def page_slice(ordem: np.ndarray, page: int, page_size: int) -> np.ndarray:
+    """Posições da página `page` (1 = primeira) de uma ordem filtrada."""
+    inicio = (page - 1) * page_size
+    return ordem[inicio:inicio + page_size]
@@ -0,0 +1,442 @@
+"""
+Cálculos sobre a carteira de patrimônio (sem Streamlit).
+
+As posições são montadas agrupando os lançamentos por (Tipo, Ativo) e todas
+as contas são feitas com operações vetorizadas do pandas/NumPy, então o
+custo cresce com o número de ativos distintos, não com o de lançamentos.
+
+Vendas são lançamentos com Quantidade (e Valor_Total_R$) negativos. O
+`PositionBook` consome as compras de cada ativo em lotes FIFO: com as
+quantidades e custos acumulados das compras, o custo FIFO de tudo que já
+foi vendido é uma interpolação linear (um único `np.interp` para todas as
+vendas de todos os ativos). Daí saem quantidade em carteira, custo e preço
+médio dos lotes abertos e resultado realizado por ativo. Um lançamento novo
+com data igual ou posterior ao último do ativo atualiza só aquele ativo.
+"""
+
+import numpy as np
+import pandas as pd
+
+from quotes import get_asset_prices_brl, resolve_symbol, USD_BRL_SYMBOL
+from price_history import get_price_histories
+
+POSITION_COLUMNS = [
+    "Tipo",
+    "Ativo",
+    "Quantidade",
+    "Preço_Médio_R$",
+    "Valor_Investido_R$",
+    "Preço_Atual_R$",
+    "Valor_Atual_R$",
+    "Variação_R$",
+    "Variação_%",
+    "Realizado_R$",
+]
+
+BOOK_COLUMNS = ["Tipo", "Ativo", "Quantidade", "Preço_Médio_R$", "Custo_R$", "Realizado_R$"]
+LOT_COLUMNS = ["Tipo", "Ativo", "Data", "Quantidade", "Preço_R$", "Custo_R$"]
+
+# Quantidades menores que isso contam como posição zerada (resíduo de float).
+QTD_EPS = 1e-9
+
+# Chave de ordenação de datas vazias: depois de qualquer data válida.
+_SEM_DATA = np.iinfo(np.int64).max
+
+
+def _asset_key(tipo, ativo) -> tuple:
+    return (str(tipo), str(ativo).strip().upper())
+
+
+def _date_key(data) -> int:
+    try:
+        data = pd.Timestamp(data)
+    except (TypeError, ValueError):
+        return _SEM_DATA
+    return _SEM_DATA if pd.isna(data) else int(data.value // 10**9)
+
+
+def _float(valor) -> float:
+    try:
+        valor = float(valor)
+    except (TypeError, ValueError):
+        return 0.0
+    return 0.0 if valor != valor else valor
+
+
+def _group_cumsum(x: np.ndarray, starts: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """cumsum reiniciado no começo de cada grupo (linhas já agrupadas)."""
+    total = np.cumsum(x)
+    return total - np.repeat(total[starts] - x[starts], counts)
+
+
+def _group_shift(x: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    """Valor da linha anterior do mesmo grupo (0 na primeira linha de cada grupo)."""
+    anterior = np.empty_like(x)
+    anterior[0] = 0
+    anterior[1:] = x[:-1]
+    anterior[starts] = 0
+    return anterior
+
+
+class _Asset:
+    """Compras (acumuladas) e vendas já consumidas de um ativo."""
+
+    __slots__ = ("qtd_acum", "custo_acum", "datas", "vendido", "custo_vendido",
+                 "realizado", "ultima")
+
+    def __init__(self, qtd_acum, custo_acum, datas, vendido=0.0, custo_vendido=0.0,
+                 realizado=0.0, ultima=np.iinfo(np.int64).min):
+        self.qtd_acum = qtd_acum      # [0, q1, q1+q2, ...] das compras
+        self.custo_acum = custo_acum  # [0, c1, c1+c2, ...]
+        self.datas = datas            # data de cada compra (lote)
+        self.vendido = vendido        # quantidade já consumida pelas vendas
+        self.custo_vendido = custo_vendido
+        self.realizado = realizado
+        self.ultima = ultima          # chave da data do último lançamento
+
+    @classmethod
+    def empty(cls) -> "_Asset":
+        return cls(np.zeros(1), np.zeros(1), np.empty(0, dtype="datetime64[s]"))
+
+    def fifo_cost(self, quantidade: float) -> float:
+        """Custo FIFO das primeiras `quantidade` unidades compradas."""
+        return float(np.interp(quantidade, self.qtd_acum, self.custo_acum))
+
+    @property
+    def quantidade(self) -> float:
+        return float(self.qtd_acum[-1]) - self.vendido
+
+    @property
+    def custo(self) -> float:
+        return float(self.custo_acum[-1]) - self.custo_vendido
+
+
+class PositionBook:
+    """
+    Posições por (Tipo, Ativo) com lotes FIFO, montadas de uma vez a partir
+    do frame de patrimônio (`from_frame`) e atualizadas por `add`.
+    """
+
+    def __init__(self, ativos: dict = None):
+        self._ativos = ativos or {}
+
+    def __len__(self) -> int:
+        return len(self._ativos)
+
+    @classmethod
+    def from_frame(cls, df_p: pd.DataFrame) -> "PositionBook":
+        if df_p is None or df_p.empty:
+            return cls()
+
+        # Chave do ativo via categorias: normaliza cada Ativo distinto uma vez.
+        tipo = df_p["Tipo"].astype("category")
+        ativo = df_p["Ativo"].astype("category")
+        nomes, cod_nome = np.unique(
+            ativo.cat.categories.astype(str).str.strip().str.upper().to_numpy(dtype=object),
+            return_inverse=True,
+        )
+        cod_ativo = np.where(ativo.cat.codes.to_numpy() >= 0, cod_nome[ativo.cat.codes], -1)
+        cod_tipo = tipo.cat.codes.to_numpy().astype(np.int64)
+        chaves, grupo = np.unique(
+            cod_tipo * (len(nomes) + 1) + (cod_ativo + 1), return_inverse=True
+        )
+        tipos = tipo.cat.categories.astype(str).to_numpy(dtype=object)
+
+        datas = df_p["Data"]
+        if not pd.api.types.is_datetime64_any_dtype(datas.dtype):
+            datas = pd.to_datetime(datas, errors="coerce")
+        datas = datas.to_numpy(dtype="datetime64[s]")
+        chave_data = np.where(np.isnat(datas), _SEM_DATA, datas.astype(np.int64))
+        qtd = pd.to_numeric(df_p["Quantidade"], errors="coerce").to_numpy(
+            dtype="float64", na_value=0.0
+        )
+        valor = pd.to_numeric(df_p["Valor_Total_R$"], errors="coerce").to_numpy(
+            dtype="float64", na_value=0.0
+        )
+        qtd = np.nan_to_num(qtd)
+        valor = np.nan_to_num(valor)
+
+        # Ativo, data e posição no ledger (lançamentos do mesmo dia na ordem
+        # em que foram feitos).
+        ordem = np.lexsort((np.arange(len(qtd)), chave_data, grupo))
+        g, qtd, valor, datas = grupo[ordem], qtd[ordem], valor[ordem], datas[ordem]
+        chave_data = chave_data[ordem]
+
+        n = len(g)
+        starts = np.flatnonzero(np.r_[True, g[1:] != g[:-1]])
+        counts = np.diff(np.r_[starts, n])
+        ends = starts + counts - 1
+
+        compra = qtd > 0
+        q_compra = np.where(compra, qtd, 0.0)
+        c_compra = np.where(compra, valor, 0.0)
+        q_venda = np.where(qtd < 0, -qtd, 0.0)
+        receita = np.where(qtd < 0, np.abs(valor), 0.0)
+
+        comprado = _group_cumsum(q_compra, starts, counts)
+        pedido = _group_cumsum(q_venda, starts, counts)
+        # Venda além da posição só consome o que havia: vendido efetivo
+        # s_i = min(s_{i-1} + q_i, comprado_i) = pedido_i + min(0, cummin(comprado - pedido)).
+        folga = pd.Series(comprado - pedido).groupby(g).cummin().to_numpy()
+        vendido = pedido + np.minimum(folga, 0.0)
+        vendido_linha = vendido - _group_shift(vendido, starts)
+
+        # Curva global (todos os ativos em sequência) de quantidade x custo
+        # das compras; o custo FIFO das primeiras S unidades do ativo é a
+        # interpolação em (início do ativo + S).
+        q_global = np.cumsum(q_compra)
+        c_global = np.cumsum(c_compra)
+        xp = np.r_[0.0, q_global[compra]]
+        fp = np.r_[0.0, c_global[compra]]
+        q_inicio = np.repeat(q_global[starts] - q_compra[starts], counts)
+        c_inicio = np.repeat(c_global[starts] - c_compra[starts], counts)
+        custo_fifo = np.interp(q_inicio + vendido, xp, fp) - c_inicio
+        custo_linha = custo_fifo - _group_shift(custo_fifo, starts)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            receita_efetiva = np.where(q_venda > 0, receita * vendido_linha / q_venda, 0.0)
+        realizado = np.add.reduceat(receita_efetiva - custo_linha, starts)
+
+        # Compras de cada ativo, para o estado incremental e os lotes: os
+        # acumulados ganham um 0 na frente de cada ativo antes do split.
+        cortes = np.searchsorted(g[compra], np.arange(1, len(chaves)))
+        inicios = np.r_[0, cortes]
+        cortes_zero = cortes + np.arange(1, len(chaves))
+        comprado_c = np.split(np.insert(comprado[compra], inicios, 0.0), cortes_zero)
+        custo_c = np.split(
+            np.insert(_group_cumsum(c_compra, starts, counts)[compra], inicios, 0.0),
+            cortes_zero,
+        )
+        datas_c = np.split(datas[compra], cortes)
+
+        ativos = {}
+        for i, chave in enumerate(chaves):
+            cod_t, cod_a = divmod(int(chave), len(nomes) + 1)
+            nome = (
+                str(tipos[cod_t]) if cod_t >= 0 else "",
+                str(nomes[cod_a - 1]) if cod_a > 0 else "",
+            )
+            ativos[nome] = _Asset(
+                comprado_c[i],
+                custo_c[i],
+                datas_c[i],
+                vendido=float(vendido[ends[i]]),
+                custo_vendido=float(custo_fifo[ends[i]]),
+                realizado=float(realizado[i]),
+                ultima=int(chave_data[ends[i]]),
+            )
+        return cls(ativos)
+
+    def add(self, row: dict) -> bool:
+        """
+        Aplica um lançamento novo. Devolve False (sem mudar nada) se ele
+        tiver data anterior ao último lançamento do ativo: aí a ordem FIFO
+        muda e o livro precisa ser remontado com `from_frame`.
+        """
+        chave = _asset_key(row.get("Tipo", ""), row.get("Ativo", ""))
+        data = _date_key(row.get("Data"))
+        ativo = self._ativos.get(chave)
+        if ativo is not None and data < ativo.ultima:
+            return False
+        if ativo is None:
+            ativo = self._ativos[chave] = _Asset.empty()
+        ativo.ultima = data
+
+        qtd = _float(row.get("Quantidade"))
+        valor = _float(row.get("Valor_Total_R$"))
+        if qtd > 0:
+            data_lote = np.datetime64("NaT", "s") if data == _SEM_DATA else np.datetime64(data, "s")
+            ativo.qtd_acum = np.append(ativo.qtd_acum, ativo.qtd_acum[-1] + qtd)
+            ativo.custo_acum = np.append(ativo.custo_acum, ativo.custo_acum[-1] + valor)
+            ativo.datas = np.append(ativo.datas, data_lote)
+        elif qtd < 0:
+            vendido = min(-qtd, max(ativo.quantidade, 0.0))
+            custo = ativo.fifo_cost(ativo.vendido + vendido) - ativo.fifo_cost(ativo.vendido)
+            ativo.realizado += abs(valor) * vendido / -qtd - custo
+            ativo.vendido += vendido
+            ativo.custo_vendido += custo
+        return True
+
+    def quantity(self, tipo, ativo) -> float:
+        """Quantidade em carteira do ativo (0 se não houver)."""
+        posicao = self._ativos.get(_asset_key(tipo, ativo))
+        return 0.0 if posicao is None else posicao.quantidade
+
+    def positions(self) -> pd.DataFrame:
+        """Uma linha por ativo: quantidade, preço médio e custo dos lotes abertos, realizado."""
+        chaves = sorted(self._ativos)
+        ativos = [self._ativos[c] for c in chaves]
+        qtd = np.array([a.quantidade for a in ativos], dtype="float64")
+        custo = np.array([a.custo for a in ativos], dtype="float64")
+        aberta = np.abs(qtd) > QTD_EPS
+        qtd = np.where(aberta, qtd, 0.0)
+        custo = np.where(aberta, custo, 0.0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            preco_medio = np.where(aberta, custo / qtd, np.nan)
+        return pd.DataFrame(
+            {
+                "Tipo": [c[0] for c in chaves],
+                "Ativo": [c[1] for c in chaves],
+                "Quantidade": qtd,
+                "Preço_Médio_R$": preco_medio,
+                "Custo_R$": custo,
+                "Realizado_R$": np.array([a.realizado for a in ativos], dtype="float64"),
+            },
+            columns=BOOK_COLUMNS,
+        )
+
+    def lots(self) -> pd.DataFrame:
+        """Lotes FIFO ainda abertos (o mais antigo de cada ativo pode estar parcial)."""
+        partes = []
+        for (tipo, nome), ativo in sorted(self._ativos.items()):
+            lote_qtd = np.diff(ativo.qtd_acum)
+            lote_custo = np.diff(ativo.custo_acum)
+            resta = np.clip(ativo.qtd_acum[1:] - ativo.vendido, 0.0, lote_qtd)
+            abertos = resta > QTD_EPS
+            if not abertos.any():
+                continue
+            with np.errstate(divide="ignore", invalid="ignore"):
+                preco = lote_custo[abertos] / lote_qtd[abertos]
+            partes.append(
+                pd.DataFrame(
+                    {
+                        "Tipo": tipo,
+                        "Ativo": nome,
+                        "Data": ativo.datas[abertos],
+                        "Quantidade": resta[abertos],
+                        "Preço_R$": preco,
+                        "Custo_R$": resta[abertos] * preco,
+                    }
+                )
+            )
+        if not partes:
+            return pd.DataFrame(columns=LOT_COLUMNS)
+        return pd.concat(partes, ignore_index=True)[LOT_COLUMNS]
+
+
+def positions_from_patrimonio(df_p: pd.DataFrame, book: PositionBook = None) -> pd.DataFrame:
+    """
+    Posições em carteira por (Tipo, Ativo): quantidade e custo FIFO dos
+    lotes abertos (Valor_Investido_R$), preço médio e resultado realizado.
+    """
+    if book is None:
+        book = PositionBook.from_frame(df_p)
+    return book.positions().rename(columns={"Custo_R$": "Valor_Investido_R$"})
+
+
+def revalue_positions(
+    df_p: pd.DataFrame, price_lookup=get_asset_prices_brl, book: PositionBook = None
+) -> pd.DataFrame:
+    """
+    Marca a mercado cada posição do patrimônio.
+
+    Busca de uma vez (em paralelo) o preço atual dos ativos ainda em
+    carteira e calcula o valor atual de cada posição (a Variação é o
+    resultado não realizado). Ativos sem cotação (tipo "Outro" ou falha na
+    busca) ficam pelo valor investido; posições zeradas valem 0.
+    """
+    pos = positions_from_patrimonio(df_p, book)
+    if pos.empty:
+        return pd.DataFrame(columns=POSITION_COLUMNS)
+
+    qtd = pos["Quantidade"].to_numpy(dtype="float64")
+    keys = list(zip(pos["Tipo"], pos["Ativo"]))
+    prices = price_lookup([k for k, q in zip(keys, qtd) if q != 0])
+
+    preco = pd.Series(
+        [prices.get(k) if q != 0 else None for k, q in zip(keys, qtd)],
+        index=pos.index,
+        dtype="float64",
+    )
+    tem_preco = preco.notna().to_numpy()
+
+    investido = pos["Valor_Investido_R$"].to_numpy(dtype="float64")
+    atual = np.where(tem_preco, qtd * preco.to_numpy(), investido)
+
+    pos["Preço_Atual_R$"] = preco
+    pos["Valor_Atual_R$"] = atual
+    pos["Variação_R$"] = atual - investido
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pos["Variação_%"] = np.where(
+            investido != 0, (atual - investido) / investido * 100.0, np.nan
+        )
+
+    return pos[POSITION_COLUMNS]
+
+
+def portfolio_value_history(
+    df_p: pd.DataFrame, history_lookup=get_price_histories
+) -> pd.Series:
+    """
+    Valor de mercado diário da carteira, do primeiro lançamento até hoje.
+
+    Monta a matriz de quantidades (datas x ativos, acumulada) e a matriz de
+    preços diários (histórico local, com o último fechamento repetido em
+    fins de semana/feriados) e faz o produto linha a linha. Antes do
+    primeiro fechamento conhecido, e para ativos sem cotação, vale o preço
+    médio de compra.
+    """
+    if df_p is None or df_p.empty:
+        return pd.Series(dtype="float64", name="Patrimonio_Mercado")
+
+    datas = pd.to_datetime(df_p["Data"], errors="coerce").dt.normalize()
+    df = pd.DataFrame(
+        {
+            "Data": datas,
+            "Tipo": df_p["Tipo"].astype(str),
+            "Ativo": df_p["Ativo"].astype(str).str.strip().str.upper(),
+            "Quantidade": pd.to_numeric(df_p["Quantidade"], errors="coerce").fillna(0.0),
+            "Valor": pd.to_numeric(df_p["Valor_Total_R$"], errors="coerce").fillna(0.0),
+        }
+    ).dropna(subset=["Data"])
+    if df.empty:
+        return pd.Series(dtype="float64", name="Patrimonio_Mercado")
+
+    inicio = df["Data"].min()
+    fim = max(pd.Timestamp.today().normalize(), df["Data"].max())
+    dias = pd.date_range(inicio, fim, freq="D", name="Data")
+
+    df["Chave"] = df["Tipo"] + "|" + df["Ativo"]
+    qtd = df.pivot_table(
+        index="Data", columns="Chave", values="Quantidade", aggfunc="sum"
+    )
+    holdings = qtd.reindex(dias, fill_value=0.0).fillna(0.0).cumsum()
+
+    totais = df.groupby("Chave")[["Quantidade", "Valor"]].sum()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        preco_medio = (totais["Valor"] / totais["Quantidade"]).replace(
+            [np.inf, -np.inf], np.nan
+        ).fillna(0.0)
+
+    chaves = list(holdings.columns)
+    tipos = [c.split("|", 1)[0] for c in chaves]
+    simbolos = [resolve_symbol(t, c.split("|", 1)[1]) for t, c in zip(tipos, chaves)]
+
+    wanted = [s for s in simbolos if s is not None]
+    if "Criptomoeda" in tipos:
+        wanted.append(USD_BRL_SYMBOL)
+    historicos = history_lookup(wanted, inicio.date(), fim.date()) if wanted else {}
+
+    def diario(symbol):
+        serie = historicos.get(symbol)
+        if symbol is None or serie is None or serie.empty:
+            return pd.Series(np.nan, index=dias)
+        return serie.reindex(dias.union(serie.index)).ffill().reindex(dias)
+
+    usd_brl = diario(USD_BRL_SYMBOL).ffill().bfill() if "Criptomoeda" in tipos else None
+
+    precos = pd.DataFrame(
+        {
+            chave: diario(symbol) * (usd_brl if tipo == "Criptomoeda" else 1.0)
+            for chave, tipo, symbol in zip(chaves, tipos, simbolos)
+        },
+        index=dias,
+    )
+    precos = precos.fillna(preco_medio.reindex(chaves))
+
+    valores = np.einsum(
+        "ij,ij->i",
+        holdings.to_numpy(dtype="float64"),
+        precos[chaves].to_numpy(dtype="float64"),
+    )
+    return pd.Series(valores, index=dias, name="Patrimonio_Mercado")
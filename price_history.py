@@ -0,0 +1,198 @@
+"""
+Histórico local de fechamentos diários por símbolo.
+
+Cada símbolo fica em PRICE_HISTORY_DIR como um array NumPy estruturado
+(`data` datetime64[D], `fechamento` float64) salvo em `.npy` e lido com
+mmap, mais um pequeno `.json` com o intervalo de datas já consultado no
+Yahoo. Só os trechos ainda não consultados são buscados no endpoint de
+chart; reabrir o dashboard para datas já cobertas não faz nenhuma chamada
+de rede. O dia de hoje nunca é marcado como coberto, já que o fechamento
+ainda pode mudar.
+"""
+
+import os
+import json
+import tempfile
+import threading
+import urllib.parse
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from storage import file_lock, atomic_write_text
+from quotes import quote_executor, yahoo_chart
+
+PRICE_HISTORY_DIR = "price_history"
+
+HISTORY_DTYPE = np.dtype([("data", "datetime64[D]"), ("fechamento", "float64")])
+
+_symbol_locks = {}
+_symbol_locks_guard = threading.Lock()
+
+
+def _symbol_lock(symbol: str) -> threading.Lock:
+    with _symbol_locks_guard:
+        return _symbol_locks.setdefault(symbol, threading.Lock())
+
+
+def _paths(symbol: str):
+    safe = urllib.parse.quote(symbol, safe="")
+    base = os.path.join(PRICE_HISTORY_DIR, safe)
+    return base + ".npy", base + ".json"
+
+
+# ==============================
+# LEITURA / ESCRITA LOCAL
+# ==============================
+
+def load_history(symbol: str) -> pd.Series:
+    """Fechamentos já gravados em disco (Series indexada por data)."""
+    npy_path, _ = _paths(symbol)
+    if not os.path.exists(npy_path):
+        return pd.Series(dtype="float64", index=pd.DatetimeIndex([], name="Data"))
+
+    arr = np.load(npy_path, mmap_mode="r")
+    return pd.Series(
+        np.asarray(arr["fechamento"]),
+        index=pd.DatetimeIndex(np.asarray(arr["data"]), name="Data"),
+    )
+
+
+def _load_coverage(symbol: str):
+    _, meta_path = _paths(symbol)
+    if not os.path.exists(meta_path):
+        return None
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        return date.fromisoformat(meta["inicio"]), date.fromisoformat(meta["fim"])
+    except (ValueError, KeyError, json.JSONDecodeError):
+        return None
+
+
+def _save(symbol: str, series: pd.Series, coverage):
+    npy_path, meta_path = _paths(symbol)
+    os.makedirs(PRICE_HISTORY_DIR, exist_ok=True)
+
+    arr = np.empty(len(series), dtype=HISTORY_DTYPE)
+    arr["data"] = series.index.values.astype("datetime64[D]")
+    arr["fechamento"] = series.to_numpy(dtype="float64")
+
+    fd, tmp_path = tempfile.mkstemp(dir=PRICE_HISTORY_DIR, suffix=".npy.tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, arr)
+        os.replace(tmp_path, npy_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    atomic_write_text(
+        meta_path,
+        json.dumps({"inicio": coverage[0].isoformat(), "fim": coverage[1].isoformat()}),
+    )
+
+
+# ==============================
+# BUSCA INCREMENTAL NO YAHOO
+# ==============================
+
+def yahoo_daily_closes(symbol: str, start: date, end: date):
+    """
+    Fechamentos diários de `start` a `end` (inclusive) pelo endpoint de
+    chart do Yahoo. Retorna Series (possivelmente vazia) ou None em erro.
+    """
+    try:
+        data = yahoo_chart(
+            symbol,
+            {
+                "period1": int(pd.Timestamp(start).timestamp()),
+                "period2": int(pd.Timestamp(end + timedelta(days=1)).timestamp()),
+                "interval": "1d",
+            },
+        )
+
+        result = (data.get("chart", {}).get("result") or [None])[0]
+        if not result or not result.get("timestamp"):
+            return pd.Series(dtype="float64", index=pd.DatetimeIndex([], name="Data"))
+
+        offset = (result.get("meta") or {}).get("gmtoffset", 0) or 0
+        stamps = np.asarray(result["timestamp"], dtype="int64") + int(offset)
+        closes = result.get("indicators", {}).get("quote", [{}])[0].get("close", [])
+
+        series = pd.Series(
+            pd.to_numeric(pd.Series(closes, dtype="object"), errors="coerce").to_numpy(
+                dtype="float64"
+            ),
+            index=pd.DatetimeIndex(
+                pd.to_datetime(stamps, unit="s").normalize(), name="Data"
+            ),
+        ).dropna()
+        return series[~series.index.duplicated(keep="last")]
+    except Exception:
+        return None
+
+
+def _missing_ranges(coverage, start: date, end: date):
+    if coverage is None:
+        return [(start, end)]
+    ranges = []
+    if start < coverage[0]:
+        ranges.append((start, coverage[0] - timedelta(days=1)))
+    if end > coverage[1]:
+        ranges.append((coverage[1] + timedelta(days=1), end))
+    return ranges
+
+
+def get_price_history(symbol: str, start: date, end: date) -> pd.Series:
+    """
+    Fechamentos diários do símbolo entre `start` e `end`, buscando no Yahoo
+    apenas os trechos que ainda não estão no histórico local.
+    """
+    start = pd.Timestamp(start).date()
+    end = pd.Timestamp(end).date()
+    npy_path, _ = _paths(symbol)
+
+    with _symbol_lock(symbol), file_lock(npy_path):
+        coverage = _load_coverage(symbol)
+        missing = _missing_ranges(coverage, start, end)
+
+        if missing:
+            series = load_history(symbol)
+            new_start = start if coverage is None else min(start, coverage[0])
+            new_end = end if coverage is None else max(end, coverage[1])
+            ok = True
+            for r_start, r_end in missing:
+                fetched = yahoo_daily_closes(symbol, r_start, r_end)
+                if fetched is None:
+                    ok = False
+                    continue
+                series = pd.concat([series, fetched])
+
+            series = series[~series.index.duplicated(keep="last")].sort_index()
+            # Hoje ainda não fechou: fica fora da cobertura para ser rebuscado.
+            new_end = min(new_end, date.today() - timedelta(days=1))
+            if ok and new_end >= new_start:
+                _save(symbol, series, (new_start, new_end))
+            elif len(series):
+                old = coverage or (new_start, new_start - timedelta(days=1))
+                _save(symbol, series, old)
+        else:
+            series = load_history(symbol)
+
+    return series.loc[pd.Timestamp(start):pd.Timestamp(end)]
+
+
+def get_price_histories(symbols, start: date, end: date) -> dict:
+    """Histórico de vários símbolos, buscados em paralelo."""
+    symbols = list(dict.fromkeys(symbols))
+    futures = {s: quote_executor.submit(get_price_history, s, start, end) for s in symbols}
+    result = {}
+    for symbol, future in futures.items():
+        try:
+            result[symbol] = future.result()
+        except Exception:
+            result[symbol] = pd.Series(dtype="float64", index=pd.DatetimeIndex([], name="Data"))
+    return result
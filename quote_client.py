@@ -0,0 +1,299 @@
+"""
+Cliente HTTP das cotações: conexões keep-alive reaproveitadas, limite de
+requisições simultâneas por host e circuit breaker.
+
+Cada host tem um pool de conexões `http.client` abertas (o handshake TLS é
+pago uma vez por conexão, não por cotação) e um semáforo que limita quantas
+requisições vão ao mesmo tempo para ele. Falhas de rede, timeouts, 429 e
+5xx são repetidas com espera exponencial; quando um host acumula
+QUOTE_BREAKER_FAILURES chamadas falhas seguidas, o circuito abre e as
+chamadas seguintes falham na hora (`CircuitOpenError`) por
+QUOTE_BREAKER_COOLDOWN segundos. Depois disso uma única chamada de teste
+passa: se der certo o circuito fecha, senão abre de novo.
+
+Os erros saem como `QuoteError` (e subclasses) com a causa na mensagem,
+para quem chama decidir o que fazer (ex.: usar a última cotação em cache).
+"""
+
+import os
+import ssl
+import json
+import time
+import threading
+import http.client
+import urllib.parse
+
+from instrumentation import count_bytes
+
+QUOTE_HOST_CONCURRENCY = int(os.environ.get("QUOTE_HOST_CONCURRENCY", "4"))
+QUOTE_BREAKER_FAILURES = int(os.environ.get("QUOTE_BREAKER_FAILURES", "3"))
+QUOTE_BREAKER_COOLDOWN = float(os.environ.get("QUOTE_BREAKER_COOLDOWN", "30"))
+
+DEFAULT_HEADERS = {"User-Agent": "Mozilla/5.0", "Accept": "application/json"}
+
+# Erros de uma conexão keep-alive que o servidor já fechou: a requisição é
+# refeita uma vez numa conexão nova, sem contar como falha.
+_STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.CannotSendRequest,
+    ConnectionResetError,
+    BrokenPipeError,
+)
+
+
+class QuoteError(Exception):
+    """Falha ao buscar uma cotação (rede, timeout, HTTP ou circuito aberto)."""
+
+
+class QuoteHTTPError(QuoteError):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class CircuitOpenError(QuoteError):
+    """O host falhou demais há pouco; a chamada nem foi feita."""
+
+
+# ==============================
+# CIRCUIT BREAKER
+# ==============================
+
+class CircuitBreaker:
+    """Fechado -> aberto após `failures` falhas seguidas -> meio-aberto após `cooldown`."""
+
+    def __init__(
+        self,
+        failures: int = QUOTE_BREAKER_FAILURES,
+        cooldown: float = QUOTE_BREAKER_COOLDOWN,
+        clock=time.monotonic,
+    ):
+        self.failures = failures
+        self.cooldown = cooldown
+        self.clock = clock
+        self._count = 0
+        self._opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if self.clock() - self._opened_at < self.cooldown:
+                return "open"
+            return "half-open"
+
+    def before_call(self, name: str = "") -> bool:
+        """
+        Levanta CircuitOpenError se a chamada não deve sair agora. Devolve
+        True quando esta é a chamada de teste do meio-aberto: quem chama tem
+        de registrar o resultado ou liberar o teste com `release_probe`.
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return False
+            restante = self.cooldown - (self.clock() - self._opened_at)
+            if restante > 0:
+                raise CircuitOpenError(
+                    f"{name}: circuito aberto após {self._count} falhas seguidas "
+                    f"(nova tentativa em {restante:.0f}s)"
+                )
+            if self._probing:
+                raise CircuitOpenError(f"{name}: circuito meio-aberto, teste em andamento")
+            self._probing = True
+            return True
+
+    def release_probe(self):
+        """Libera o teste do meio-aberto sem contar sucesso nem falha."""
+        with self._lock:
+            self._probing = False
+
+    def record_success(self):
+        with self._lock:
+            self._count = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._count += 1
+            self._probing = False
+            if self._opened_at is not None or self._count >= self.failures:
+                self._opened_at = self.clock()
+
+
+# ==============================
+# POOL DE CONEXÕES POR HOST
+# ==============================
+
+class HostPool:
+    """Conexões keep-alive para um (esquema, host, porta), no máximo `size` em uso."""
+
+    def __init__(self, scheme: str, host: str, port, size: int, timeout: float, ssl_context=None):
+        self.scheme = scheme
+        self.host = host
+        self.port = port
+        self.size = size
+        self.timeout = timeout
+        self.ssl_context = ssl_context
+        self.opened = 0  # conexões abertas desde o início (para medir o reuso)
+        self._idle = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def _connect(self):
+        with self._lock:
+            self.opened += 1
+        if self.scheme == "https":
+            return http.client.HTTPSConnection(
+                self.host, self.port, timeout=self.timeout, context=self.ssl_context
+            )
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def request(self, path: str, headers: dict):
+        """(status, corpo) de um GET, reaproveitando uma conexão ociosa."""
+        if not self._slots.acquire(timeout=self.timeout):
+            # TimeoutError (OSError): conta como falha de rede nas repetições.
+            raise TimeoutError(
+                f"{self.size} requisições simultâneas já em andamento"
+            )
+        try:
+            with self._lock:
+                conn = self._idle.pop() if self._idle else None
+            if conn is not None:
+                try:
+                    return self._send(conn, path, headers)
+                except _STALE_CONNECTION_ERRORS:
+                    pass
+            return self._send(self._connect(), path, headers)
+        finally:
+            self._slots.release()
+
+    def _send(self, conn, path: str, headers: dict):
+        try:
+            conn.request("GET", path, headers=headers)
+            resp = conn.getresponse()
+            body = resp.read()
+        except BaseException:
+            conn.close()
+            raise
+
+        if resp.will_close:
+            conn.close()
+        else:
+            with self._lock:
+                if len(self._idle) < self.size:
+                    self._idle.append(conn)
+                    conn = None
+            if conn is not None:
+                conn.close()
+        return resp.status, body
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+# ==============================
+# CLIENTE
+# ==============================
+
+class QuoteClient:
+    """GETs de JSON com pool por host, repetições e circuit breaker por host."""
+
+    def __init__(
+        self,
+        timeout: float = 3.0,
+        retries: int = 2,
+        backoff: float = 0.25,
+        per_host: int = QUOTE_HOST_CONCURRENCY,
+        breaker_failures: int = QUOTE_BREAKER_FAILURES,
+        breaker_cooldown: float = QUOTE_BREAKER_COOLDOWN,
+        headers: dict = None,
+        ssl_context=None,
+    ):
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.per_host = per_host
+        self.breaker_failures = breaker_failures
+        self.breaker_cooldown = breaker_cooldown
+        self.headers = dict(headers or DEFAULT_HEADERS)
+        self.ssl_context = ssl_context or ssl.create_default_context()
+        self._hosts = {}  # (esquema, host, porta) -> (HostPool, CircuitBreaker)
+        self._lock = threading.Lock()
+
+    def _host(self, scheme: str, host: str, port):
+        key = (scheme, host, port)
+        with self._lock:
+            item = self._hosts.get(key)
+            if item is None:
+                item = (
+                    HostPool(scheme, host, port, self.per_host, self.timeout, self.ssl_context),
+                    CircuitBreaker(self.breaker_failures, self.breaker_cooldown),
+                )
+                self._hosts[key] = item
+            return item
+
+    def breaker(self, url: str) -> CircuitBreaker:
+        parts = urllib.parse.urlsplit(url)
+        return self._host(parts.scheme, parts.hostname, parts.port)[1]
+
+    def pool(self, url: str) -> HostPool:
+        parts = urllib.parse.urlsplit(url)
+        return self._host(parts.scheme, parts.hostname, parts.port)[0]
+
+    def get_json(self, url: str):
+        """
+        GET em `url` devolvendo o JSON decodificado. Levanta CircuitOpenError
+        sem fazer a chamada se o host está com o circuito aberto, e
+        QuoteError/QuoteHTTPError com a causa quando as tentativas acabam.
+        """
+        parts = urllib.parse.urlsplit(url)
+        pool, breaker = self._host(parts.scheme, parts.hostname, parts.port)
+        path = urllib.parse.urlunsplit(("", "", parts.path or "/", parts.query, ""))
+        probe = breaker.before_call(parts.hostname)
+        settled = False
+        try:
+            for attempt in range(self.retries + 1):
+                try:
+                    status, body = pool.request(path, self.headers)
+                except (OSError, http.client.HTTPException) as e:
+                    error = QuoteError(f"{parts.hostname}: {type(e).__name__}: {e}")
+                else:
+                    count_bytes(read=len(body))
+                    if status == 200:
+                        breaker.record_success()
+                        settled = True
+                        try:
+                            return json.loads(body)
+                        except ValueError as e:
+                            raise QuoteError(f"{parts.hostname}: JSON inválido ({e})")
+                    error = QuoteHTTPError(status, f"{parts.hostname}: HTTP {status}")
+                    if status != 429 and status < 500:
+                        # O host respondeu (ex.: 404 de ticker inexistente): não é queda.
+                        breaker.record_success()
+                        settled = True
+                        raise error
+
+                if attempt < self.retries:
+                    time.sleep(self.backoff * 2 ** attempt)
+
+            breaker.record_failure()
+            settled = True
+            raise error
+        finally:
+            # Erro inesperado no meio do teste: sem isso o circuito nunca mais
+            # sairia do meio-aberto.
+            if probe and not settled:
+                breaker.release_probe()
+
+    def close(self):
+        with self._lock:
+            hosts = list(self._hosts.values())
+        for pool, _ in hosts:
+            pool.close()
@@ -0,0 +1,409 @@
+"""
+Cotações via Yahoo Finance (HTTP puro, sem yfinance).
+
+As cotações ficam num cache único por processo (compartilhado por todas as
+sessões do Streamlit), com TTL e limite de tamanho com descarte LRU. Se
+várias sessões pedem o mesmo símbolo ao mesmo tempo, só uma requisição
+sai para o Yahoo e as demais esperam o mesmo resultado. Vários símbolos
+ausentes do cache são buscados em paralelo.
+
+As buscas podem ser disparadas em segundo plano (`prefetch_asset_price_brl`)
+para que o formulário só leia o resultado já pronto na hora do envio.
+
+As requisições passam pelo `quote_client.QuoteClient` (conexões keep-alive,
+limite por host e circuit breaker). Se o Yahoo falhar, ou o circuito
+estiver aberto, a busca devolve a última cotação conhecida (até
+QUOTE_STALE_MAX_AGE segundos) e o símbolo fica marcado como desatualizado
+(`is_stale`); a causa da falha vai para o log.
+
+Buscas que terminam sem preço (ticker inválido, Yahoo fora sem cotação
+conhecida) também ficam no cache, por QUOTE_MISS_TTL segundos: os reruns
+seguintes recebem a falha na hora, em vez de disparar outra requisição
+(com novas tentativas) a cada tecla digitada.
+"""
+
+import os
+import time
+import logging
+import threading
+import urllib.parse
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future, wait
+
+from instrumentation import timed
+from quote_client import QuoteClient, QuoteError
+
+QUOTE_CACHE_TTL = float(os.environ.get("QUOTE_CACHE_TTL", "60"))
+QUOTE_CACHE_MAXSIZE = int(os.environ.get("QUOTE_CACHE_MAXSIZE", "1024"))
+QUOTE_FETCH_WORKERS = int(os.environ.get("QUOTE_FETCH_WORKERS", "8"))
+QUOTE_HTTP_TIMEOUT = float(os.environ.get("QUOTE_HTTP_TIMEOUT", "3"))
+QUOTE_HTTP_RETRIES = int(os.environ.get("QUOTE_HTTP_RETRIES", "2"))
+QUOTE_RETRY_BACKOFF = float(os.environ.get("QUOTE_RETRY_BACKOFF", "0.25"))
+QUOTE_STALE_MAX_AGE = float(os.environ.get("QUOTE_STALE_MAX_AGE", str(24 * 3600)))
+QUOTE_MISS_TTL = float(os.environ.get("QUOTE_MISS_TTL", "30"))
+
+YAHOO_CHART_URL = "https://query1.finance.yahoo.com/v8/finance/chart/"
+
+USD_BRL_SYMBOL = "USDBRL=X"
+
+# Listas de ativos conhecidos (pode ir ampliando depois)
+CRYPTO_TICKERS = {
+    "BTC": "BTC-USD",
+    "ETH": "ETH-USD",
+    "SOL": "SOL-USD",
+    "XRP": "XRP-USD",
+    "ADA": "ADA-USD",
+}
+
+ACAO_TICKERS = {
+    "PETR4": "PETR4.SA",
+    "VALE3": "VALE3.SA",
+    "ITUB4": "ITUB4.SA",
+    "B3SA3": "B3SA3.SA",
+    "WEGE3": "WEGE3.SA",
+}
+
+FII_TICKERS = {
+    "MXRF11": "MXRF11.SA",
+    "HGLG11": "HGLG11.SA",
+    "KNRI11": "KNRI11.SA",
+    "XPML11": "XPML11.SA",
+    "BCFF11": "BCFF11.SA",
+}
+
+log = logging.getLogger(__name__)
+
+
+# ==============================
+# CACHE DE COTAÇÕES (TTL + LRU)
+# ==============================
+
+class QuoteCache:
+    """
+    Cache thread-safe símbolo -> preço, com TTL e descarte LRU. Guarda
+    também as buscas que falharam (cache negativo, por `miss_ttl` segundos).
+    """
+
+    def __init__(
+        self,
+        ttl: float = QUOTE_CACHE_TTL,
+        maxsize: int = QUOTE_CACHE_MAXSIZE,
+        miss_ttl: float = QUOTE_MISS_TTL,
+    ):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.miss_ttl = miss_ttl
+        self._data = OrderedDict()  # símbolo -> (preço, instante da busca)
+        self._misses = OrderedDict()  # símbolo -> instante da falha
+        self._lock = threading.Lock()
+
+    def get(self, symbol: str):
+        """Preço em cache ainda dentro do TTL, ou None."""
+        return self.get_stale(symbol, self.ttl)
+
+    def get_stale(self, symbol: str, max_age: float):
+        """
+        Preço buscado há no máximo `max_age` segundos, ou None. Entradas
+        vencidas pelo TTL continuam guardadas (até o descarte LRU) para
+        servir de reserva quando o Yahoo está fora.
+        """
+        with self._lock:
+            item = self._data.get(symbol)
+            if item is None:
+                return None
+            price, fetched_at = item
+            if time.monotonic() - fetched_at > max_age:
+                return None
+            self._data.move_to_end(symbol)
+            return price
+
+    def set(self, symbol: str, price: float):
+        with self._lock:
+            self._data[symbol] = (price, time.monotonic())
+            self._data.move_to_end(symbol)
+            self._misses.pop(symbol, None)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def missing(self, symbol: str) -> bool:
+        """Se a última busca do símbolo falhou há menos de `miss_ttl` segundos."""
+        with self._lock:
+            failed_at = self._misses.get(symbol)
+            if failed_at is None:
+                return False
+            if time.monotonic() - failed_at > self.miss_ttl:
+                del self._misses[symbol]
+                return False
+            return True
+
+    def set_missing(self, symbol: str):
+        """Registra que a busca do símbolo terminou sem preço."""
+        with self._lock:
+            self._misses[symbol] = time.monotonic()
+            self._misses.move_to_end(symbol)
+            while len(self._misses) > self.maxsize:
+                self._misses.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._misses.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+
+quote_cache = QuoteCache()
+
+quote_executor = ThreadPoolExecutor(
+    max_workers=QUOTE_FETCH_WORKERS, thread_name_prefix="quotes"
+)
+_inflight = {}  # símbolo -> Future da busca em andamento
+_inflight_lock = threading.Lock()
+_stale = set()  # símbolos servidos com a última cotação conhecida
+
+quote_client = QuoteClient(
+    timeout=QUOTE_HTTP_TIMEOUT,
+    retries=QUOTE_HTTP_RETRIES,
+    backoff=QUOTE_RETRY_BACKOFF,
+)
+
+
+# ==============================
+# BUSCA NO YAHOO
+# ==============================
+
+def yahoo_chart(symbol: str, params: dict) -> dict:
+    """
+    Chama o endpoint de chart do Yahoo e devolve o JSON. Falhas de rede,
+    timeouts, 429 e 5xx são repetidas até QUOTE_HTTP_RETRIES vezes com
+    espera exponencial; quando acabam (ou o circuito está aberto) levanta
+    `QuoteError` com a causa.
+    """
+    url = (
+        f"{YAHOO_CHART_URL}{urllib.parse.quote(symbol)}"
+        f"?{urllib.parse.urlencode(params)}"
+    )
+    return quote_client.get_json(url)
+
+
+@timed("quotes.yahoo_last_close")
+def yahoo_last_close(symbol: str):
+    """
+    Busca último preço de fechamento no Yahoo Finance via HTTP puro.
+    Retorna float, ou None se o Yahoo não tem preço para o símbolo; falhas
+    de rede/HTTP sobem como `QuoteError`.
+    """
+    data = yahoo_chart(symbol, {"range": "1d", "interval": "1d"})
+    try:
+        result = data.get("chart", {}).get("result")
+        if not result:
+            return None
+        result = result[0]
+        quote = result.get("indicators", {}).get("quote", [])
+        if not quote:
+            return None
+        closes = quote[0].get("close", [])
+        if not closes:
+            return None
+        last = closes[-1]
+        if last is None:
+            return None
+        return float(last)
+    except (AttributeError, IndexError, TypeError, ValueError):
+        log.warning("Resposta inesperada do Yahoo para %s", symbol)
+        return None
+
+
+def _fetch_and_cache(symbol: str):
+    try:
+        try:
+            price = yahoo_last_close(symbol)
+        except QuoteError as e:
+            price = quote_cache.get_stale(symbol, QUOTE_STALE_MAX_AGE)
+            log.warning(
+                "Cotação de %s indisponível (%s)%s",
+                symbol,
+                e,
+                "; usando a última conhecida" if price is not None else "",
+            )
+            if price is not None:
+                with _inflight_lock:
+                    _stale.add(symbol)
+            else:
+                quote_cache.set_missing(symbol)
+            return price
+
+        if price is not None:
+            quote_cache.set(symbol, price)
+            with _inflight_lock:
+                _stale.discard(symbol)
+        else:
+            quote_cache.set_missing(symbol)
+        return price
+    finally:
+        with _inflight_lock:
+            _inflight.pop(symbol, None)
+
+
+def request_quotes(symbols) -> dict:
+    """
+    Dispara (sem bloquear) a busca dos símbolos e devolve {símbolo: Future}.
+    Acertos no cache (inclusive falhas recentes, que resolvem com None)
+    viram Futures já resolvidos, e uma busca já em andamento (de outra
+    sessão) é reaproveitada em vez de disparar outra requisição.
+    """
+    futures = {}
+
+    for symbol in dict.fromkeys(symbols):
+        price = quote_cache.get(symbol)
+        if price is not None or quote_cache.missing(symbol):
+            future = Future()
+            future.set_result(price)
+            futures[symbol] = future
+            continue
+
+        with _inflight_lock:
+            future = _inflight.get(symbol)
+            if future is None:
+                future = Future()
+                _inflight[symbol] = future
+                owner = True
+            else:
+                owner = False
+
+        if owner:
+            quote_executor.submit(_run_into, future, symbol)
+        futures[symbol] = future
+
+    return futures
+
+
+def get_quotes(symbols) -> dict:
+    """Devolve {símbolo: preço ou None}, buscando em paralelo o que faltar."""
+    result = {}
+    for symbol, future in request_quotes(symbols).items():
+        try:
+            result[symbol] = future.result()
+        except Exception:
+            result[symbol] = None
+    return result
+
+
+def _run_into(future: Future, symbol: str):
+    try:
+        future.set_result(_fetch_and_cache(symbol))
+    except Exception as e:
+        future.set_exception(e)
+
+
+def get_quote(symbol: str):
+    return get_quotes([symbol])[symbol]
+
+
+def is_stale(symbol: str) -> bool:
+    """Se o preço em uso para o símbolo é a última cotação conhecida (Yahoo fora)."""
+    with _inflight_lock:
+        return symbol in _stale
+
+
+# ==============================
+# PREÇO EM R$ POR TIPO DE ATIVO
+# ==============================
+
+def resolve_symbol(asset_type: str, ticker: str):
+    """
+    Converte (tipo, ticker digitado) no símbolo do Yahoo.
+    - Ação / FII: usa dicionário + fallback .SA
+    - Criptomoeda: usa dicionário + fallback TICKER-USD
+    Retorna None para tipos sem cotação.
+    """
+    ticker = ticker.strip().upper()
+    if not ticker:
+        return None
+
+    if asset_type == "Ação" or asset_type == "FII":
+        known = ACAO_TICKERS if asset_type == "Ação" else FII_TICKERS
+        if ticker in known:
+            return known[ticker]
+        return ticker if ticker.endswith(".SA") else ticker + ".SA"
+
+    if asset_type == "Criptomoeda":
+        return CRYPTO_TICKERS.get(ticker, f"{ticker}-USD")
+
+    return None
+
+
+def _asset_symbols(assets):
+    symbols = {asset: resolve_symbol(*asset) for asset in assets}
+    wanted = [s for s in symbols.values() if s is not None]
+    if any(asset_type == "Criptomoeda" for asset_type, _ in assets):
+        wanted.append(USD_BRL_SYMBOL)
+    return symbols, wanted
+
+
+def _prices_brl(symbols: dict, quotes: dict) -> dict:
+    usd_brl = quotes.get(USD_BRL_SYMBOL)
+    prices = {}
+    for (asset_type, ticker), symbol in symbols.items():
+        price = quotes.get(symbol) if symbol is not None else None
+        if price is not None and asset_type == "Criptomoeda":
+            price = price * usd_brl if usd_brl is not None else None
+        prices[(asset_type, ticker)] = price
+    return prices
+
+
+def get_asset_prices_brl(assets) -> dict:
+    """
+    Preço em R$ de vários ativos de uma vez. `assets` é uma lista de pares
+    (tipo, ticker); devolve {(tipo, ticker): preço ou None}. Todos os
+    símbolos (e o USDBRL=X, se houver cripto) vão numa única rodada de
+    buscas paralelas.
+    """
+    symbols, wanted = _asset_symbols(list(dict.fromkeys(assets)))
+    return _prices_brl(symbols, get_quotes(wanted) if wanted else {})
+
+
+def get_asset_price_brl(asset_type: str, ticker: str):
+    """
+    Busca o preço em R$ usando Yahoo Finance via HTTP.
+    Criptomoedas são cotadas em USD e convertidas por USDBRL=X (também em cache).
+    """
+    try:
+        return get_asset_prices_brl([(asset_type, ticker)])[(asset_type, ticker)]
+    except Exception:
+        return None
+
+
+def asset_price_stale(asset_type: str, ticker: str) -> bool:
+    """Se o preço em R$ do ativo veio de cotação desatualizada (inclui o USDBRL=X)."""
+    _, wanted = _asset_symbols([(asset_type, ticker)])
+    return any(is_stale(symbol) for symbol in wanted)
+
+
+def prefetch_asset_price_brl(asset_type: str, ticker: str):
+    """Dispara em segundo plano a busca da cotação do ativo (não bloqueia)."""
+    _, wanted = _asset_symbols([(asset_type, ticker)])
+    request_quotes(wanted)
+
+
+def wait_asset_price_brl(asset_type: str, ticker: str, timeout: float = 0.0):
+    """
+    Lê a cotação em R$ disparada por `prefetch_asset_price_brl`, esperando no
+    máximo `timeout` segundos. Retorna (pronto, preço); com pronto=False a
+    busca ainda está em andamento.
+    """
+    symbols, wanted = _asset_symbols([(asset_type, ticker)])
+    futures = request_quotes(wanted)
+    _, not_done = wait(futures.values(), timeout=timeout)
+    if not_done:
+        return False, None
+
+    quotes = {}
+    for symbol, future in futures.items():
+        try:
+            quotes[symbol] = future.result()
+        except Exception:
+            quotes[symbol] = None
+    return True, _prices_brl(symbols, quotes)[(asset_type, ticker)]
@@ -0,0 +1,710 @@
+"""
+Servidor HTTP (WSGI) do frontend em templates/ + static/main.js.
+
+Serve a página inicial, os arquivos estáticos, `GET /api/summary` (resumo
+mensal no formato que o main.js espera), `GET /api/transactions`
+(lançamentos recentes, com o `id` de cada um) e `POST /add-transaction`,
+`/edit-transaction` e `/delete-transaction` (formulário da página ou JSON
+de clientes automáticos). Usa as mesmas peças do app Streamlit: o log de
+`storage`, os frames compartilhados de `user_cache` e os agregados de
+`aggregates`.
+
+As respostas de leitura são montadas uma vez por versão dos dados do
+usuário e guardadas já serializadas; enquanto nada muda, cada requisição
+é só uma consulta de dicionário. O resumo mensal fica materializado num
+`aggregates.MonthlySummary` por usuário: um lançamento novo, editado ou
+excluído atualiza só o(s) mês(es) dele e o saldo acumulado dali em diante. `/api/summary` manda ETag e
+Last-Modified e responde 304 a If-None-Match / If-Modified-Since.
+
+O `id` de um lançamento é "<tipo>:<posição>:<marca>", onde a marca
+identifica a versão dos dados em que a posição foi lida: editar ou excluir
+com um id de uma versão anterior responde 409 (recarregue a lista).
+
+`GET /metrics` expõe as métricas de `instrumentation` (formato Prometheus)
+quando o processo roda com FINANCE_METRICS=1.
+
+O servidor atende um único usuário, o de FINANCE_API_USER. Sem
+FINANCE_API_TOKEN o acesso é livre (uso local). Com ele, toda rota além
+de /static/ e /login exige autenticação, seja qual for o tipo do corpo:
+
+- clientes automáticos mandam `Authorization: Bearer <token>`;
+- o navegador entra por /login (informa o token uma vez) e recebe um
+  cookie de sessão HttpOnly/SameSite=Strict. Requisições que gravam com o
+  cookie precisam também do token CSRF (campo `csrf` do formulário, que a
+  página já inclui, ou cabeçalho X-CSRF-Token).
+
+Cookie e token CSRF são derivados do FINANCE_API_TOKEN (HMAC), então
+valem em todas as réplicas e caem quando o token é trocado.
+
+Uso (na raiz do projeto):
+    FINANCE_API_USER=voce@exemplo.com python server.py --port 8000
+    FINANCE_API_USER=voce@exemplo.com python server.py --uvicorn
+"""
+
+import io
+import os
+import math
+import hmac
+import time
+import asyncio
+import hashlib
+import argparse
+import mimetypes
+import threading
+import urllib.parse
+from datetime import date
+from http.cookies import SimpleCookie, CookieError
+from email.utils import formatdate, parsedate_to_datetime
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import make_server, WSGIServer, WSGIRequestHandler
+
+import pandas as pd
+
+import json_codec
+import instrumentation
+from storage import append_user_record, append_user_changes
+from frames import append_frames, set_cell, frame_records
+from user_cache import user_frame_cache
+from aggregates import MonthlySummary
+
+API_USER = os.environ.get("FINANCE_API_USER", "")
+API_TOKEN = os.environ.get("FINANCE_API_TOKEN", "")
+SESSION_COOKIE = "finance_sessao"
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+TEMPLATES_DIR = os.path.join(BASE_DIR, "templates")
+STATIC_DIR = os.path.join(BASE_DIR, "static")
+
+MAX_BODY_BYTES = 1024 * 1024
+RECENT_TRANSACTIONS = 20
+
+# Tipo do formulário/JSON -> tipo de lançamento do app.
+TRANSACTION_KINDS = {
+    "income": "receitas",
+    "receita": "receitas",
+    "expense": "despesas",
+    "despesa": "despesas",
+}
+
+try:
+    import jinja2
+except ImportError:  # a página inicial fica indisponível, a API continua
+    jinja2 = None
+
+
+class HTTPError(Exception):
+    def __init__(self, status: str, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+# ==============================
+# RESPOSTAS EM CACHE POR VERSÃO
+# ==============================
+
+_views = {}  # e-mail -> (versão dos dados, {nome da view: valor})
+_views_lock = threading.Lock()
+_write_lock = threading.Lock()
+
+
+def _cached_view(email: str, name: str, build):
+    """
+    Valor de `build(versao, frames)` para a versão atual dos dados do
+    usuário, calculado uma vez por versão.
+    """
+    versao, frames = user_frame_cache.get(email)
+    with _views_lock:
+        hit = _views.get(email)
+        if hit is not None and hit[0] == versao and name in hit[1]:
+            return hit[1][name]
+
+    value = build(versao, frames)
+    with _views_lock:
+        hit = _views.get(email)
+        if hit is None or hit[0] != versao:
+            hit = (versao, {})
+            _views[email] = hit
+        hit[1][name] = value
+    return value
+
+
+def _data_tag(email: str, versao) -> str:
+    """Marca curta da versão dos dados (vai nos ids dos lançamentos)."""
+    marca = user_frame_cache.stamp_of(email, versao)
+    return hashlib.blake2b(repr((marca, versao)).encode(), digest_size=4).hexdigest()
+
+
+def _recent_transactions(frames: dict, tag: str) -> list:
+    partes = []
+    for kind, tipo in (("receitas", "income"), ("despesas", "expense")):
+        df = frames[kind]
+        if df.empty:
+            continue
+        recentes = df.nlargest(RECENT_TRANSACTIONS, "Data")
+        partes.append(
+            recentes.assign(
+                type=tipo,
+                id=[f"{kind}:{pos}:{tag}" for pos in df.index.get_indexer(recentes.index)],
+            )
+        )
+    if not partes:
+        return []
+
+    recentes = pd.concat(partes, ignore_index=True).sort_values(
+        "Data", ascending=False, kind="stable"
+    ).head(RECENT_TRANSACTIONS)
+    return [
+        {
+            "id": id_,
+            "date": data.strftime("%Y-%m-%d") if pd.notna(data) else "",
+            "date_br": data.strftime("%d/%m/%Y") if pd.notna(data) else "",
+            "type": tipo,
+            "category": str(categoria),
+            "description": str(descricao),
+            "amount": None if pd.isna(valor) else float(valor),
+            "amount_fmt": _format_brl(valor),
+        }
+        for id_, data, tipo, categoria, descricao, valor in zip(
+            recentes["id"],
+            recentes["Data"],
+            recentes["type"],
+            recentes["Categoria"],
+            recentes["Descrição"],
+            recentes["Valor"],
+        )
+    ]
+
+
+def _format_brl(valor) -> str:
+    if pd.isna(valor):
+        return "-"
+    texto = f"{float(valor):,.2f}".replace(",", "_").replace(".", ",").replace("_", ".")
+    return f"R$ {texto}"
+
+
+# ==============================
+# RESUMO MENSAL INCREMENTAL
+# ==============================
+
+class SummaryState:
+    """Resumo materializado de um usuário e a resposta já serializada."""
+
+    def __init__(self, versao, summary: MonthlySummary, previous=None):
+        self.versao = versao
+        self.summary = summary
+        self.body = json_codec.dumps({"summary": summary.rows()})
+        self.etag = '"' + hashlib.blake2b(self.body, digest_size=8).hexdigest() + '"'
+        if previous is not None and previous.etag == self.etag:
+            self.last_modified = previous.last_modified
+        else:
+            self.last_modified = int(time.time())
+
+    def headers(self) -> list:
+        return [
+            ("ETag", self.etag),
+            ("Last-Modified", formatdate(self.last_modified, usegmt=True)),
+            ("Cache-Control", "no-cache"),
+        ]
+
+    def not_modified(self, environ) -> bool:
+        """Validação condicional: If-None-Match tem precedência (RFC 9110)."""
+        if_none_match = environ.get("HTTP_IF_NONE_MATCH")
+        if if_none_match:
+            tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+            return "*" in tags or self.etag in tags
+
+        if_modified_since = environ.get("HTTP_IF_MODIFIED_SINCE")
+        if if_modified_since:
+            try:
+                desde = parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+            return self.last_modified <= desde
+        return False
+
+
+_summaries = {}  # e-mail -> SummaryState
+_summaries_lock = threading.Lock()
+
+
+def summary_state(email: str) -> SummaryState:
+    """
+    Resumo do usuário na versão atual do cache. Só é reconstruído do zero
+    quando a versão mudou por fora de `add_transaction` (recarga do disco,
+    gravação de outra sessão).
+    """
+    versao, frames = user_frame_cache.get(email)
+    with _summaries_lock:
+        hit = _summaries.get(email)
+    if hit is not None and hit.versao == versao:
+        return hit
+
+    state = SummaryState(
+        versao, MonthlySummary.from_frames(frames["receitas"], frames["despesas"]), hit
+    )
+    with _summaries_lock:
+        _summaries[email] = state
+    return state
+
+
+def _advance_summary(email: str, base_versao, nova_versao, aplicar):
+    """
+    Aplica uma gravação ao resumo materializado: `aplicar(summary)` chama o
+    add/remove/update do `MonthlySummary` (só os meses afetados).
+    """
+    with _summaries_lock:
+        hit = _summaries.get(email)
+        if hit is None or nova_versao is None or hit.versao != base_versao:
+            return
+        aplicar(hit.summary)
+        _summaries[email] = SummaryState(nova_versao, hit.summary, hit)
+
+
+# ==============================
+# PÁGINA E ARQUIVOS ESTÁTICOS
+# ==============================
+
+_templates = None
+if jinja2 is not None:
+    _templates = jinja2.Environment(
+        loader=jinja2.FileSystemLoader(TEMPLATES_DIR),
+        autoescape=jinja2.select_autoescape(["html"]),
+    )
+    _templates.globals["url_for"] = lambda endpoint, filename="": (
+        f"/static/{filename}" if endpoint == "static" else "/"
+    )
+    _templates.globals["csrf_token"] = lambda: _derived("csrf") if API_TOKEN else ""
+
+
+def _index_body(email: str, versao, frames: dict) -> bytes:
+    html = _templates.get_template("index.html").render(
+        transactions=_recent_transactions(frames, _data_tag(email, versao))
+    )
+    return html.encode("utf-8")
+
+
+def _login_body(erro: str = "") -> bytes:
+    return _templates.get_template("login.html").render(erro=erro).encode("utf-8")
+
+
+def _static_file(path: str):
+    full = os.path.normpath(os.path.join(STATIC_DIR, urllib.parse.unquote(path)))
+    if not full.startswith(STATIC_DIR + os.sep) or not os.path.isfile(full):
+        raise HTTPError("404 Not Found", "Arquivo não encontrado.")
+    with open(full, "rb") as f:
+        body = f.read()
+    content_type = mimetypes.guess_type(full)[0] or "application/octet-stream"
+    return body, content_type
+
+
+# ==============================
+# LANÇAMENTOS
+# ==============================
+
+def add_transaction(email: str, kind: str, row: dict):
+    """
+    Grava o lançamento no log do usuário, publica o frame atualizado no
+    cache compartilhado (as respostas em cache mudam de versão) e atualiza
+    o resumo mensal só no mês do lançamento.
+    """
+    with _write_lock:
+        versao, frames = user_frame_cache.get(email)
+        append_user_record(email, kind, row)
+        nova_versao = user_frame_cache.commit(
+            email, versao, {kind: append_frames(kind, frames[kind], pd.DataFrame([row]))}
+        )
+        _advance_summary(
+            email, versao, nova_versao, lambda s: s.add(kind, row["Data"], row["Valor"])
+        )
+
+
+def change_transaction(email: str, transaction_id: str, changes=None):
+    """
+    Edita (`changes` = {coluna: valor}) ou exclui (`changes` None) o
+    lançamento `transaction_id`. Grava só o delta no log, publica o frame
+    no cache e corrige o resumo mensal só nos meses afetados.
+    """
+    kind, pos, tag = _parse_id(transaction_id)
+    with _write_lock:
+        versao, frames = user_frame_cache.get(email)
+        if tag != _data_tag(email, versao):
+            raise HTTPError(
+                "409 Conflict", "Os lançamentos mudaram desde a leitura; recarregue e tente de novo."
+            )
+        df = frames[kind]
+        if pos >= len(df):
+            raise HTTPError("404 Not Found", "Lançamento não encontrado.")
+
+        old_data, old_valor = df["Data"].iat[pos], df["Valor"].iat[pos]
+        originais = {pos: frame_records(kind, df.iloc[[pos]])[0]}
+        base = user_frame_cache.stamp_of(email, versao)
+
+        if changes is None:
+            append_user_changes(email, kind, {}, [pos], [], originals=originais, base=base)
+            novo = df.drop(index=df.index[pos]).reset_index(drop=True)
+
+            def aplicar(summary):
+                summary.remove(kind, old_data, old_valor)
+        else:
+            append_user_changes(email, kind, {pos: changes}, [], [], originals=originais, base=base)
+            # O frame é o do cache compartilhado: copia só as colunas editadas.
+            novo = df.assign(**{col: df[col].copy() for col in changes})
+            for col, value in changes.items():
+                set_cell(kind, novo, pos, col, value)
+            new_data, new_valor = novo["Data"].iat[pos], novo["Valor"].iat[pos]
+
+            def aplicar(summary):
+                if "Data" in changes or "Valor" in changes:
+                    summary.update(kind, old_data, old_valor, new_data, new_valor)
+
+        nova_versao = user_frame_cache.commit(email, versao, {kind: novo})
+        _advance_summary(email, versao, nova_versao, aplicar)
+
+
+def _parse_id(transaction_id) -> tuple:
+    """(tipo, posição, marca) de um id "<tipo>:<posição>:<marca>", ou HTTPError 400."""
+    partes = str(transaction_id or "").split(":")
+    if (
+        len(partes) != 3
+        or partes[0] not in ("receitas", "despesas")
+        or not partes[1].isdigit()
+    ):
+        raise HTTPError("400 Bad Request", "Campo 'id' inválido.")
+    return partes[0], int(partes[1]), partes[2]
+
+
+def _parse_date(fields: dict) -> str:
+    try:
+        return date.fromisoformat(str(fields.get("date", "")).strip()).isoformat()
+    except ValueError:
+        raise HTTPError("400 Bad Request", "Campo 'date' deve estar em AAAA-MM-DD.")
+
+
+def _parse_amount(fields: dict) -> float:
+    try:
+        valor = float(str(fields.get("amount", "")).strip().replace(",", "."))
+    except ValueError:
+        valor = float("nan")
+    if not math.isfinite(valor) or valor < 0:
+        raise HTTPError("400 Bad Request", "Campo 'amount' deve ser um número >= 0.")
+    return valor
+
+
+def parse_transaction(fields: dict):
+    """(tipo, linha) a partir dos campos do formulário/JSON, ou HTTPError 400."""
+    kind = TRANSACTION_KINDS.get(str(fields.get("type", "")).strip().lower())
+    if kind is None:
+        raise HTTPError("400 Bad Request", "Campo 'type' deve ser 'income' ou 'expense'.")
+
+    return kind, {
+        "Data": _parse_date(fields),
+        "Categoria": str(fields.get("category", "") or "").strip(),
+        "Descrição": str(fields.get("description", "") or "").strip(),
+        "Valor": _parse_amount(fields),
+    }
+
+
+def parse_changes(fields: dict) -> dict:
+    """Colunas alteradas numa edição (só os campos enviados), ou HTTPError 400."""
+    changes = {}
+    if "date" in fields:
+        changes["Data"] = _parse_date(fields)
+    if "category" in fields:
+        changes["Categoria"] = str(fields.get("category") or "").strip()
+    if "description" in fields:
+        changes["Descrição"] = str(fields.get("description") or "").strip()
+    if "amount" in fields:
+        changes["Valor"] = _parse_amount(fields)
+    if not changes:
+        raise HTTPError(
+            "400 Bad Request", "Informe ao menos um de 'date', 'category', 'description', 'amount'."
+        )
+    return changes
+
+
+def _read_fields(environ) -> tuple:
+    """Campos do corpo da requisição e se ela veio em JSON."""
+    try:
+        length = int(environ.get("CONTENT_LENGTH") or 0)
+    except ValueError:
+        length = 0
+    if length > MAX_BODY_BYTES:
+        raise HTTPError("413 Payload Too Large", "Corpo da requisição muito grande.")
+    body = environ["wsgi.input"].read(length) if length > 0 else b""
+
+    content_type = environ.get("CONTENT_TYPE", "")
+    if content_type.startswith("application/json"):
+        try:
+            fields = json_codec.loads(body or b"{}")
+        except ValueError:
+            raise HTTPError("400 Bad Request", "JSON inválido.")
+        if not isinstance(fields, dict):
+            raise HTTPError("400 Bad Request", "O JSON deve ser um objeto.")
+        return fields, True
+
+    parsed = urllib.parse.parse_qs(body.decode("utf-8", errors="replace"))
+    return {k: v[-1] for k, v in parsed.items()}, False
+
+
+# ==============================
+# APLICAÇÃO WSGI
+# ==============================
+
+def _derived(proposito: str) -> str:
+    """Valor derivado do FINANCE_API_TOKEN (cookie de sessão, token CSRF)."""
+    return hmac.new(
+        API_TOKEN.encode("utf-8"), proposito.encode("utf-8"), hashlib.sha256
+    ).hexdigest()
+
+
+def _same(a: str, b: str) -> bool:
+    return hmac.compare_digest(a.encode("utf-8"), b.encode("utf-8"))
+
+
+def _session_ok(environ) -> bool:
+    try:
+        morsel = SimpleCookie(environ.get("HTTP_COOKIE", "")).get(SESSION_COOKIE)
+    except CookieError:
+        return False
+    return morsel is not None and _same(morsel.value, _derived("sessao"))
+
+
+def _check_token(environ, fields=None):
+    """
+    Autenticação (só com FINANCE_API_TOKEN definido): Bearer token ou o
+    cookie de sessão do /login. `fields` indica uma requisição que grava;
+    com o cookie (que o navegador manda sozinho) ela precisa também do
+    token CSRF.
+    """
+    if not API_TOKEN:
+        return
+    if _same(environ.get("HTTP_AUTHORIZATION", ""), f"Bearer {API_TOKEN}"):
+        return
+    if not _session_ok(environ):
+        raise HTTPError("401 Unauthorized", "Token inválido ou ausente.")
+    if fields is not None:
+        enviado = str(fields.get("csrf") or environ.get("HTTP_X_CSRF_TOKEN", ""))
+        if not _same(enviado, _derived("csrf")):
+            raise HTTPError("403 Forbidden", "Token CSRF inválido ou ausente.")
+
+
+def _user() -> str:
+    if not API_USER:
+        raise HTTPError("503 Service Unavailable", "Defina FINANCE_API_USER no servidor.")
+    return API_USER
+
+
+def _route(environ):
+    """Devolve (status, corpo, content-type, cabeçalhos extras)."""
+    method = environ.get("REQUEST_METHOD", "GET")
+    path = environ.get("PATH_INFO", "/") or "/"
+
+    if path == "/api/summary":
+        if method != "GET":
+            raise HTTPError("405 Method Not Allowed", "Use GET.")
+        _check_token(environ)
+        state = summary_state(_user())
+        if state.not_modified(environ):
+            return "304 Not Modified", b"", None, state.headers()
+        return "200 OK", state.body, "application/json", state.headers()
+
+    if path == "/add-transaction":
+        if method != "POST":
+            raise HTTPError("405 Method Not Allowed", "Use POST.")
+        fields, is_json = _read_fields(environ)
+        _check_token(environ, fields)
+        kind, row = parse_transaction(fields)
+        add_transaction(_user(), kind, row)
+        if is_json:
+            body = json_codec.dumps({"ok": True, "kind": kind, "row": row})
+            return "201 Created", body, "application/json", []
+        return "303 See Other", b"", "text/plain", [("Location", "/")]
+
+    if path in ("/edit-transaction", "/delete-transaction"):
+        if method != "POST":
+            raise HTTPError("405 Method Not Allowed", "Use POST.")
+        fields, is_json = _read_fields(environ)
+        _check_token(environ, fields)
+        changes = parse_changes(fields) if path == "/edit-transaction" else None
+        change_transaction(_user(), fields.get("id"), changes)
+        if is_json:
+            return "200 OK", json_codec.dumps({"ok": True}), "application/json", []
+        return "303 See Other", b"", "text/plain", [("Location", "/")]
+
+    if path == "/api/transactions":
+        if method != "GET":
+            raise HTTPError("405 Method Not Allowed", "Use GET.")
+        _check_token(environ)
+        email = _user()
+        body = _cached_view(
+            email,
+            "transactions",
+            lambda versao, frames: json_codec.dumps(
+                {"transactions": _recent_transactions(frames, _data_tag(email, versao))}
+            ),
+        )
+        return "200 OK", body, "application/json", [("Cache-Control", "no-cache")]
+
+    if path == "/metrics" and method == "GET":
+        _check_token(environ)
+        body = instrumentation.prometheus_text().encode("utf-8")
+        return "200 OK", body, "text/plain; version=0.0.4; charset=utf-8", []
+
+    if path.startswith("/static/") and method == "GET":
+        body, content_type = _static_file(path[len("/static/"):])
+        return "200 OK", body, content_type, [("Cache-Control", "max-age=3600")]
+
+    if path == "/login":
+        return _login(environ, method)
+
+    if path == "/" and method == "GET":
+        if _templates is None:
+            raise HTTPError("501 Not Implemented", "Instale o jinja2 para servir a página.")
+        try:
+            _check_token(environ)
+        except HTTPError:
+            return "303 See Other", b"", "text/plain", [("Location", "/login")]
+        email = _user()
+        body = _cached_view(
+            email, "index", lambda versao, frames: _index_body(email, versao, frames)
+        )
+        return "200 OK", body, "text/html; charset=utf-8", []
+
+    raise HTTPError("404 Not Found", "Rota não encontrada.")
+
+
+def _login(environ, method: str):
+    """Troca o FINANCE_API_TOKEN (informado uma vez) pelo cookie de sessão."""
+    if _templates is None:
+        raise HTTPError("501 Not Implemented", "Instale o jinja2 para servir a página.")
+    if not API_TOKEN:
+        return "303 See Other", b"", "text/plain", [("Location", "/")]
+    if method == "GET":
+        return "200 OK", _login_body(), "text/html; charset=utf-8", []
+    if method != "POST":
+        raise HTTPError("405 Method Not Allowed", "Use GET ou POST.")
+
+    fields, _ = _read_fields(environ)
+    if not _same(str(fields.get("token", "")), API_TOKEN):
+        body = _login_body("Token inválido.")
+        return "401 Unauthorized", body, "text/html; charset=utf-8", []
+    cookie = f"{SESSION_COOKIE}={_derived('sessao')}; Path=/; HttpOnly; SameSite=Strict"
+    return "303 See Other", b"", "text/plain", [("Location", "/"), ("Set-Cookie", cookie)]
+
+
+def _respond(environ):
+    """(status, cabeçalhos, corpo) da requisição, com erros já em JSON."""
+    try:
+        status, body, content_type, headers = _route(environ)
+    except HTTPError as e:
+        status, content_type, headers = e.status, "application/json", []
+        body = json_codec.dumps({"error": e.message})
+
+    if content_type is not None:
+        headers = [("Content-Type", content_type), ("Content-Length", str(len(body)))] + headers
+    return status, headers, body
+
+
+def application(environ, start_response):
+    """Aplicação WSGI (wsgiref, gunicorn, waitress...)."""
+    status, headers, body = _respond(environ)
+    start_response(status, headers)
+    return [body]
+
+
+async def asgi_application(scope, receive, send):
+    """
+    A mesma aplicação em ASGI (ex.: `uvicorn server:asgi_application`), com
+    conexões keep-alive. Leituras em cache respondem direto no loop; as
+    gravações rodam numa thread para não travar as demais conexões.
+    """
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+    if scope["type"] != "http":
+        return
+
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            break
+
+    environ = {
+        "HTTP_" + name.decode("latin-1").upper().replace("-", "_"): value.decode("latin-1")
+        for name, value in scope.get("headers") or []
+    }
+    environ.update(
+        {
+            "REQUEST_METHOD": scope["method"],
+            "PATH_INFO": scope["path"],
+            "CONTENT_TYPE": environ.pop("HTTP_CONTENT_TYPE", ""),
+            "CONTENT_LENGTH": str(len(body)),
+            "wsgi.input": io.BytesIO(body),
+        }
+    )
+    if scope["method"] == "GET":
+        status, headers, body = _respond(environ)
+    else:
+        status, headers, body = await asyncio.to_thread(_respond, environ)
+
+    await send(
+        {
+            "type": "http.response.start",
+            "status": int(status.split(" ", 1)[0]),
+            "headers": [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--log", action="store_true", help="registra cada requisição")
+    parser.add_argument(
+        "--uvicorn",
+        action="store_true",
+        help="serve a versão ASGI com o uvicorn (keep-alive; bem mais requisições/s)",
+    )
+    args = parser.parse_args()
+
+    print(f"Servindo em http://{args.host}:{args.port} (usuário: {API_USER or '-'})")
+    if args.uvicorn:
+        import uvicorn
+
+        uvicorn.run(
+            asgi_application,
+            host=args.host,
+            port=args.port,
+            log_level="info" if args.log else "warning",
+            access_log=args.log,
+        )
+        return
+
+    handler = WSGIRequestHandler if args.log else QuietHandler
+    with make_server(
+        args.host, args.port, application, ThreadingWSGIServer, handler
+    ) as httpd:
+        httpd.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
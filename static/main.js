@@ -1,6 +1,14 @@
 async function loadSummary() {
+  if (!document.getElementById("summaryChart")) {
+    return;
+  }
   try {
-    const res = await fetch("/api/summary");
+    // Com FINANCE_API_TOKEN, o cookie de sessão do /login autentica o fetch.
+    const res = await fetch("/api/summary", { credentials: "same-origin" });
+    if (res.status === 401) {
+      window.location.href = "/login";
+      return;
+    }
     const data = await res.json();
 
     const summary = data.summary || [];
@@ -18,9 +26,7 @@ async function loadSummary() {
     // Atualiza cards
     const saldoAcumulado = cumulative[cumulative.length - 1];
     const ultimoMes = totals[totals.length - 1];
-    const ultimos3 = totals.slice(-3);
-    const media3 =
-      ultimos3.reduce((acc, v) => acc + v, 0) / (ultimos3.length || 1);
+    const media3 = summary[summary.length - 1].moving_avg_3m;
 
     document.getElementById("saldo-acumulado").innerText =
       formatBRL(saldoAcumulado);
@@ -0,0 +1,769 @@
+"""
+Persistência dos dados dos usuários.
+
+Cada usuário tem o seu próprio arquivo de log (JSON Lines) em LEDGER_DIR.
+Adicionar um lançamento acrescenta uma única linha ao final do arquivo do
+usuário, e carregar um usuário lê apenas o arquivo dele. O antigo
+`user_data.json` (um único JSON com todos os usuários) é migrado uma vez
+para o novo formato na primeira vez que o armazenamento é usado.
+
+Toda escrita é feita sob um lock de arquivo (vale entre threads e entre
+processos) e reescritas completas usam arquivo temporário + rename, então
+uma queda no meio da gravação nunca deixa um arquivo truncado.
+
+Para várias réplicas do app no mesmo diretório de dados, `user_stamp`
+devolve um carimbo da versão em disco de cada usuário (tamanho, mtime e
+inode do arquivo dele; um append muda o tamanho e um snapshot troca o
+inode). Conferir o carimbo custa um `stat`, então os caches de cada
+processo podem ser mantidos e descartados só quando o usuário mudou. Cada
+gravação deste processo registra, ainda sob o lock, o carimbo de antes e o
+de depois (`last_write_stamps`): assim o cache adota a própria gravação e
+percebe se outra réplica gravou no meio.
+
+Edições e exclusões vão para o log como posições nas linhas do usuário.
+Essas posições só valem para os dados que a sessão tinha: a gravação
+recebe o carimbo em que a sessão se baseou e, se o arquivo mudou desde
+então (outra aba/réplica gravou), relê o log sob o lock e localiza cada
+linha pelo conteúdo original antes de gravar o delta. A cada
+LEDGER_COMPACT_AFTER deltas o log do usuário é compactado num snapshot.
+
+Com FINANCE_STORAGE_BACKEND=json o app continua usando o `user_data.json`
+como armazenamento (com as mesmas garantias de escrita atômica). Nesse
+modo o arquivo é gravado compacto, um usuário por linha, com um índice ao
+lado (`user_data.json.idx`) com o trecho em bytes de cada usuário: ler ou
+alterar um usuário decodifica só o trecho dele, e os demais são copiados
+como bytes. A serialização usa o codec de `json_codec` (orjson/msgspec
+quando instalados).
+"""
+
+import os
+import json
+import hashlib
+import tempfile
+import threading
+from contextlib import contextmanager
+
+import pandas as pd
+
+import json_codec
+from frames import typed_frame, frame_records
+from instrumentation import timed, count_bytes
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+DATA_FILE = "user_data.json"
+DATA_INDEX_FILE = DATA_FILE + ".idx"
+LEDGER_DIR = "user_data"
+MIGRATION_MARKER = os.path.join(LEDGER_DIR, ".migrated")
+
+STORAGE_BACKEND = os.environ.get("FINANCE_STORAGE_BACKEND", "ledger")
+
+# FINANCE_JSON_COMPACT=0 volta a gravar o user_data.json indentado.
+JSON_COMPACT = os.environ.get("FINANCE_JSON_COMPACT", "1") != "0"
+
+# Deltas de edição ("changes") gravados antes de compactar o log num snapshot.
+LEDGER_COMPACT_AFTER = int(os.environ.get("FINANCE_LEDGER_COMPACT_AFTER", "50"))
+
+KINDS = ("receitas", "despesas", "patrimonio")
+
+_migration_lock = threading.Lock()
+_migrated = False
+
+# e-mail -> (carimbo antes, carimbo depois) da última gravação deste processo.
+_write_stamps = {}
+
+# e-mail -> deltas gravados por este processo desde o último snapshot.
+_change_ops = {}
+
+
+# ==============================
+# LOCK DE ARQUIVO E ESCRITA ATÔMICA
+# ==============================
+
+@contextmanager
+def file_lock(path: str):
+    """
+    Lock exclusivo associado a `path` (usa um arquivo `<path>.lock` ao lado,
+    já que o arquivo de dados em si é substituído por rename).
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    with open(f"{path}.lock", "a+b") as lock_f:
+        if fcntl is not None:
+            fcntl.flock(lock_f.fileno(), fcntl.LOCK_EX)
+        else:
+            lock_f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(lock_f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_f.fileno(), fcntl.LOCK_UN)
+            else:
+                lock_f.seek(0)
+                msvcrt.locking(lock_f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def atomic_write_text(path: str, text: str):
+    """Grava em um temporário no mesmo diretório e troca com os.replace."""
+    atomic_write_bytes(path, text.encode("utf-8"))
+
+
+def atomic_write_bytes(path: str, data: bytes):
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(
+        dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            count_bytes(written=len(data))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+# ==============================
+# ARQUIVO LEGADO (user_data.json)
+# ==============================
+
+@timed("storage.load_all_data")
+def load_all_data():
+    """Carrega o JSON completo com os dados de todos os usuários."""
+    if os.path.exists(DATA_FILE):
+        with open(DATA_FILE, "rb") as f:
+            raw = f.read()
+            count_bytes(read=len(raw))
+            try:
+                return json_codec.loads(raw)
+            except json.JSONDecodeError:
+                return {}
+    return {}
+
+
+@timed("storage.save_all_data")
+def save_all_data(data: dict):
+    """Salva o dicionário completo de usuários no JSON (escrita atômica)."""
+    with file_lock(DATA_FILE):
+        _write_all_data(data)
+
+
+def _write_all_data(data: dict):
+    indent = None if JSON_COMPACT else 2
+    _write_legacy_parts(
+        {
+            email: json_codec.dumps(user_data, indent=indent)
+            for email, user_data in data.items()
+        }
+    )
+
+
+def _write_legacy_parts(parts: dict):
+    """
+    Monta o user_data.json a partir do JSON (bytes) de cada usuário, um por
+    linha, e grava o índice com o trecho (início, tamanho) de cada um.
+    """
+    chunks = [b"{"]
+    spans = {}
+    pos = 1
+    for i, (email, raw) in enumerate(parts.items()):
+        key = (b",\n" if i else b"\n") + json_codec.dumps(email) + b":"
+        chunks.append(key)
+        pos += len(key)
+        spans[email] = [pos, len(raw)]
+        chunks.append(raw)
+        pos += len(raw)
+    chunks.append(b"\n}\n")
+
+    atomic_write_bytes(DATA_FILE, b"".join(chunks))
+    _save_legacy_index(spans)
+
+
+def update_all_data_user(email: str, update):
+    """
+    Read-modify-write de um único usuário no JSON legado, sob lock.
+    `update` recebe o dict atual do usuário e devolve o novo; os demais
+    usuários do arquivo são copiados como estão em disco (sem decodificar).
+    """
+    with file_lock(DATA_FILE):
+        antes = _path_stamp(DATA_FILE)
+        parts = _read_legacy_parts(DATA_FILE)
+
+        user_data = json_codec.loads(parts[email]) if email in parts else None
+        indent = None if JSON_COMPACT else 2
+        parts[email] = json_codec.dumps(
+            update(user_data or empty_user_records()), indent=indent
+        )
+        _write_legacy_parts(parts)
+        _write_stamps[email] = (antes, _path_stamp(DATA_FILE))
+
+
+def load_legacy_user(email: str) -> dict:
+    """Dados de um usuário do JSON legado, decodificando só o trecho dele."""
+    if not os.path.exists(DATA_FILE):
+        return {}
+    with open(DATA_FILE, "rb") as f:
+        try:
+            spans = _legacy_spans(f)
+        except ValueError:
+            f.seek(0)
+            raw = f.read()
+            count_bytes(read=len(raw))
+            return _decode_legacy(raw).get(email) or {}
+        span = spans.get(email)
+        if span is None:
+            return {}
+        f.seek(span[0])
+        raw = f.read(span[1])
+        count_bytes(read=len(raw))
+        try:
+            return json_codec.loads(raw) or {}
+        except json.JSONDecodeError:
+            return {}
+
+
+# ------------------------------
+# Índice de trechos do user_data.json
+# ------------------------------
+
+_legacy_index_cache = {}  # (tamanho, mtime_ns, inode) -> {e-mail: [início, tamanho]}
+_legacy_index_lock = threading.Lock()
+
+
+def _stat_key(st) -> list:
+    # Cada gravação troca o arquivo por rename, então o inode também muda.
+    return [st.st_size, st.st_mtime_ns, st.st_ino]
+
+
+def _save_legacy_index(spans: dict):
+    st = os.stat(DATA_FILE)
+    atomic_write_bytes(
+        DATA_INDEX_FILE, json_codec.dumps({"arquivo": _stat_key(st), "usuarios": spans})
+    )
+    with _legacy_index_lock:
+        _legacy_index_cache.clear()
+        _legacy_index_cache[tuple(_stat_key(st))] = spans
+
+
+def _legacy_spans(f) -> dict:
+    """
+    Trechos de cada usuário no arquivo aberto `f`. Usa o índice em memória
+    ou em disco se ele corresponder ao arquivo (tamanho, mtime e inode); senão
+    reconstrói varrendo o arquivo uma vez (ex.: arquivo antigo, indentado,
+    ou gravado por outra ferramenta). Se a varredura falha, levanta
+    `json.JSONDecodeError` sem gravar índice nenhum.
+    """
+    key = _stat_key(os.fstat(f.fileno()))
+    with _legacy_index_lock:
+        spans = _legacy_index_cache.get(tuple(key))
+    if spans is not None:
+        return spans
+
+    try:
+        with open(DATA_INDEX_FILE, "rb") as idx:
+            index = json_codec.loads(idx.read())
+        if index.get("arquivo") == key:
+            spans = index["usuarios"]
+    except (OSError, ValueError, AttributeError, KeyError):
+        spans = None
+
+    if spans is None:
+        f.seek(0)
+        spans = _scan_legacy_spans(f.read())
+        atomic_write_bytes(
+            DATA_INDEX_FILE, json_codec.dumps({"arquivo": key, "usuarios": spans})
+        )
+
+    with _legacy_index_lock:
+        _legacy_index_cache.clear()
+        _legacy_index_cache[tuple(key)] = spans
+    return spans
+
+
+def _read_legacy_parts(path: str) -> dict:
+    """
+    JSON (bytes) de cada usuário do arquivo legado, {e-mail: bytes}. Se a
+    varredura dos trechos falha, decodifica o arquivo inteiro; se nem isso
+    funciona, levanta `json.JSONDecodeError`: quem vai regravar o arquivo
+    nunca parte de uma leitura parcial (que apagaria os usuários depois do
+    trecho com erro).
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path, "rb") as f:
+        try:
+            spans = _legacy_spans(f)
+        except ValueError:
+            spans = None
+        f.seek(0)
+        raw = f.read()
+    count_bytes(read=len(raw))
+
+    if spans is not None:
+        return {e: raw[start:start + size] for e, (start, size) in spans.items()}
+    indent = None if JSON_COMPACT else 2
+    return {
+        email: json_codec.dumps(user_data, indent=indent)
+        for email, user_data in _decode_legacy(raw).items()
+    }
+
+
+def _decode_legacy(raw: bytes) -> dict:
+    """Decodifica o user_data.json inteiro; levanta se não for um objeto JSON válido."""
+    if not raw.strip():
+        return {}
+    data = json_codec.loads(raw)
+    if not isinstance(data, dict):
+        raise json.JSONDecodeError(f"{DATA_FILE} não é um objeto JSON", "", 0)
+    return data
+
+
+def _scan_legacy_spans(raw: bytes) -> dict:
+    """
+    Varre o objeto JSON de nível mais alto e devolve {e-mail: [início,
+    tamanho]} em bytes do valor de cada chave. Qualquer erro (arquivo
+    truncado, vírgula ou ':' faltando, valor inválido) levanta
+    `json.JSONDecodeError` em vez de devolver só os usuários lidos até ali.
+    """
+    text = raw.decode("utf-8")
+    decoder = json.JSONDecoder()
+    spans = {}
+
+    pos = _skip_ws(text, 0)
+    if pos >= len(text):
+        return spans
+    if text[pos] != "{":
+        raise json.JSONDecodeError("Esperado '{'", text, pos)
+    byte_pos = len(text[:pos + 1].encode("utf-8"))
+    char_pos = pos + 1
+    primeiro = True
+
+    while True:
+        pos = _skip_ws(text, char_pos)
+        if pos >= len(text):
+            raise json.JSONDecodeError("Objeto não terminado", text, pos)
+        if text[pos] == "}":
+            break
+        if not primeiro:
+            if text[pos] != ",":
+                raise json.JSONDecodeError("Esperado ','", text, pos)
+            pos = _skip_ws(text, pos + 1)
+        primeiro = False
+
+        email, pos = decoder.raw_decode(text, pos)
+        if not isinstance(email, str):
+            raise json.JSONDecodeError("Chave deve ser uma string", text, pos)
+        pos = _skip_ws(text, pos)
+        if pos >= len(text) or text[pos] != ":":
+            raise json.JSONDecodeError("Esperado ':'", text, pos)
+        start = _skip_ws(text, pos + 1)
+        _, end = decoder.raw_decode(text, start)
+
+        byte_start = byte_pos + len(text[char_pos:start].encode("utf-8"))
+        byte_end = byte_start + len(text[start:end].encode("utf-8"))
+        spans[email] = [byte_start, byte_end - byte_start]
+        byte_pos, char_pos = byte_end, end
+
+    return spans
+
+
+def _skip_ws(text: str, pos: int) -> int:
+    while pos < len(text) and text[pos] in " \t\r\n":
+        pos += 1
+    return pos
+
+
+# ==============================
+# LOG POR USUÁRIO
+# ==============================
+
+def user_ledger_path(email: str) -> str:
+    """Caminho do arquivo de log do usuário (nome derivado do hash do e-mail)."""
+    digest = hashlib.sha256(email.encode("utf-8")).hexdigest()
+    return os.path.join(LEDGER_DIR, f"{digest}.jsonl")
+
+
+def empty_user_records() -> dict:
+    return {kind: [] for kind in KINDS}
+
+
+def _dump_line(entry: dict) -> bytes:
+    return json_codec.dumps(entry) + b"\n"
+
+
+def migrate_legacy_data():
+    """
+    Migração única do `user_data.json` para um log por usuário.
+    Usuários que já possuem log não são sobrescritos. O arquivo legado é
+    mantido intacto; um marcador em LEDGER_DIR evita migrar de novo. Se o
+    arquivo legado estiver corrompido, levanta `json.JSONDecodeError` sem
+    gravar o marcador.
+    """
+    global _migrated
+    if _migrated:
+        return
+
+    with _migration_lock:
+        if _migrated:
+            return
+
+        # O lock de arquivo impede que duas réplicas migrem ao mesmo tempo.
+        with file_lock(MIGRATION_MARKER):
+            if not os.path.exists(MIGRATION_MARKER):
+                # Leitura estrita: arquivo corrompido levanta e a migração fica
+                # para a próxima vez, em vez de marcar como feita com 0 usuários.
+                legado = {}
+                if os.path.exists(DATA_FILE):
+                    with open(DATA_FILE, "rb") as f:
+                        raw = f.read()
+                    count_bytes(read=len(raw))
+                    legado = _decode_legacy(raw)
+                for email, user_data in legado.items():
+                    if os.path.exists(user_ledger_path(email)):
+                        continue
+                    records = empty_user_records()
+                    for kind in KINDS:
+                        records[kind] = list((user_data or {}).get(kind, []))
+                    _write_snapshot(email, records)
+
+                # Só depois de gravar o snapshot de todos os usuários.
+                atomic_write_text(MIGRATION_MARKER, DATA_FILE + "\n")
+
+        _migrated = True
+
+
+@timed("storage.load_user_records")
+def load_user_records(email: str) -> dict:
+    """
+    Lê o log do usuário e devolve {"receitas": [...], "despesas": [...],
+    "patrimonio": [...]} com o estado atual (reaplicando as operações).
+    """
+    if STORAGE_BACKEND == "json":
+        user_data = load_legacy_user(email)
+        return {kind: list(user_data.get(kind, [])) for kind in KINDS}
+
+    migrate_legacy_data()
+    return _read_ledger(user_ledger_path(email))
+
+
+def _read_ledger(path: str) -> dict:
+    records = empty_user_records()
+    if not os.path.exists(path):
+        return records
+
+    with open(path, "rb") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json_codec.loads(line)
+            except json.JSONDecodeError:
+                # Linha incompleta (ex.: queda no meio de uma escrita): ignora.
+                continue
+
+            op = entry.get("op")
+            if op == "snapshot":
+                data = entry.get("data") or {}
+                records = {kind: list(data.get(kind, [])) for kind in KINDS}
+            elif op == "add" and entry.get("kind") in KINDS:
+                records[entry["kind"]].append(entry.get("row", {}))
+            elif op == "changes" and entry.get("kind") in KINDS:
+                records[entry["kind"]] = apply_record_changes(
+                    records[entry["kind"]],
+                    entry.get("edited", {}),
+                    entry.get("deleted", []),
+                    entry.get("added", []),
+                )
+        count_bytes(read=f.tell())
+
+    return records
+
+
+@timed("storage.append_user_record")
+def append_user_record(email: str, kind: str, row: dict):
+    """Acrescenta um único lançamento ao final do log do usuário."""
+    if kind not in KINDS:
+        raise ValueError(f"Tipo de lançamento inválido: {kind}")
+
+    if STORAGE_BACKEND == "json":
+        def _append(user_data):
+            user_data.setdefault(kind, []).append(row)
+            return user_data
+
+        update_all_data_user(email, _append)
+        return
+
+    _append_entry(email, {"op": "add", "kind": kind, "row": row})
+
+
+@timed("storage.append_user_records")
+def append_user_records(email: str, kind: str, rows: list):
+    """
+    Acrescenta vários lançamentos de uma vez (importação em lote): uma
+    única escrita, sob um único lock, no final do log do usuário.
+    """
+    if kind not in KINDS:
+        raise ValueError(f"Tipo de lançamento inválido: {kind}")
+    if not rows:
+        return
+
+    if STORAGE_BACKEND == "json":
+        def _extend(user_data):
+            user_data.setdefault(kind, []).extend(rows)
+            return user_data
+
+        update_all_data_user(email, _extend)
+        return
+
+    _append_entries(email, [{"op": "add", "kind": kind, "row": row} for row in rows])
+
+
+def _append_entry(email: str, entry: dict):
+    _append_entries(email, [entry])
+
+
+def _append_entries(email: str, entries: list):
+    migrate_legacy_data()
+
+    path = user_ledger_path(email)
+    line = b"".join(_dump_line(entry) for entry in entries)
+    with file_lock(path):
+        antes = _path_stamp(path)
+        _append_bytes(path, line)
+        _write_stamps[email] = (antes, _path_stamp(path))
+
+
+def _append_bytes(path: str, line: bytes):
+    """Acrescenta `line` ao final do arquivo (chamado já sob o lock)."""
+    with open(path, "a+b") as f:
+        # Se a última escrita foi interrompida no meio da linha, começa
+        # numa linha nova para não corromper também este lançamento.
+        if f.seek(0, os.SEEK_END) > 0:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                line = b"\n" + line
+        f.write(line)
+        count_bytes(written=len(line))
+
+
+def apply_record_changes(rows: list, edited: dict, deleted: list, added: list) -> list:
+    """
+    Aplica um delta no formato do `st.data_editor`: `edited` é
+    {posição: {coluna: valor}}, `deleted` são posições e `added` são linhas
+    novas. Posições referem-se à lista antes do delta.
+    """
+    rows = list(rows)
+    for pos, changes in edited.items():
+        pos = int(pos)
+        if 0 <= pos < len(rows):
+            rows[pos] = {**rows[pos], **changes}
+
+    for pos in sorted({int(p) for p in deleted}, reverse=True):
+        if 0 <= pos < len(rows):
+            del rows[pos]
+
+    rows.extend(added)
+    return rows
+
+
+def _normalized_records(kind: str, rows: list) -> list:
+    """Linhas no formato de `frames.frame_records`, para comparar conteúdo."""
+    if not rows:
+        return []
+    return frame_records(kind, typed_frame(kind, pd.DataFrame(rows)))
+
+
+def _rebase_changes(kind: str, rows: list, edited: dict, deleted: list, originals: dict):
+    """
+    Leva as posições de um delta (relativas aos dados que a sessão tinha)
+    para as posições atuais em `rows`, localizando cada linha pelo conteúdo
+    que ela tinha na sessão (`originals`, {posição: linha}). A posição
+    antiga é tentada primeiro; senão vale a linha igual mais próxima dela.
+    Linhas que não existem mais (excluídas em outra aba/réplica) saem do
+    delta. Devolve (edited, deleted).
+    """
+    alvos = sorted({int(p) for p in edited} | {int(p) for p in deleted})
+    if not alvos:
+        return edited, deleted
+
+    dicas = [p for p in alvos if p < len(rows)]
+    atuais = dict(zip(dicas, _normalized_records(kind, [rows[p] for p in dicas])))
+    novas = {}
+    usadas = set()
+    faltando = []
+    for pos in alvos:
+        if pos in atuais and atuais[pos] == originals.get(pos):
+            novas[pos] = pos
+            usadas.add(pos)
+        else:
+            faltando.append(pos)
+
+    if faltando:
+        por_conteudo = {}
+        for i, row in enumerate(_normalized_records(kind, rows)):
+            por_conteudo.setdefault(tuple(row.items()), []).append(i)
+        for pos in faltando:
+            original = originals.get(pos)
+            candidatas = [] if original is None else por_conteudo.get(tuple(original.items()), [])
+            candidatas = [i for i in candidatas if i not in usadas]
+            if candidatas:
+                novas[pos] = min(candidatas, key=lambda i: abs(i - pos))
+                usadas.add(novas[pos])
+
+    edited = {novas[int(p)]: changes for p, changes in edited.items() if int(p) in novas}
+    deleted = [novas[int(p)] for p in deleted if int(p) in novas]
+    return edited, deleted
+
+
+@timed("storage.append_user_changes")
+def append_user_changes(
+    email: str,
+    kind: str,
+    edited: dict,
+    deleted: list,
+    added: list,
+    originals: dict = None,
+    base=None,
+):
+    """
+    Grava no log do usuário apenas o delta de uma edição (linhas alteradas,
+    excluídas e incluídas), sem reescrever o restante dos dados.
+
+    `originals` ({posição: linha no formato de `frame_records`}) traz o
+    conteúdo que as linhas editadas/excluídas tinham na sessão, e `base` o
+    carimbo (`user_stamp`) dos dados em que a sessão se baseou. Se o
+    arquivo não está mais nesse carimbo, as posições são refeitas contra o
+    que está em disco (`_rebase_changes`) antes de gravar.
+    """
+    if kind not in KINDS:
+        raise ValueError(f"Tipo de lançamento inválido: {kind}")
+
+    edited = {int(pos): changes for pos, changes in edited.items()}
+    deleted = [int(pos) for pos in deleted]
+    added = list(added)
+    originals = {int(pos): row for pos, row in (originals or {}).items()}
+
+    if STORAGE_BACKEND == "json":
+        # O carimbo do user_data.json muda com a gravação de qualquer
+        # usuário; as posições são sempre conferidas (só as linhas do delta
+        # são normalizadas quando continuam no lugar).
+        def _apply(user_data):
+            rows = user_data.get(kind, [])
+            novas_editadas, novas_excluidas = edited, deleted
+            if originals:
+                novas_editadas, novas_excluidas = _rebase_changes(
+                    kind, rows, edited, deleted, originals
+                )
+            user_data[kind] = apply_record_changes(
+                rows, novas_editadas, novas_excluidas, added
+            )
+            return user_data
+
+        update_all_data_user(email, _apply)
+        return
+
+    migrate_legacy_data()
+    path = user_ledger_path(email)
+    with file_lock(path):
+        antes = _path_stamp(path)
+        records = None
+        if originals and (base is None or antes != tuple(base)):
+            records = _read_ledger(path)
+            edited, deleted = _rebase_changes(kind, records[kind], edited, deleted, originals)
+
+        ops = _change_ops.get(email, 0) + 1
+        if ops >= LEDGER_COMPACT_AFTER:
+            if records is None:
+                records = _read_ledger(path)
+            records[kind] = apply_record_changes(records[kind], edited, deleted, added)
+            atomic_write_bytes(
+                path, _dump_line({"op": "snapshot", "email": email, "data": records})
+            )
+            _change_ops[email] = 0
+        else:
+            _append_bytes(
+                path,
+                _dump_line(
+                    {
+                        "op": "changes",
+                        "kind": kind,
+                        "edited": {str(pos): changes for pos, changes in edited.items()},
+                        "deleted": deleted,
+                        "added": added,
+                    }
+                ),
+            )
+            _change_ops[email] = ops
+        _write_stamps[email] = (antes, _path_stamp(path))
+
+
+def write_user_snapshot(email: str, records: dict):
+    """
+    Substitui todo o log do usuário por um único snapshot (usado após
+    edições/exclusões). Só o arquivo deste usuário é reescrito.
+    """
+    if STORAGE_BACKEND == "json":
+        data = {kind: list(records.get(kind, [])) for kind in KINDS}
+        update_all_data_user(email, lambda _user_data: data)
+        return
+
+    migrate_legacy_data()
+    _write_snapshot(email, records)
+
+
+def _write_snapshot(email: str, records: dict):
+    data = {kind: list(records.get(kind, [])) for kind in KINDS}
+    path = user_ledger_path(email)
+
+    with file_lock(path):
+        antes = _path_stamp(path)
+        atomic_write_bytes(
+            path, _dump_line({"op": "snapshot", "email": email, "data": data})
+        )
+        _write_stamps[email] = (antes, _path_stamp(path))
+        _change_ops[email] = 0
+
+
+# ==============================
+# CARIMBOS DE VERSÃO (VÁRIOS PROCESSOS)
+# ==============================
+
+def _path_stamp(path: str):
+    try:
+        return tuple(_stat_key(os.stat(path)))
+    except FileNotFoundError:
+        return None
+
+
+def user_stamp(email: str):
+    """
+    Carimbo da versão em disco dos dados do usuário, ou None se ele ainda
+    não tem dados. No backend json o carimbo é o do `user_data.json`
+    inteiro (qualquer gravação muda o de todos os usuários).
+    """
+    if STORAGE_BACKEND == "json":
+        return _path_stamp(DATA_FILE)
+    migrate_legacy_data()
+    return _path_stamp(user_ledger_path(email))
+
+
+def last_write_stamps(email: str):
+    """(carimbo antes, carimbo depois) da última gravação do usuário feita por este processo."""
+    return _write_stamps.get(email)
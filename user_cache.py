@@ -0,0 +1,204 @@
+"""
+Cache por processo dos frames de cada usuário, compartilhado entre sessões.
+
+Cada usuário tem no máximo uma cópia carregada (frames no esquema compacto
+de `frames.LEDGER_SCHEMA`) com um número de versão. As sessões do Streamlit
+(ex.: o mesmo usuário em várias abas) guardam referências para esses
+frames em vez de reler o log e montar cópias próprias; o login de uma aba
+nova custa só uma consulta ao dicionário.
+
+Os frames do cache são tratados como somente leitura: quem altera os dados
+monta um frame novo (concat / drop) ou copia antes as colunas que vai
+editar. Depois de gravar no storage, a sessão publica seus frames com
+`commit`; se outra sessão gravou antes (versão base diferente), a entrada
+é descartada e a próxima leitura recarrega do disco.
+
+Com várias réplicas do app no mesmo diretório de dados, cada entrada guarda
+também o carimbo em disco do usuário (`storage.user_stamp`, tirado antes
+da leitura). `get` e `version` conferem o carimbo com um `stat` (no máximo
+a cada FINANCE_CACHE_CHECK_INTERVAL segundos) e descartam só o usuário que
+outra réplica alterou. `commit` adota o carimbo da gravação da própria
+sessão apenas se ela partiu do carimbo em cache; se outra réplica gravou no
+meio, a entrada é descartada.
+"""
+
+import os
+import time
+import itertools
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from storage import KINDS, load_user_records, user_stamp, last_write_stamps
+from frames import typed_frame
+
+USER_CACHE_MAXSIZE = int(os.environ.get("USER_CACHE_MAXSIZE", "256"))
+
+# Intervalo mínimo (s) entre duas conferências do carimbo do mesmo usuário.
+# 0 confere a cada acesso (um stat); aumente em sistemas de arquivos de rede.
+USER_CACHE_CHECK_INTERVAL = float(os.environ.get("FINANCE_CACHE_CHECK_INTERVAL", "0"))
+
+
+def load_user_frames(email: str) -> dict:
+    """Lê o log do usuário e monta {tipo: frame compacto}."""
+    records = load_user_records(email)
+    return {
+        kind: typed_frame(kind, pd.DataFrame(records.get(kind, [])))
+        for kind in KINDS
+    }
+
+
+class UserFrameCache:
+    """Cache thread-safe e-mail -> (versão, frames), com descarte LRU."""
+
+    def __init__(
+        self,
+        loader=load_user_frames,
+        maxsize: int = USER_CACHE_MAXSIZE,
+        stamp=user_stamp,
+        written=last_write_stamps,
+        check_interval: float = USER_CACHE_CHECK_INTERVAL,
+    ):
+        self.loader = loader
+        self.maxsize = maxsize
+        self.stamp = stamp
+        self.written = written
+        self.check_interval = check_interval
+        self.reloads = 0  # entradas descartadas porque o carimbo em disco mudou
+        self._data = OrderedDict()  # e-mail -> (versão, {tipo: frame})
+        self._stamps = {}  # e-mail -> [carimbo em disco, última conferência]
+        self._lock = threading.Lock()
+        self._user_locks = {}
+        # Versões nunca se repetem, nem depois de um descarte e recarga.
+        self._versions = itertools.count(1)
+
+    def _user_lock(self, email: str) -> threading.Lock:
+        with self._lock:
+            return self._user_locks.setdefault(email, threading.Lock())
+
+    def _fresh(self, email: str) -> bool:
+        """
+        Confere o carimbo em disco do usuário carregado; se outro processo
+        gravou, descarta a entrada e devolve False.
+        """
+        with self._lock:
+            marca = self._stamps.get(email)
+            if marca is None:
+                return email in self._data
+            agora = time.monotonic()
+            if agora - marca[1] < self.check_interval:
+                return True
+            esperado = marca[0]
+
+        atual = self.stamp(email)
+        with self._lock:
+            marca = self._stamps.get(email)
+            if marca is None or marca[0] != esperado:
+                # Mudou enquanto conferíamos (commit/recarga desta réplica).
+                return email in self._data
+            if atual == esperado:
+                marca[1] = agora
+                return True
+            self._data.pop(email, None)
+            self._stamps.pop(email, None)
+            self.reloads += 1
+            return False
+
+    def version(self, email: str):
+        """Versão em cache do usuário, ou None se ele não está carregado (ou mudou em disco)."""
+        if not self._fresh(email):
+            return None
+        with self._lock:
+            item = self._data.get(email)
+            return None if item is None else item[0]
+
+    def get(self, email: str):
+        """
+        (versão, frames) do usuário, carregando do storage se preciso. Várias
+        sessões pedindo o mesmo usuário ao mesmo tempo disparam uma só
+        leitura.
+        """
+        if self._fresh(email):
+            with self._lock:
+                item = self._data.get(email)
+                if item is not None:
+                    self._data.move_to_end(email)
+                    return item
+
+        with self._user_lock(email):
+            with self._lock:
+                item = self._data.get(email)
+            if item is not None:
+                return item
+
+            # Carimbo antes da leitura: uma gravação durante a leitura muda
+            # o carimbo e a próxima conferência recarrega.
+            marca = self.stamp(email)
+            frames = self.loader(email)
+            with self._lock:
+                item = (next(self._versions), frames)
+                self._store(email, item, marca)
+            return item
+
+    def stamp_of(self, email: str, version):
+        """
+        Carimbo em disco em que a versão `version` do usuário se baseia, ou
+        None se ela não é mais a versão em cache.
+        """
+        with self._lock:
+            item = self._data.get(email)
+            marca = self._stamps.get(email)
+            if item is None or marca is None or item[0] != version:
+                return None
+            return marca[0]
+
+    def commit(self, email: str, base_version, frames: dict):
+        """
+        Publica os frames de uma sessão que acabou de gravar. Só vale se a
+        sessão partiu da versão em cache (`base_version`); senão a entrada é
+        descartada. Retorna a nova versão, ou None se descartou.
+        """
+        escrita = self.written(email)
+        with self._lock:
+            item = self._data.get(email)
+            marca = self._stamps.get(email)
+            if (
+                item is None
+                or base_version is None
+                or item[0] != base_version
+                or escrita is None
+                or marca is None
+                or escrita[0] != marca[0]
+            ):
+                self._data.pop(email, None)
+                self._stamps.pop(email, None)
+                return None
+            item = (next(self._versions), {**item[1], **frames})
+            self._store(email, item, escrita[1])
+            return item[0]
+
+    def invalidate(self, email: str):
+        with self._lock:
+            self._data.pop(email, None)
+            self._stamps.pop(email, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._stamps.clear()
+
+    def _store(self, email: str, item, marca):
+        self._data[email] = item
+        self._data.move_to_end(email)
+        self._stamps[email] = [marca, time.monotonic()]
+        while len(self._data) > self.maxsize:
+            antigo, _ = self._data.popitem(last=False)
+            self._stamps.pop(antigo, None)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+
+user_frame_cache = UserFrameCache()